@@ -1,17 +1,31 @@
 # -*- encoding: utf-8 -*-
 
 import os
-from core import app, db
+from werkzeug.serving import is_running_from_reloader
+
+from core import app, db, startup
+from core.migrations import bootstrap_database
 
 @app.shell_context_processor
 def make_shell_context():
     return {"app": app, "db": db}
 
+# flask --app app migrate
+@app.cli.command("migrate")
+def migrate():
+    """Apply pending database migrations."""
+    applied = bootstrap_database(app)
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date.")
+
 # python3 app.py
 if __name__ == '__main__':
     # !!! For production: Waitress server
     # from waitress import serve
+    # startup(app)
     # serve(app, host="0.0.0.0", port=os.getenv('PORT', 8000))
     
     # !!! For development: Flask server
+    # The reloader parent only watches files, the child it starts serves requests
+    if is_running_from_reloader():
+        startup(app)
     app.run(debug=True, host="0.0.0.0", port=os.getenv('PORT', 2225))
@@ -0,0 +1,140 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Timetable normalization: the old iterrows() loop against normalize_course_data
+
+    Builds a synthetic timetable, checks that both produce the same courses and
+    sections, then reports the time and the peak allocation of each.
+
+        cd backend && python -m benchmarks.bench_normalize [rows]
+"""
+
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from core.apis.course import COURSE_DATA_COLUMNS, normalize_course_data
+
+SEMESTER = "Semester 1 of AY2024-25"
+
+
+def iterrows_course_data(course_data, semester):
+    """
+        process_course_data before normalize_course_data, minus the Excel reading
+    """
+    course_list = []
+    section_list = []
+    course_ids = {}
+    next_course_id = 1
+    section_id = 1
+
+    for _, row in course_data.iterrows():
+        course_code = row["Course Code"]
+        if course_code not in course_ids:
+            course_ids[course_code] = next_course_id
+            course_list.append(
+                {
+                    "id": next_course_id,
+                    "course_code": course_code,
+                    "name_en": row["Course Title & Session"][:-7] if re.search(r"\(\d+\)", row["Course Title & Session"]) else row["Course Title & Session"],
+                    "name_cn": None,
+                    "units": 3 if pd.isna(row["Units"]) else int(row["Units"]),
+                    "curriculum_type": "" if pd.isna(row["Curriculum Type"]) else str(row["Curriculum Type"]),
+                    "elective_type": "" if pd.isna(row["Elective Type"]) else str(row["Elective Type"]),
+                    "offering_faculty": "" if pd.isna(row["Offering Unit"]) else str(row["Offering Unit"]),
+                    "offering_programme": "" if pd.isna(row["Offering Programme"]) else str(row["Offering Programme"]),
+                    "description": "",
+                    "prerequisites": "" if pd.isna(row["Requirements"]) else str(row["Requirements"]),
+                }
+            )
+            next_course_id += 1
+
+        section_number_match = re.search(r"\((\d+)\)", row["Course Title & Session"])
+        section_number = section_number_match.group(1) if section_number_match else "1001 (default)"
+        section_list.append(
+            {
+                "id": section_id,
+                "course_id": course_ids[course_code],
+                "offer_semester": semester,
+                "section_number": section_number,
+                "classroom": "" if pd.isna(row["Classroom"]) else str(row["Classroom"]),
+                "schedule": "" if pd.isna(row["Class Schedule"]) else str(row["Class Schedule"]),
+                "hours": -1 if pd.isna(row["Hours"]) or not str(row["Hours"]).isdigit() else str(row["Hours"]),
+                "remarks": "" if pd.isna(row["Remarks"]) else str(row["Remarks"]),
+                "teachers": "" if pd.isna(row["Teachers"]) else str(row["Teachers"]),
+            }
+        )
+        section_id += 1
+
+    return course_list, section_list
+
+
+def synthetic_timetable(rows, seed=0):
+    """
+        About four sections per course, 3% of them without a section number
+    """
+    rng = random.Random(seed)
+    codes = [f"{rng.choice(['COMP', 'MATH', 'STAT', 'ACCT', 'GEOG'])}{rng.randint(1000, 4999)}" for _ in range(rows // 4)]
+    data = []
+    for i in range(rows):
+        code = codes[i * len(codes) // rows]
+        session = f" ({1001 + i % 9})" if rng.random() < 0.97 else ""
+        data.append([
+            code,
+            f"Course {code} Title{session}",
+            rng.choice(["FST", "FBM", None]),
+            rng.choice(["CST", "STAT", None]),
+            rng.choice([3, 1, None]),
+            rng.choice(["MR", "ME", "GE2021", None]),
+            rng.choice(["UCHL (Group 1)", None]),
+            rng.choice(["Dr. A & Dr. B", None]),
+            rng.choice(["Mon 10:00-11:50", None]),
+            rng.choice([3, 2, "2-3", None]),
+            rng.choice(["T29-201", None]),
+            rng.choice(["P=2906", None]),
+            rng.choice(["Y1&Y2", None]),
+        ])
+    return pd.DataFrame(data, columns=COURSE_DATA_COLUMNS)
+
+
+def records(frame_or_list):
+    # The old loop kept hours as digit strings
+    if isinstance(frame_or_list, pd.DataFrame):
+        frame_or_list = frame_or_list.to_dict("records")
+    return [{k: int(v) if k == "hours" else v for k, v in record.items()} for record in frame_or_list]
+
+
+def measure(normalize, timetable):
+    start = time.perf_counter()
+    normalize(timetable, SEMESTER)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    normalize(timetable, SEMESTER)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    timetable = synthetic_timetable(rows)
+
+    old_courses, old_sections = iterrows_course_data(timetable, SEMESTER)
+    new_courses, new_sections = normalize_course_data(timetable, SEMESTER)
+    assert records(old_courses) == records(new_courses), "courses differ"
+    assert records(old_sections) == records(new_sections), "sections differ"
+    print(f"{rows} rows: {len(old_courses)} courses, {len(old_sections)} sections, identical output")
+
+    old_seconds, old_peak = measure(iterrows_course_data, timetable)
+    new_seconds, new_peak = measure(normalize_course_data, timetable)
+    print(f"iterrows   {old_seconds:7.3f} s  peak {old_peak / 1e6:5.0f} MB")
+    print(f"vectorized {new_seconds:7.3f} s  peak {new_peak / 1e6:5.0f} MB  ({old_seconds / new_seconds:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Streamed chat answers: re-chunking with iter_content(1024) against iter_events
+
+    Streams from a local Dify stand-in, chunked (as Dify streams), chunked with
+    2 KiB events and close-delimited. For each relay, the time to the first token
+    of EVENTS events DELAY seconds apart and the relay CPU per token over a long
+    stream. Then the same through POST /dify/chat-messages, and how many events the
+    stand-in sends after a client of a served app hangs up.
+
+        cd backend && [CPU_EVENTS=20000] python -m benchmarks.bench_sse [events] [delay]
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from .common import demo_app, stand_in_stats, start_stand_in
+
+BASE_URL = start_stand_in()
+
+from core.upstream import dify_client, iter_events  # noqa: E402
+
+CPU_EVENTS = int(os.getenv("CPU_EVENTS", 20000))
+
+
+def iter_content(response):
+    """
+        The relay before iter_events
+    """
+    yield from response.iter_content(chunk_size=1024)
+
+
+def stream(relay, events, delay, **shape):
+    """
+        Seconds to the first piece, in total and of CPU, and the pieces relayed
+    """
+    start, cpu = time.perf_counter(), time.process_time()
+    response = dify_client.post("/chat-messages", json={
+        "response_mode": "streaming", "_events": events, "_delay": delay, **shape
+    }, stream=True)
+    first, body = None, []
+    for piece in relay(response):
+        if first is None:
+            first = time.perf_counter() - start
+        body.append(piece)
+    assert b"".join(body).count(b"data: ") == events + 1
+    return first, time.perf_counter() - start, time.process_time() - cpu, len(body)
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def compare(events, delay):
+    print(f"{events} events {1000 * delay:.0f} ms apart, CPU over {CPU_EVENTS} events")
+    for case, shape in (("chunked", {}), ("chunked, 2 KiB events", {"_pad": 2000}),
+                        ("close-delimited", {"_close": True})):
+        for label, relay in (("iter_content(1024)", iter_content), ("iter_events", iter_events)):
+            runs = [stream(relay, events, delay, **shape) for _ in range(5)]
+            pieces = runs[0][3]
+            cpu = median([stream(relay, CPU_EVENTS, 0, **shape)[2] for _ in range(3)])
+            print(f"{case:22s} {label:18s} TTFT {1000 * median([run[0] for run in runs]):6.1f} ms  "
+                  f"total {median([run[1] for run in runs]):5.2f} s  "
+                  f"CPU {1e6 * cpu / CPU_EVENTS:5.1f} us/token  {pieces / (events + 1):.1f} pieces/event")
+
+
+def endpoint_ttft(client, headers, events, delay):
+    start = time.perf_counter()
+    response = client.post("/api/v1/dify/chat-messages", headers=headers, buffered=False, json={
+        "response_mode": "streaming", "_events": events, "_delay": delay
+    })
+    first, received = None, 0
+    for piece in response.response:
+        if first is None:
+            first = time.perf_counter() - start
+        received += piece.count(b"data: ")
+    response.close()
+    print(f"POST /api/v1/dify/chat-messages TTFT {1000 * first:.1f} ms, {received} events, status {response.status_code}")
+
+
+def disconnect(app, headers, events=500, read=3):
+    """
+        Hang up on a served app after `read` events, then count what the stand-in sent
+    """
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    before = stand_in_stats(BASE_URL)
+
+    body = json.dumps({"response_mode": "streaming", "_events": events, "_delay": 0.01}).encode()
+    request = ["POST /api/v1/dify/chat-messages HTTP/1.1", "Host: 127.0.0.1", "Content-Type: application/json",
+               f"Content-Length: {len(body)}"] + [f"{key}: {value}" for key, value in headers.items()]
+    connection = socket.create_connection(("127.0.0.1", server.server_port))
+    connection.sendall("\r\n".join(request).encode() + b"\r\n\r\n" + body)
+    received = b""
+    while received.count(b"data: ") < read:
+        received += connection.recv(65536)
+    connection.close()
+    time.sleep(1.5)
+
+    after = stand_in_stats(BASE_URL)
+    server.shutdown()
+    print(f"client gone after {read} events: the stand-in sent {after['sent'] - before['sent']} of {events}, "
+          f"{after['closed_early'] - before['closed_early']} stream closed early")
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    app, client, headers = demo_app()
+
+    compare(events, delay)
+    endpoint_ttft(client, headers, events, delay)
+    disconnect(app, headers)
+
+
+if __name__ == "__main__":
+    main()
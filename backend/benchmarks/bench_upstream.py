@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Dify proxy: a new connection per call against the pooled dify_client
+
+    GET /conversations from THREADS client threads against a local Dify stand-in:
+    requests.get per call (how the proxy called Dify before), dify_client, and the
+    Flask endpoint on top of it. Reports requests per second and the connections
+    the stand-in accepted.
+
+        cd backend && python -m benchmarks.bench_upstream [requests] [threads]
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .common import demo_app, stand_in_stats, start_stand_in
+
+BASE_URL = start_stand_in()
+
+from core.upstream import dify_client  # noqa: E402
+
+HEADERS = {"Authorization": "Bearer app-benchmark"}
+
+
+def bench(label, call, total, threads):
+    connections = stand_in_stats(BASE_URL)["connections"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: call(), range(total)))
+    seconds = time.perf_counter() - start
+    # The stats request itself opens one connection
+    opened = stand_in_stats(BASE_URL)["connections"] - connections - 1
+    print(f"{label:32s} {total / seconds:7.0f} req/s  {opened:5d} connections")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    app, client, headers = demo_app()
+
+    def per_call():
+        requests.get(BASE_URL + "/conversations", headers=HEADERS, params={"user": "u"}).json()
+
+    def pooled():
+        dify_client.get("/conversations", headers=HEADERS, params={"user": "u"}).json()
+
+    def endpoint():
+        response = client.get("/api/v1/dify/conversations", headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    print(f"{total} requests, {threads} threads")
+    bench("requests.get per call", per_call, total, threads)
+    bench("dify_client.get", pooled, total, threads)
+    bench("GET /api/v1/dify/conversations", endpoint, total, threads)
+
+    stats = client.get("/api/v1/dify/upstream/stats", headers=headers).json["data"][0]
+    print({key: stats[key] for key in ("pool_size", "peak_in_flight", "saturated", "pools")})
+
+
+if __name__ == "__main__":
+    main()
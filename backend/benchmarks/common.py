@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Shared setup of the upstream benchmarks
+
+    The Dify stand-in runs in its own process, so that the server and the client
+    under test do not share a GIL. The app runs on a temporary SQLite database
+    with a logged-in admin.
+"""
+
+import atexit
+import os
+import subprocess
+import sys
+import tempfile
+
+import requests
+import requests.adapters
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# pip-system-certs (requirements.txt) reloads the CA store for every new pool
+# manager, which would dominate the per-call session numbers; measure without it
+if hasattr(requests.adapters.HTTPAdapter.init_poolmanager, "__wrapped__"):
+    requests.adapters.HTTPAdapter.init_poolmanager = requests.adapters.HTTPAdapter.init_poolmanager.__wrapped__
+
+
+def start_stand_in():
+    """
+        Start a Dify stand-in process, point DIFY_API_BASE and CHATGPT_API_BASE at it
+        and return its base URL. Call before importing `core`, which reads them.
+    """
+    server = subprocess.Popen([sys.executable, "-m", "tests.stand_in", "dify"], cwd=BACKEND_DIR,
+                              stdout=subprocess.PIPE, text=True)
+    atexit.register(server.kill)
+    base_url = server.stdout.readline().strip()
+    os.environ["DIFY_API_BASE"] = base_url
+    os.environ["CHATGPT_API_BASE"] = base_url
+    os.environ["IMPORT_WORKERS"] = "0"
+    return base_url
+
+
+def stand_in_stats(base_url):
+    return requests.get(base_url[:-len("/v1")] + "/_stats").json()
+
+
+def demo_app():
+    """
+        The app on a fresh SQLite database, its test client and an admin's headers
+    """
+    from core import app
+    from core.migrations import bootstrap_database
+    from core.models import db, User
+
+    database = os.path.join(tempfile.mkdtemp(), "uicinfocenter.db")
+    app.extensions.pop("sqlalchemy", None)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{database}"
+    db.init_app(app)
+    bootstrap_database(app)
+
+    with app.app_context():
+        User.register("admin", "admin@example.com", "Passw0rdX", "ADMIN", "ACTIVE", "chat")
+    client = app.test_client()
+    response = client.post("/api/v1/user/login", json={"email": "admin@example.com", "password": "Passw0rdX"})
+    headers = {"Authorization": "Bearer " + response.json["data"]["userToken"]}
+    return app, client, headers
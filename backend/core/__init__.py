@@ -5,10 +5,13 @@ import json
 from flask import Flask
 from flask_cors import CORS
 
-from .models import db
+from .models import db, JWTTokenBlocklist
 from .apis import rest_api
 
 from .utils import mail
+from .migrations import bootstrap_database
+from .tasks import start_periodic_task
+from .jobs import start_job_runner
 
 app = Flask(__name__)
 
@@ -20,15 +23,38 @@ mail.init_app(app)
 CORS(app)
 
 """
-    Database initialization
-    Create tables if they don't exist
-    WARNING: This will not create the database, only the tables.
-    So, you need to create the database first. (MySQL only)
+    Startup
+    Migrations, background tasks and the job runner belong to the process serving
+    requests, not to every import of `core`: the reloader parent, `flask migrate`
+    and tests import it too. Servers call `startup(app)` once before serving.
 """
 
-@app.before_request
-def initialize_database():
-    db.create_all()
+started = False
+
+
+def startup(app):
+    """
+        Create tables and apply pending migrations when DB_AUTO_MIGRATE is on (otherwise
+        `flask migrate` is the only way to migrate), keep the blocklist pre-filter in sync
+        and run import jobs (IMPORT_WORKERS > 0)
+        WARNING: This will not create the database, only the tables.
+        So, you need to create the database first. (MySQL only)
+    """
+    global started
+    if started:
+        return
+    started = True
+
+    if app.config["DB_AUTO_MIGRATE"]:
+        bootstrap_database(app)
+
+    # Purge expired blocklist entries and keep the blocklist pre-filter in sync
+    start_periodic_task(app, "jwt-blocklist-maintenance", app.config["JWT_BLOCKLIST_SYNC_INTERVAL"],
+                        JWTTokenBlocklist.maintain)
+
+    # Run course uploads and imports in a thread pool, resuming jobs left by stopped workers
+    start_job_runner(app)
+
 
 # """
 #     Request handlers
@@ -1,6 +1,12 @@
 # -*- encoding: utf-8 -*-
 
+from http import HTTPStatus
 from flask_restx import Api
+import requests
+
+from core.circuit_breaker import CircuitOpenError
+from core.pagination import InvalidCursor
+from core.upstream import upstream_title
 
 from .user import user_ns
 from .course import course_ns
@@ -25,6 +31,35 @@ rest_api = Api(version="1.0", title="UIC Information Center API", prefix="/api/v
                description="UIC Information Center API", security="Bearer Auth",
                authorizations=authorizations, doc="/docs/")
 
+
+@rest_api.errorhandler(InvalidCursor)
+def handle_invalid_cursor(error):
+    return {"success": False, "code": "INVALID_CURSOR", "message": "Invalid pagination cursor."}, HTTPStatus.BAD_REQUEST
+
+
+@rest_api.errorhandler(CircuitOpenError)
+def handle_circuit_open(error):
+    return error.to_dict(), HTTPStatus.SERVICE_UNAVAILABLE, {"Retry-After": str(error.retry_after)}
+
+
+@rest_api.errorhandler(requests.Timeout)
+def handle_upstream_timeout(error):
+    return {
+        "success": False,
+        "code": "UPSTREAM_TIMEOUT",
+        "message": f"{upstream_title(error)} API did not respond in time.",
+    }, HTTPStatus.GATEWAY_TIMEOUT
+
+
+@rest_api.errorhandler(requests.RequestException)
+def handle_upstream_error(error):
+    return {
+        "success": False,
+        "code": "UPSTREAM_UNAVAILABLE",
+        "message": f"{upstream_title(error)} API is unavailable.",
+    }, HTTPStatus.BAD_GATEWAY
+
+
 rest_api.add_namespace(user_ns, path="/user")
 rest_api.add_namespace(course_ns, path="/course")
 rest_api.add_namespace(section_ns, path="/section")
@@ -3,20 +3,40 @@
 from http import HTTPStatus
 from flask import request
 from flask_restx import Namespace, Resource, fields
-from sqlalchemy import text
+from sqlalchemy import select, text
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 from sqlalchemy.exc import SQLAlchemyError
 
 import pandas as pd
+import numpy as np
+import openpyxl
+import itertools
+import json
+import multiprocessing
+import os
 import re
+import zipfile
 import fitz  # PyMuPDF for PDF processing
-import string
 import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+except ImportError:  # optional, CSV uploads then use the pandas reader
+    pyarrow = pyarrow_csv = None
+
+from pdf_worker import extract_pages
 from core.config import BaseConfig
-from core.models import Course, Section
+from core.pagination import cursor_args, pagination_info
+from core import upload_cache
+from core.jobs import enqueue, job_handler
+from core.models import Course, Section, ImportJob
 from core.models import db
+from core.swap import SwapError, SwapInProgress, prepare_shadow_tables, finish_shadow_tables, rollback_tables, shadow_table, supports_swap, swap_lock, swap_tables
+from core.utils import import_stats
 
 from .user import jwt_token_required, admin_required
 
@@ -28,19 +48,14 @@ file_upload_parser.add_argument(
     "file", location="files", type=FileStorage, required=True, help="File to upload"
 )
 
-# Course data
-course_data = pd.DataFrame()
-
-# Initialize lists to store the data
-course_list = []
-section_list = []
-
-semester = str()
-course_desc_dict = dict()
+# Parsed uploads are cached by file content and parser version, bump a version when its output changes
+TIMETABLE_PARSER_VERSION = 1
+DESCRIPTIONS_PARSER_VERSION = 1
 
-# Boolean flag to indicate if the course data has been processed
-course_data_processed = False
-course_desc_processed = False
+# Parsed data staged by the upload jobs, in the job's staging directory
+STAGED_COURSES = "courses.pkl"
+STAGED_SECTIONS = "sections.pkl"
+STAGED_DESCRIPTIONS = "descriptions.json"
 
 
 """
@@ -416,6 +431,8 @@ class CoursesApi(Resource):
         type="integer",
         default=BaseConfig.PAGE_SIZE,
     )
+    @course_ns.param("cursor", "Cursor of the next page, empty for the first page (cursor mode)")
+    @course_ns.param("withTotal", "Count the total in cursor mode", type="boolean", default=False)
     @jwt_token_required
     def get(self, cls):
         data = request.args
@@ -438,13 +455,16 @@ class CoursesApi(Resource):
         keyword = data.get("keyword")
         current = data.get("current", 1, type=int)
         pageSize = data.get("pageSize", BaseConfig.PAGE_SIZE, type=int)
+        cursor, with_total = cursor_args(data)
 
         if keyword:
-            courses, total = Course.get_courses_by_keyword_paginated(
-                keyword, current, pageSize
+            courses, total, next_cursor = Course.get_courses_by_keyword_paginated(
+                keyword, current, pageSize, cursor, with_total
             )
         else:
-            courses, total = Course.get_all_courses_paginated(current, pageSize)
+            courses, total, next_cursor = Course.get_all_courses_paginated(
+                current, pageSize, cursor, with_total
+            )
 
         return {
             "success": True,
@@ -452,11 +472,7 @@ class CoursesApi(Resource):
             "message": "Success.",
             "data": {
                 "courses": [course.to_dict() for course in courses],
-                "pagination": {
-                    "total": total,
-                    "current": current,
-                    "pageSize": pageSize,
-                },
+                "pagination": pagination_info(current, pageSize, total, cursor, next_cursor),
             },
         }, HTTPStatus.OK
 
@@ -494,188 +510,270 @@ class CourseUploadApi(Resource):
                 "message": "File type not allowed.",
             }, HTTPStatus.BAD_REQUEST
 
-        # Process PDF file to extract course descriptions
         if uploaded_file.mimetype == "application/pdf":
-            try:
-                callback_msg = process_pdf(uploaded_file)
-            except Exception as e:
-                return {
-                    "success": False,
-                    "code": "FILE_PROCESSING_ERROR",
-                    "message": str(e),
-                }, HTTPStatus.BAD_REQUEST
-        # Process Excel or CSV to get course data
-        elif uploaded_file.mimetype in [
-            "text/csv",
-            "application/vnd.ms-excel",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        ]:
-            # try:
-                # 使用 global 关键字在函数内部读写全局变量
-            global semester
+            kind = "descriptions"
+            semester = None
+        else:
+            kind = "timetable"
             match = re.search(r"Semester_\d{1}_of_AY(\d{4}-\d{2})", filename)
-            print(match)
-            if match:
-                semester = match.group(0).replace("_", " ")
-            else:
+            if not match:
                 return {
                     "success": False,
                     "code": "SEMESTER_NOT_FOUND",
                     "message": "Semester information not found in the filename.",
                 }, HTTPStatus.BAD_REQUEST
-            callback_msg = process_course_data(uploaded_file)
-            # except Exception as e:
-            #     return {
-            #         "success": False,
-            #         "code": "FILE_PROCESSING_ERROR",
-            #         "message": str(e),
-            #     }, HTTPStatus.BAD_REQUEST
+            semester = match.group(0).replace("_", " ")
+
+        # Stage the file under the job ID, parsing runs in the background
+        job = ImportJob(kind, user_id=self.id, filename=filename, semester=semester)
+        try:
+            db.session.add(job)
+            db.session.flush()
+            os.makedirs(job.staging_dir, exist_ok=True)
+            uploaded_file.save(job.staging_path(job.id, filename))
+            enqueue(job)
+        except (OSError, SQLAlchemyError) as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "code": "FILE_STAGING_FAILED",
+                "message": str(e),
+            }, HTTPStatus.INTERNAL_SERVER_ERROR
 
         return {
             "success": True,
             "code": "FILE_UPLOADED",
             "message": 'File "'
             + uploaded_file.filename
-            + '" uploaded and processed successfully.',
-            "data": {
-                "semester": semester,
-                "course_data_processed": course_data_processed,
-                "course_desc_processed": course_desc_processed,
-                "callback_msg": callback_msg,
-            },
-        }, HTTPStatus.OK
-
-
-def process_course_data(uploaded_xlsx) -> str:
-    # 使用 global 关键字在函数内部读写全局变量
-    global course_data, course_list, section_list, semester, course_data_processed
-    # Clean up if there is any existing data
-    course_list = []
-    section_list = []
-    course_data = pd.read_excel(uploaded_xlsx, sheet_name=0, skiprows=1)
-    course_data.columns = [
-        "Course Code",
-        "Course Title & Session",
-        "Offering Unit",
-        "Offering Programme",
-        "Units",
-        "Curriculum Type",
-        "Elective Type",
-        "Teachers",
-        "Class Schedule",
-        "Hours",
-        "Classroom",
-        "Requirements",
-        "Remarks",
-    ]
-    course_ids = {}
-    next_course_id = 1
-    section_id = 1
-
-    for _, row in course_data.iterrows():
-        course_code = row["Course Code"]
-        if course_code not in course_ids:
-            course_ids[course_code] = next_course_id
-            course_list.append(
-                {
-                    "id": next_course_id,
-                    "course_code": course_code,
-                    "name_en": row["Course Title & Session"][:-7] if re.search(r"\(\d+\)", row["Course Title & Session"]) else row["Course Title & Session"], # remove section number
-                    "name_cn": None,
-                    "units": 3 if pd.isna(row["Units"]) else int(row["Units"]),
-                    "curriculum_type": (
-                        ""
-                        if pd.isna(row["Curriculum Type"])
-                        else str(row["Curriculum Type"])
-                    ),
-                    "elective_type": (
-                        ""
-                        if pd.isna(row["Elective Type"])
-                        else str(row["Elective Type"])
-                    ),
-                    "offering_faculty": (
-                        ""
-                        if pd.isna(row["Offering Unit"])
-                        else str(row["Offering Unit"])
-                    ),
-                    "offering_programme": (
-                        ""
-                        if pd.isna(row["Offering Programme"])
-                        else str(row["Offering Programme"])
-                    ),
-                    "description": "",  # description_dict.get(course_code, ''),
-                    "prerequisites": (
-                        "" if pd.isna(row["Requirements"]) else str(row["Requirements"])
-                    ),
-                }
-            )
-            next_course_id += 1
-
-        section_number_match = re.search(r"\((\d+)\)", row["Course Title & Session"])
-        section_number = section_number_match.group(1) if section_number_match else "1001 (default)"
-        # if not section_number:
-        #     raise Exception(
-        #         f"Section number not found in {row['Course Title & Session']}"
-        #     )
-        section_list.append(
-            {
-                "id": section_id,
-                "course_id": course_ids[course_code],
-                "offer_semester": semester,
-                "section_number": section_number,
-                "classroom": "" if pd.isna(row["Classroom"]) else str(row["Classroom"]),
-                "schedule": (
-                    "" if pd.isna(row["Class Schedule"]) else str(row["Class Schedule"])
-                ),
-                "hours": -1 if pd.isna(row["Hours"]) or not str(row["Hours"]).isdigit() else str(row["Hours"]),
-                "remarks": "" if pd.isna(row["Remarks"]) else str(row["Remarks"]),
-                "teachers": "" if pd.isna(row["Teachers"]) else str(row["Teachers"]),
-            }
+            + '" uploaded, processing in the background.',
+            "data": {"job": job.to_dict()},
+        }, HTTPStatus.ACCEPTED
+
+
+COURSE_DATA_COLUMNS = [
+    "Course Code",
+    "Course Title & Session",
+    "Offering Unit",
+    "Offering Programme",
+    "Units",
+    "Curriculum Type",
+    "Elective Type",
+    "Teachers",
+    "Class Schedule",
+    "Hours",
+    "Classroom",
+    "Requirements",
+    "Remarks",
+]
+
+
+def text_column(column):
+    # "" for empty cells, str() of everything else
+    return column.fillna("").astype(str)
+
+
+def normalize_course_data(timetable, semester, course_ids=None, first_section_id=1):
+    """
+        Split a timetable frame (one row per section) into the course and section frames.
+        Courses keep the order of their first section, IDs are assigned from 1 in that order.
+        To normalize a timetable in batches, pass the same `course_ids` dict (course code -> ID)
+        and the next section ID to every batch, each batch then returns only its new courses.
+    """
+    if course_ids is None:
+        course_ids = dict()
+    known_courses = len(course_ids)
+
+    title = text_column(timetable["Course Title & Session"])
+    # Course ID of each row, numbered in order of first appearance
+    codes, uniques = pd.factorize(timetable["Course Code"], use_na_sentinel=False)
+    unique_ids = np.array([
+        course_ids.setdefault(None if pd.isna(code) else code, len(course_ids) + 1) for code in uniques
+    ], dtype=int)
+    course_codes = unique_ids[codes] - 1
+
+    # Title without the trailing " (1001)" section number
+    has_section_number = title.str.contains(r"\(\d+\)", regex=True)
+    name_en = title.where(~has_section_number, title.str[:-7])
+
+    courses = pd.DataFrame({
+        "id": course_codes + 1,
+        "course_code": timetable["Course Code"],
+        "name_en": name_en,
+        "name_cn": None,
+        "units": pd.to_numeric(timetable["Units"], errors="coerce").fillna(3).astype(int),
+        "curriculum_type": text_column(timetable["Curriculum Type"]),
+        "elective_type": text_column(timetable["Elective Type"]),
+        "offering_faculty": text_column(timetable["Offering Unit"]),
+        "offering_programme": text_column(timetable["Offering Programme"]),
+        "description": "",
+        "prerequisites": text_column(timetable["Requirements"]),
+    }).drop_duplicates("id")
+    courses = courses[courses["id"] > known_courses].reset_index(drop=True)
+
+    # Hours must be a plain number, -1 otherwise
+    hours = timetable["Hours"].astype(str)
+    hours = pd.to_numeric(hours.where(hours.str.isdigit()), errors="coerce").fillna(-1).astype(int)
+
+    sections = pd.DataFrame({
+        "id": range(first_section_id, first_section_id + len(timetable)),
+        "course_id": course_codes + 1,
+        "offer_semester": semester,
+        "section_number": title.str.extract(r"\((\d+)\)", expand=False).fillna("1001 (default)"),
+        "classroom": text_column(timetable["Classroom"]),
+        "schedule": text_column(timetable["Class Schedule"]),
+        "hours": hours,
+        "remarks": text_column(timetable["Remarks"]),
+        "teachers": text_column(timetable["Teachers"]),
+    })
+
+    return courses, sections
+
+
+def cell_value(value):
+    # Whole numbers come back as floats, read them as int like pandas does
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_timetable_batches(uploaded_xlsx, batch_size=None):
+    """
+        Read the first sheet of a timetable in frames of `batch_size` rows.
+        xlsx files are streamed with openpyxl in read-only mode, so memory does not
+        grow with the workbook; CSV files go through `read_csv_batches`, other formats
+        are read at once by pandas.
+        The first row is the title, the second the header, empty rows are skipped.
+    """
+    batch_size = batch_size or BaseConfig.IMPORT_READ_BATCH_SIZE
+    if str(uploaded_xlsx).lower().endswith(".csv"):
+        yield from read_csv_batches(uploaded_xlsx, batch_size)
+        return
+    if not zipfile.is_zipfile(uploaded_xlsx):
+        course_data = pd.read_excel(uploaded_xlsx, sheet_name=0, skiprows=1)
+        course_data.columns = COURSE_DATA_COLUMNS
+        yield course_data
+        return
+
+    workbook = openpyxl.load_workbook(uploaded_xlsx, read_only=True, data_only=True)
+    try:
+        rows = list()
+        for row in workbook.worksheets[0].iter_rows(min_row=3, max_col=len(COURSE_DATA_COLUMNS), values_only=True):
+            if all(value is None for value in row):
+                continue
+            rows.append([cell_value(value) for value in row])
+            if len(rows) == batch_size:
+                yield pd.DataFrame(rows, columns=COURSE_DATA_COLUMNS, dtype=object)
+                rows = list()
+        if rows:
+            yield pd.DataFrame(rows, columns=COURSE_DATA_COLUMNS, dtype=object)
+    finally:
+        workbook.close()
+
+
+def csv_header_row(uploaded_csv):
+    # The header may follow a title row, as in the xlsx export, or come first
+    with open(uploaded_csv, newline="", encoding="utf-8-sig") as fp:
+        for index, row in enumerate(itertools.islice(csv.reader(fp), 10)):
+            if row and row[0].strip() == COURSE_DATA_COLUMNS[0]:
+                return index
+    return 1
+
+
+def read_csv_batches(uploaded_csv, batch_size):
+    """
+        Read a timetable exported as UTF-8 CSV in frames of `batch_size` rows, every column as text.
+        Uses the multi-threaded pyarrow reader when installed, pandas' C reader otherwise.
+    """
+    skip_rows = csv_header_row(uploaded_csv) + 1
+
+    if pyarrow_csv is None:
+        batches = pd.read_csv(uploaded_csv, skiprows=skip_rows, names=COURSE_DATA_COLUMNS, dtype=str,
+                              keep_default_na=False, encoding="utf-8-sig", chunksize=batch_size)
+    else:
+        table = pyarrow_csv.read_csv(
+            uploaded_csv,
+            read_options=pyarrow_csv.ReadOptions(skip_rows=skip_rows, column_names=COURSE_DATA_COLUMNS),
+            # Cells such as the requirements may span several lines
+            parse_options=pyarrow_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pyarrow_csv.ConvertOptions(
+                column_types={column: pyarrow.string() for column in COURSE_DATA_COLUMNS},
+                strings_can_be_null=False,
+            ),
         )
-        # print(section_list[-1])
-        section_id += 1
+        batches = (batch.to_pandas() for batch in table.to_batches(max_chunksize=batch_size))
+
+    for batch in batches:
+        # Rows of empty cells (",,,,") are blank lines in the spreadsheet
+        batch = batch[(batch != "").any(axis=1)]
+        if len(batch):
+            yield batch.reset_index(drop=True)
+
+
+def process_course_data(uploaded_xlsx, semester, progress=None):
+    """
+        Read and normalize a timetable batch by batch, `progress` is called with the rows read so far
+    """
+    course_ids = dict()
+    courses, sections = list(), list()
+    rows = 0
+    for batch in read_timetable_batches(uploaded_xlsx):
+        batch_courses, batch_sections = normalize_course_data(batch, semester, course_ids, rows + 1)
+        courses.append(batch_courses)
+        sections.append(batch_sections)
+        rows += len(batch)
+        if progress is not None:
+            progress(rows)
+
+    if not sections:
+        raise Exception("Data Error: No Course Found.")
+    return pd.concat(courses, ignore_index=True), pd.concat(sections, ignore_index=True)
+
 
-    course_data_processed = True
+"""
+    Course description PDF
+    Pages are extracted in shards on a process pool (pdf_worker.py) and merged
+    in page order, the lines are then parsed in one pass.
+"""
 
-    # # Create DataFrames (debug)
-    # course_df = pd.DataFrame(course_list)
-    # section_df = pd.DataFrame(section_list)
+COURSE_CODE_PATTERN = re.compile(r"([A-Z]{2,4}\d{4})")  # Simple Course Code Pattern
+COURSE_TITLE_PATTERN = re.compile(r"^([A-Z]{2,4}\d{4}) ([0-9A-Z\s\-\(\)&\+\?,:]*)$")  # Course Code with Course Name Pattern
+COURSE_UNIT_PATTERN = re.compile(r"\(\d{1}\s*(unit|UNIT).*\)")
+PAGE_NUMBER_PATTERN = re.compile(r"\d+ / \d+")
 
-    # # 输出course_df的前几行 (debug)
-    # print(course_df.head())
-    # print(course_list[0])
 
-    # 输出总共有多少门课程 (debug)
-    # print(f"Total {len(course_list)} courses found in the uploaded file.")
-    # print(f"Total {len(section_list)} sections found in the uploaded file.")
-    return f"Total {len(course_list)} courses and {len(section_list)} sections found in the uploaded file."
+def is_description_heading(line):
+    return (
+        "Course Description:" in line
+        or "Course  Description" in line
+        or "Description:" in line
+        or "Course Description" in line
+    )
 
 
-def process_pdf(uploaded_pdf):
-    # 使用 global 关键字在函数内部读写全局变量
-    global course_desc_dict, course_desc_processed
-    # Clean up if there is any existing data
-    course_desc_dict = dict()
+def extract_pdf_text(pdf_path):
+    """
+        Cleaned text of all pages, in shards of PDF_PAGES_PER_SHARD pages on up to PDF_EXTRACT_WORKERS processes
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
 
-    # PDF_FILENAME = uploaded_pdf.filename
-    # print(f"Loading PDF {PDF_FILENAME}")
-    # FILENAME_PREFIX = PDF_FILENAME.split('.')[0]
+    shard_size = BaseConfig.PDF_PAGES_PER_SHARD
+    shards = [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+    workers = min(BaseConfig.PDF_EXTRACT_WORKERS or os.cpu_count() or 1, len(shards))
+    if workers <= 1:
+        pages = [extract_pages(pdf_path, start, stop) for start, stop in shards]
+    else:
+        # Spawned, the pool processes import only pdf_worker
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            pages = list(executor.map(extract_pages, itertools.repeat(pdf_path), *zip(*shards)))
 
-    # Remove non-printable characters
-    printable = set(string.printable)
+    # Pages used to be joined with a form feed, which the cleaning removes
+    return "".join(itertools.chain.from_iterable(pages))
 
-    printable.remove("\t")
-    printable.remove("\n")
-    printable.remove("\x0b")
-    printable.remove("\x0c")
-    printable.remove("\r")
 
+def process_pdf(pdf_path) -> dict:
     # Read PDF and extract course descriptions
-    text = ""
-    with fitz.open(stream=uploaded_pdf.read(), filetype="pdf") as doc:
-        text = chr(12).join([page.get_text() for page in doc])
-        text = text.split("\n")
-        text = ["".join(filter(lambda x: x in printable, l)) for l in text][6:]
+    text = extract_pdf_text(pdf_path).split("\n")[6:]
 
     # # begin of raw lines (debugging)
     # RAW_FILENAME = f"{FILENAME_PREFIX}-raw_lines.txt"
@@ -687,12 +785,11 @@ def process_pdf(uploaded_pdf):
     #     print("Done")
     # # end of raw lines (debugging)
 
-    pattern = r"([A-Z]{2,4}\d{4})"  # Simple Course Code Pattern
     course_code_dict = dict()  # Course Code Dictionary
     for i in text:
         # print(i)
-        if re.match(pattern, i):
-            result = re.search(pattern, i)
+        result = COURSE_CODE_PATTERN.match(i)
+        if result:
             try:
                 course_code_dict[result.group(1)] += 1
             except KeyError:
@@ -700,15 +797,13 @@ def process_pdf(uploaded_pdf):
 
     # print(f"Found {len(course_code_dict.keys())} matched course code.") # debug
 
-    pattern = "^([A-Z]{2,4}\d{4}) ([0-9A-Z\s\-\(\)&\+\?,:]*)$"  # Course Code with Course Name Pattern
-
     course_name_list = list()  # Course Name List
     course_desc_list = list()  # Course Description List
 
     new_flag = 0
     temp_c_list = list()
     for k, i in enumerate(text):
-        if re.match(pattern, i):  # A new course pattern like string
+        if COURSE_TITLE_PATTERN.match(i):  # A new course pattern like string
             if new_flag == 1:  # *Course Description* flag not meet
                 temp_c_list.append(i)  # Just another line
             else:  # *Course Description* flag meet
@@ -717,12 +812,7 @@ def process_pdf(uploaded_pdf):
                     temp_c_list = list()
                 new_flag = 1
                 course_name_list.append(i)  # Save new course name
-        elif (
-            "Course Description:" in i
-            or "Course  Description" in i
-            or "Description:" in i
-            or "Course Description" in i
-        ):
+        elif is_description_heading(i):
             new_flag = 0
             temp_c_list.append(i)
         else:
@@ -753,8 +843,7 @@ def process_pdf(uploaded_pdf):
         return buffer
 
     def get_course_code(course_name):
-        pattern = r"([A-Z]{2,4}\d{4})"
-        result = re.search(pattern, course_name)
+        result = COURSE_CODE_PATTERN.search(course_name)
         return result.group(1)
 
     def get_course_name(course_name, course_raw):
@@ -765,9 +854,7 @@ def process_pdf(uploaded_pdf):
 
     def get_course_unit(course_raw):
         for i in course_raw:
-            if re.match(
-                r"\(\d{1}\s*(unit|UNIT).*\)", i.strip()
-            ):  # A new course pattern like string
+            if COURSE_UNIT_PATTERN.match(i.strip()):  # A new course pattern like string
                 # if "(" in i and ("unit" in i or "UNIT" in i):
                 return i.strip()[1:2]
 
@@ -775,12 +862,7 @@ def process_pdf(uploaded_pdf):
         buffer = list()
         start = 0
         for i in course_raw:
-            if (
-                "Course Description:" in i
-                or "Course  Description" in i
-                or "Description:" in i
-                or "Course Description" in i
-            ):
+            if is_description_heading(i):
                 start = 1
             if start:
                 buffer.append(i)
@@ -792,12 +874,7 @@ def process_pdf(uploaded_pdf):
         for i in course_raw:
             if "Pre-requisite(s):" in i:
                 start = 1
-            if (
-                "Course Description:" in i
-                or "Course  Description" in i
-                or "Description:" in i
-                or "Course Description" in i
-            ):
+            if is_description_heading(i):
                 start = 0
                 break
             if start:
@@ -839,7 +916,7 @@ def process_pdf(uploaded_pdf):
 
     for k, v in code_desc_dict.items():
         tv = [
-            line for line in v if not re.match(r"\d+ / \d+", line.strip())
+            line for line in v if not PAGE_NUMBER_PATTERN.match(line.strip())
         ]  # Clean up page number pattern
         temp = "".join("".join(tv).split(":")[1:]).strip()
         code_desc_dict[k] = temp
@@ -853,80 +930,366 @@ def process_pdf(uploaded_pdf):
     #         writer.writerow([k, v])
     # # end of course desc (debugging)
 
-    course_desc_dict = code_desc_dict
-    course_desc_processed = True
-
     # print("Done, Exiting") # debug
 
-    return f"Total {len(course_desc_dict.keys())} course descriptions found in the uploaded file."
+    return code_desc_dict
+
+
+def replace_course_data(courses, sections):
+    """
+        Replace all courses and sections with the given frames, keeping their IDs
+    """
+    # Drop existing data
+    db.session.query(Section).delete()
+    db.session.query(Course).delete()
+
+    # Reset auto increment ID
+    if db.engine.dialect.name == "mysql" or db.engine.dialect.name == "mariadb":
+        db.session.execute(text("ALTER TABLE section AUTO_INCREMENT = 1"))
+        db.session.execute(text("ALTER TABLE course AUTO_INCREMENT = 1"))
+
+    # IDs are assigned by normalize_course_data, sections link to them directly
+    rows = Course.bulk_insert(courses.to_dict("records"))
+    rows += Section.bulk_insert(sections.to_dict("records"))
+    return {"courses": len(courses), "sections": len(sections), "rows": rows}
+
+
+def swap_course_data(courses, sections, fence=None):
+    """
+        Load the frames into shadow tables and swap them in atomically, the old tables become `__prev`.
+        `fence` is called right before the swap.
+    """
+    with swap_lock([Course, Section]):
+        prepare_shadow_tables([Course, Section])
+        rows = Course.bulk_insert(courses.to_dict("records"), table=shadow_table(Course))
+        rows += Section.bulk_insert(sections.to_dict("records"), table=shadow_table(Section))
+        db.session.commit()
+
+        finish_shadow_tables({Course: len(courses), Section: len(sections)})
+        if fence is not None:
+            fence()
+        swap_tables([Course, Section])
+    return {"courses": len(courses), "sections": len(sections), "rows": rows}
+
+
+def diff_rows(current, incoming, key, columns):
+    """
+        Compare the current rows (with `id`) to the incoming rows by `key`.
+        Returns the incoming rows with new keys, the incoming rows whose `columns`
+        changed (carrying the current `id`), and the IDs of current rows no longer present.
+    """
+    current = current.set_index(key)
+    incoming = incoming.set_index(key)
+
+    inserts = incoming[~incoming.index.isin(current.index)]
+    deletes = current.loc[~current.index.isin(incoming.index), "id"]
+
+    common = incoming.index[incoming.index.isin(current.index)]
+    old = current.loc[common, columns]
+    new = incoming.loc[common, columns]
+    changed = ((old != new) & ~(old.isna() & new.isna())).any(axis=1)
+    updates = new[changed].assign(id=current.loc[common[changed.to_numpy()], "id"])
+
+    return inserts.reset_index(), updates.reset_index(drop=True), [int(id) for id in deletes]
+
+
+def with_occurrence(frame, key):
+    # Number repeated keys (e.g. several "1001 (default)" sections) so they pair up in order
+    return frame.assign(occurrence=frame.groupby(key, dropna=False).cumcount())
+
+
+def sync_course_data(courses, sections, compare_descriptions=True):
+    """
+        Apply only the difference between the given frames and the current tables.
+        Courses are matched on course_code, sections on (course_code, section_number, offer_semester),
+        so unchanged rows keep their IDs.
+    """
+    course_columns = [column for column in courses.columns if column != "id"]
+    if not compare_descriptions:
+        course_columns.remove("description")
+    section_columns = [column for column in sections.columns if column not in ("id", "course_id")]
+    section_key = ["course_code", "section_number", "offer_semester", "occurrence"]
+    section_values = [column for column in section_columns if column not in section_key]
+
+    connection = db.session.connection()
+    current_courses = pd.read_sql(select(Course.id, *(getattr(Course, column) for column in course_columns)), connection)
+    current_sections = pd.read_sql(
+        select(Section.id, Course.course_code, *(getattr(Section, column) for column in section_columns))
+        .join(Course, Course.id == Section.course_id)
+        .order_by(Section.id),
+        connection,
+    )
+
+    # Courses
+    course_inserts, course_updates, course_deletes = diff_rows(
+        current_courses, courses[course_columns], ["course_code"],
+        [column for column in course_columns if column != "course_code"],
+    )
+
+    # Sections
+    incoming_sections = sections.assign(course_code=sections["course_id"].map(courses.set_index("id")["course_code"]))
+    section_inserts, section_updates, section_deletes = diff_rows(
+        with_occurrence(current_sections, section_key[:-1]),
+        with_occurrence(incoming_sections, section_key[:-1])[section_key + section_values],
+        section_key,
+        section_values,
+    )
+
+    # Children before parents on delete, parents before children on insert
+    rows = Section.bulk_delete(section_deletes)
+    rows += Course.bulk_delete(course_deletes)
+    rows += Course.bulk_update(course_updates.to_dict("records"))
+    # The database assigns the IDs of new courses, courses added meanwhile through the API keep theirs
+    rows += Course.bulk_insert(course_inserts.to_dict("records"))
+    if len(course_inserts):
+        course_ids = pd.read_sql(select(Course.course_code, Course.id), connection).set_index("course_code")["id"]
+    else:
+        course_ids = current_courses.set_index("course_code")["id"]
+    section_inserts = section_inserts.assign(course_id=section_inserts["course_code"].map(course_ids)) \
+        .drop(columns=["course_code", "occurrence"])
+    rows += Section.bulk_update(section_updates.to_dict("records"))
+    rows += Section.bulk_insert(section_inserts.to_dict("records"))
+
+    return {
+        "courses": {"inserted": len(course_inserts), "updated": len(course_updates), "deleted": len(course_deletes)},
+        "sections": {"inserted": len(section_inserts), "updated": len(section_updates), "deleted": len(section_deletes)},
+        "rows": rows,
+    }
+
+
+"""
+    Background jobs
+"""
+
+@job_handler("timetable")
+def parse_timetable(job):
+    timetable_path = job.staging_path(job.id, job.filename)
+    key = upload_cache.cache_key("timetable", TIMETABLE_PARSER_VERSION, upload_cache.file_digest(timetable_path),
+                                 job.semester)
+    cached = upload_cache.load_frames(key, ("courses", "sections"))
+    if cached is not None:
+        courses, sections = cached["courses"], cached["sections"]
+    else:
+        job.report("Reading the timetable")
+        courses, sections = process_course_data(
+            timetable_path, job.semester, lambda rows: job.report("Reading the timetable", rows_done=rows)
+        )
+        upload_cache.store_frames(key, {"courses": courses, "sections": sections})
+
+    courses.to_pickle(job.staging_path(job.id, STAGED_COURSES))
+    sections.to_pickle(job.staging_path(job.id, STAGED_SECTIONS))
+    job.report("Staged", rows_done=len(sections), rows_total=len(sections))
+    return {
+        "courses": len(courses),
+        "sections": len(sections),
+        "cached": cached is not None,
+        "message": f"Total {len(courses)} courses and {len(sections)} sections found in the uploaded file.",
+    }
+
+
+@job_handler("descriptions")
+def parse_descriptions(job):
+    pdf_path = job.staging_path(job.id, job.filename)
+    key = upload_cache.cache_key("descriptions", DESCRIPTIONS_PARSER_VERSION, upload_cache.file_digest(pdf_path))
+    cached = upload_cache.load_frames(key, ("descriptions",))
+    if cached is not None:
+        frame = cached["descriptions"]
+        descriptions = dict(zip(frame["course_code"], frame["description"]))
+    else:
+        job.report("Extracting course descriptions")
+        descriptions = process_pdf(pdf_path)
+        upload_cache.store_frames(key, {"descriptions": pd.DataFrame(
+            {"course_code": list(descriptions.keys()), "description": list(descriptions.values())}
+        )})
+
+    with open(job.staging_path(job.id, STAGED_DESCRIPTIONS), "w", encoding="utf-8") as fp:
+        json.dump(descriptions, fp, ensure_ascii=False)
+    job.report("Staged", rows_done=len(descriptions), rows_total=len(descriptions))
+    return {
+        "descriptions": len(descriptions),
+        "cached": cached is not None,
+        "message": f"Total {len(descriptions)} course descriptions found in the uploaded file.",
+    }
+
+
+@job_handler("import")
+def import_courses(job):
+    job.report("Loading the staged data")
+    courses = pd.read_pickle(job.staging_path(job.timetable_job_id, STAGED_COURSES))
+    sections = pd.read_pickle(job.staging_path(job.timetable_job_id, STAGED_SECTIONS))
+    descriptions = dict()
+    if job.descriptions_job_id:
+        with open(job.staging_path(job.descriptions_job_id, STAGED_DESCRIPTIONS), encoding="utf-8") as fp:
+            descriptions = json.load(fp)
+
+    # Append course description if available
+    courses = courses.assign(description=[descriptions.get(code) for code in courses["course_code"]])
+
+    total = len(courses) + len(sections)
+    job.report(f"Importing ({job.mode})", rows_done=0, rows_total=total)
+    started = time.perf_counter()
+    if job.mode == "incremental":
+        # Without an uploaded PDF keep the descriptions already stored
+        result = sync_course_data(courses, sections, compare_descriptions=bool(job.descriptions_job_id))
+    elif job.mode == "swap":
+        result = swap_course_data(courses, sections, fence=job.fence)
+    else:
+        result = replace_course_data(courses, sections)
+    # Commit only if the job was not requeued meanwhile
+    job.fence()
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+
+    job.report("Imported", rows_done=total)
+    return {"mode": job.mode, **result, **import_stats(result["rows"], elapsed)}
+
+
+def staged_job(kind, job_id, after_id):
+    """
+        The upload job to import: the one given by ID, or the latest since the last import
+    """
+    if job_id is not None:
+        job = ImportJob.get_by_id(job_id)
+        return job if job is not None and job.kind == kind else None
+    return ImportJob.latest(kind, after_id)
 
 
 @course_ns.route("/import")
 class CourseImportApi(Resource):
+    @course_ns.param("mode", "replace (default): reload all rows, incremental: apply only the changes, "
+                             "swap: load shadow tables and swap them in (MySQL only)")
+    @course_ns.param("timetableJob", "Upload job of the timetable, the latest one by default")
+    @course_ns.param("descriptionsJob", "Upload job of the course descriptions, the latest one by default")
     @jwt_token_required
     @admin_required
     def post(self, cls):
-        global course_data, course_list, section_list, semester, course_desc_dict, course_data_processed, course_desc_processed
-        # Check if course_list, section_list is not empty
-        if not course_list or not section_list:
+        mode = request.args.get("mode", "replace")
+        if mode not in ("replace", "incremental", "swap"):
+            return {
+                "success": False,
+                "code": "INVALID_MODE",
+                "message": "Import mode must be replace, incremental or swap.",
+            }, HTTPStatus.BAD_REQUEST
+        if mode == "swap" and not supports_swap():
+            return {
+                "success": False,
+                "code": "SWAP_NOT_SUPPORTED",
+                "message": "Swap imports need MySQL or MariaDB.",
+            }, HTTPStatus.BAD_REQUEST
+
+        if ImportJob.active_import() is not None:
+            return {
+                "success": False,
+                "code": "IMPORT_IN_PROGRESS",
+                "message": "Another import is in progress.",
+            }, HTTPStatus.CONFLICT
+
+        # Uploads staged since the last successful import, unless given explicitly
+        last_import = ImportJob.latest("import", status="succeeded")
+        after_id = last_import.id if last_import else 0
+        timetable_job = staged_job("timetable", request.args.get("timetableJob", type=int), after_id)
+        descriptions_job = staged_job("descriptions", request.args.get("descriptionsJob", type=int), after_id)
+
+        if timetable_job is None or timetable_job.status == "failed":
             return {
                 "success": False,
                 "code": "COURSE_MISSING",
                 "message": "Required data is missing, please make sure that all required files have been uploaded and processed.",
             }, HTTPStatus.BAD_REQUEST
+        if not timetable_job.finished or (descriptions_job is not None and not descriptions_job.finished):
+            return {
+                "success": False,
+                "code": "UPLOAD_PROCESSING",
+                "message": "The uploaded files are still being processed.",
+            }, HTTPStatus.CONFLICT
+        if descriptions_job is not None and descriptions_job.status == "failed":
+            descriptions_job = None
+        if timetable_job.expired or (descriptions_job is not None and descriptions_job.expired):
+            return {
+                "success": False,
+                "code": "UPLOAD_EXPIRED",
+                "message": "The upload has expired, please upload the files again.",
+            }, HTTPStatus.BAD_REQUEST
+
+        job = ImportJob("import", user_id=self.id, semester=timetable_job.semester, mode=mode,
+                        timetable_job_id=timetable_job.id,
+                        descriptions_job_id=descriptions_job.id if descriptions_job else None)
+        enqueue(job)
+
+        return {
+            "success": True,
+            "code": "COURSE_IMPORT_QUEUED",
+            "message": "Course import started.",
+            "data": {"job": job.to_dict()},
+        }, HTTPStatus.ACCEPTED
+
+
+@course_ns.route("/jobs/<int:job_id>")
+class CourseJobApi(Resource):
+    @jwt_token_required
+    @admin_required
+    def get(self, cls, job_id):
+        """
+            Status, progress, row counts and timing of an upload or import job
+        """
+        job = ImportJob.get_by_id(job_id)
+        if job is None:
+            return {
+                "success": False,
+                "code": "JOB_NOT_FOUND",
+                "message": "Job not found.",
+            }, HTTPStatus.NOT_FOUND
+
+        return {
+            "success": True,
+            "code": "SUCCESS",
+            "message": "Success.",
+            "data": job.to_dict(),
+        }, HTTPStatus.OK
+
+
+@course_ns.route("/import/rollback")
+class CourseImportRollbackApi(Resource):
+    @jwt_token_required
+    @admin_required
+    def post(self, cls):
+        """
+            Swap the course and section tables back to the generation before the last swap import
+        """
+        if not supports_swap():
+            return {
+                "success": False,
+                "code": "SWAP_NOT_SUPPORTED",
+                "message": "Swap imports need MySQL or MariaDB.",
+            }, HTTPStatus.BAD_REQUEST
+        # The import would write to tables that are swapped away under it
+        if ImportJob.active_import() is not None:
+            return {
+                "success": False,
+                "code": "IMPORT_IN_PROGRESS",
+                "message": "An import is in progress.",
+            }, HTTPStatus.CONFLICT
         try:
-            # Drop existing data
-            db.session.query(Section).delete()
-            db.session.query(Course).delete()
-
-            # Reset auto increment ID
-            print(db.engine.dialect.name)
-            if db.engine.dialect.name == "mysql" or db.engine.dialect.name == "mariadb":
-                db.session.execute(text("ALTER TABLE section AUTO_INCREMENT = 1"))
-                db.session.execute(text("ALTER TABLE course AUTO_INCREMENT = 1"))
-
-            # Convert to SQLAlchemy model objects and commit to the database
-            for course_data in course_list:
-                # Append course description if available
-                course_data["description"] = course_desc_dict.get(
-                    course_data["course_code"], None
-                )
-                try:
-                    course = Course(**course_data)
-                    db.session.add(course)
-                except SQLAlchemyError as e:
-                    db.session.rollback()
-                    print(f"Failed to add course: {course_data}")
-                    return {
-                        "success": False,
-                        "code": "COURSE_IMPORT_FAILED",
-                        "message": str(e),
-                    }, HTTPStatus.INTERNAL_SERVER_ERROR
-
-            for section_data in section_list:
-                section = Section(**section_data)
-                db.session.add(section)
-
-            db.session.commit()
-        except SQLAlchemyError as e:
+            with swap_lock([Course, Section]):
+                rollback_tables([Course, Section])
+                db.session.commit()
+        except SwapInProgress as e:
             db.session.rollback()
             return {
                 "success": False,
-                "code": "COURSE_IMPORT_FAILED",
+                "code": "SWAP_IN_PROGRESS",
+                "message": str(e),
+            }, HTTPStatus.CONFLICT
+        except (SQLAlchemyError, SwapError) as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "code": "ROLLBACK_FAILED",
                 "message": str(e),
             }, HTTPStatus.INTERNAL_SERVER_ERROR
 
-        # Reset the data
-        course_data = pd.DataFrame()
-        course_list = []
-        section_list = []
-        semester = str()
-        course_desc_dict = dict()
-        course_data_processed = False
-        course_desc_processed = False
-
         return {
             "success": True,
-            "code": "COURSE_IMPORTED",
-            "message": "Course data imported.",
+            "code": "COURSE_IMPORT_ROLLED_BACK",
+            "message": "Course data rolled back to the previous import.",
         }, HTTPStatus.OK
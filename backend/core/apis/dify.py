@@ -1,17 +1,19 @@
 # -*- encoding: utf-8 -*-
 
 from http import HTTPStatus
-from flask import request, jsonify, Response, stream_with_context
+from flask import request, jsonify
 from flask_restx import Namespace, Resource, fields
 from functools import wraps
-import requests
 
 from core.config import BaseConfig
+from core.circuit_breaker import breakers
+from core.upstream import clients, dify_client, relay_stream
 
 from .user import jwt_token_required, admin_required
 
 dify_ns = Namespace(name="Dify API", description="A Proxy API for the Dify API")
 
+
 """
     Models
 """
@@ -37,26 +39,17 @@ class DIFYChatMessagesProxy(Resource):
 
         response_mode = data.get("response_mode", "")
         stream = response_mode == "streaming"
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/chat-messages"
+        dify_api_path = "/chat-messages"
 
-        response = requests.post(
-            url=dify_api_endpoint,
+        response = dify_client.post(
+            dify_api_path,
             headers=headers,
             json=data,
             stream=stream,
-            verify=False,
         )
 
         if stream:
-
-            def generate():
-                for chunk in response.iter_content(chunk_size=1024):
-                    yield chunk
-
-            return Response(
-                stream_with_context(generate()),
-                content_type=response.headers["Content-Type"],
-            )
+            return relay_stream(response)
         else:
             return response.json()
 
@@ -73,11 +66,9 @@ class DIFYMessagesProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/messages"
+        dify_api_path = "/messages"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
-        )
+        response = dify_client.get(dify_api_path, headers=headers, params=data)
 
         return response.json()
 
@@ -111,11 +102,9 @@ class DIFYSharedMessagesProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/messages"
+        dify_api_path = "/messages"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=new_data, verify=False
-        )
+        response = dify_client.get(dify_api_path, headers=headers, params=new_data)
 
         return response.json()
 
@@ -132,12 +121,13 @@ class DIFYMetaProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE + "/messages/" + message_id + "/suggested"
-        )
+        dify_api_path = "/messages/" + message_id + "/suggested"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
+        response = dify_client.get(
+            dify_api_path,
+            endpoint="/messages/{message_id}/suggested",
+            headers=headers,
+            params=data,
         )
 
         return response.json()
@@ -156,11 +146,9 @@ class DIFYConversationsProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/conversations"
+        dify_api_path = "/conversations"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
-        )
+        response = dify_client.get(dify_api_path, headers=headers, params=data)
 
         return response.json()
 
@@ -179,12 +167,13 @@ class DIFYConversationsRenameProxy(Resource):
             "Content-Type": "application/json",
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE + "/conversations/" + conversation_id + "/name"
-        )
+        dify_api_path = "/conversations/" + conversation_id + "/name"
 
-        response = requests.post(
-            url=dify_api_endpoint, headers=headers, json=data, verify=False
+        response = dify_client.post(
+            dify_api_path,
+            endpoint="/conversations/{conversation_id}/name",
+            headers=headers,
+            json=data,
         )
 
         return response.json()
@@ -206,12 +195,13 @@ class DIFYConversationsDeteleProxy(Resource):
             "Content-Type": "application/json",
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE + "/conversations/" + conversation_id
-        )
+        dify_api_path = "/conversations/" + conversation_id
 
-        response = requests.delete(
-            url=dify_api_endpoint, headers=headers, json=data, verify=False
+        response = dify_client.delete(
+            dify_api_path,
+            endpoint="/conversations/{conversation_id}",
+            headers=headers,
+            json=data,
         )
 
         return response.json()
@@ -229,11 +219,9 @@ class DIFYDatasetsProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_DATASET_API_KEY,
         }
 
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/datasets"
+        dify_api_path = "/datasets"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
-        )
+        response = dify_client.get(dify_api_path, headers=headers, params=data)
 
         return response.json()
 
@@ -250,12 +238,13 @@ class DIFYDatasetsDocumentsProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_DATASET_API_KEY,
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE + "/datasets/" + dataset_id + "/documents"
-        )
+        dify_api_path = "/datasets/" + dataset_id + "/documents"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
+        response = dify_client.get(
+            dify_api_path,
+            endpoint="/datasets/{dataset_id}/documents",
+            headers=headers,
+            params=data,
         )
         # print (response)
         return response.json()
@@ -272,15 +261,13 @@ class DIFYDatasetsDocumentsDeleteProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_DATASET_API_KEY,
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE
-            + "/datasets/"
-            + dataset_id
-            + "/documents/"
-            + document_id
-        )
+        dify_api_path = "/datasets/" + dataset_id + "/documents/" + document_id
 
-        response = requests.delete(url=dify_api_endpoint, headers=headers, verify=False)
+        response = dify_client.delete(
+            dify_api_path,
+            endpoint="/datasets/{dataset_id}/documents/{document_id}",
+            headers=headers,
+        )
 
         return response.json()
 
@@ -298,22 +285,49 @@ class DIFYDatasetsDocumentsCreateByFileProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_DATASET_API_KEY,
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE
-            + "/datasets/"
-            + dataset_id
-            + "/document/create-by-file"
-        )
+        dify_api_path = "/datasets/" + dataset_id + "/document/create-by-file"
 
         files = {"file": (file.filename, file, file.content_type)}
 
-        response = requests.post(
-            url=dify_api_endpoint, headers=headers, data=data, files=files, verify=False
+        response = dify_client.post(
+            dify_api_path,
+            endpoint="/datasets/{dataset_id}/document/create-by-file",
+            headers=headers,
+            data=data,
+            files=files,
         )
 
         return response.json()
 
 
+# 上游连接池与各接口延迟统计
+@dify_ns.route("/upstream/stats")
+class DIFYUpstreamStats(Resource):
+    @jwt_token_required
+    @admin_required
+    def get(self, cls):
+        return {
+            "success": True,
+            "code": "UPSTREAM_STATS",
+            "message": "Upstream client stats.",
+            "data": [client.stats() for client in clients.values()],
+        }, HTTPStatus.OK
+
+
+# 上游熔断器状态
+@dify_ns.route("/upstream/circuit-breakers")
+class DIFYUpstreamCircuitBreakers(Resource):
+    @jwt_token_required
+    @admin_required
+    def get(self, cls):
+        return {
+            "success": True,
+            "code": "CIRCUIT_BREAKERS",
+            "message": "Upstream circuit breaker states.",
+            "data": [breaker.to_dict() for breaker in breakers.values()],
+        }, HTTPStatus.OK
+
+
 """
 For demo only, not used in production
 """
@@ -332,26 +346,17 @@ class DIFYChatMessagesProxy(Resource):
 
         response_mode = data.get("response_mode", "")
         stream = response_mode == "streaming"
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/chat-messages"
+        dify_api_path = "/chat-messages"
 
-        response = requests.post(
-            url=dify_api_endpoint,
+        response = dify_client.post(
+            dify_api_path,
             headers=headers,
             json=data,
             stream=stream,
-            verify=False,
         )
 
         if stream:
-
-            def generate():
-                for chunk in response.iter_content(chunk_size=1024):
-                    yield chunk
-
-            return Response(
-                stream_with_context(generate()),
-                content_type=response.headers["Content-Type"],
-            )
+            return relay_stream(response)
         else:
             return response.json()
 
@@ -367,11 +372,9 @@ class DIFYMessagesProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/messages"
+        dify_api_path = "/messages"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
-        )
+        response = dify_client.get(dify_api_path, headers=headers, params=data)
 
         return response.json()
 
@@ -387,12 +390,13 @@ class DIFYMetaProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE + "/messages/" + message_id + "/suggested"
-        )
+        dify_api_path = "/messages/" + message_id + "/suggested"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
+        response = dify_client.get(
+            dify_api_path,
+            endpoint="/messages/{message_id}/suggested",
+            headers=headers,
+            params=data,
         )
 
         return response.json()
@@ -410,11 +414,9 @@ class DIFYConversationsProxy(Resource):
             "Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY,
         }
 
-        dify_api_endpoint = BaseConfig.DIFY_API_BASE + "/conversations"
+        dify_api_path = "/conversations"
 
-        response = requests.get(
-            url=dify_api_endpoint, headers=headers, params=data, verify=False
-        )
+        response = dify_client.get(dify_api_path, headers=headers, params=data)
 
         return response.json()
 
@@ -435,12 +437,13 @@ class DIFYConversationsDeteleProxy(Resource):
             "Content-Type": "application/json",
         }
 
-        dify_api_endpoint = (
-            BaseConfig.DIFY_API_BASE + "/conversations/" + conversation_id
-        )
+        dify_api_path = "/conversations/" + conversation_id
 
-        response = requests.delete(
-            url=dify_api_endpoint, headers=headers, json=data, verify=False
+        response = dify_client.delete(
+            dify_api_path,
+            endpoint="/conversations/{conversation_id}",
+            headers=headers,
+            json=data,
         )
 
         return response.json()
\ No newline at end of file
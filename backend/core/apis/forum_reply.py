@@ -6,6 +6,7 @@ from flask_restx import Namespace, Resource, fields
 from functools import wraps
 
 from core.config import BaseConfig
+from core.pagination import cursor_args, pagination_info
 from core.models import ForumThread, ForumReply
 
 from .user import jwt_token_required, admin_required
@@ -207,6 +208,8 @@ class ForumRepliesApi(Resource):
         type="integer",
         default=BaseConfig.PAGE_SIZE,
     )
+    @forum_reply_ns.param("cursor", "Cursor of the next page, empty for the first page (cursor mode)")
+    @forum_reply_ns.param("withTotal", "Count the total in cursor mode", type="boolean", default=False)
     @jwt_token_required
     def get(self, cls):
         data = request.args
@@ -232,8 +235,10 @@ class ForumRepliesApi(Resource):
         else:
             pageSize = BaseConfig.PAGE_SIZE
 
-        replies, total = ForumReply.get_replies_by_thread_id_paginated(
-            thread_id, current, pageSize
+        cursor, with_total = cursor_args(data)
+
+        replies, total, next_cursor = ForumReply.get_replies_by_thread_id_paginated(
+            thread_id, current, pageSize, cursor, with_total
         )
 
         return {
@@ -241,11 +246,7 @@ class ForumRepliesApi(Resource):
             "code": "SUCCESS",
             "message": "Success.",
             "data": {
-                "replies": [reply.to_dict() for reply in replies],
-                "pagination": {
-                    "current": current,
-                    "pageSize": pageSize,
-                    "total": total,
-                },
+                "replies": ForumReply.to_dict_list(replies),
+                "pagination": pagination_info(current, pageSize, total, cursor, next_cursor),
             },
         }, HTTPStatus.OK
@@ -6,6 +6,7 @@ from flask_restx import Namespace, Resource, fields
 from functools import wraps
 
 from core.config import BaseConfig
+from core.pagination import cursor_args, pagination_info
 from core.models import ForumThread, ForumReply
 
 from .user import admin_required, jwt_token_required
@@ -253,6 +254,8 @@ class ForumThreadsApi(Resource):
         type="integer",
         default=BaseConfig.PAGE_SIZE,
     )
+    @forum_thread_ns.param("cursor", "Cursor of the next page, empty for the first page (cursor mode)")
+    @forum_thread_ns.param("withTotal", "Count the total in cursor mode", type="boolean", default=False)
     @jwt_token_required
     def get(self, cls):
         data = request.args
@@ -276,39 +279,41 @@ class ForumThreadsApi(Resource):
         else:
             pageSize = BaseConfig.PAGE_SIZE
 
+        cursor, with_total = cursor_args(data)
+
+        snippets = None
         if keyword:
-            threads, total = ForumThread.search_threads_and_replies(
-                keyword, current, pageSize
+            threads, total, next_cursor = ForumThread.search_threads_and_replies(
+                keyword, current, pageSize, cursor, with_total
             )
+            snippets = ForumThread.get_search_snippets(threads, keyword)
         elif user_id:
-            threads, total = ForumThread.get_threads_by_user_id_paginated(
-                user_id, current, pageSize
+            threads, total, next_cursor = ForumThread.get_threads_by_user_id_paginated(
+                user_id, current, pageSize, cursor, with_total
             )
         elif thread_subject:
-            threads, total = ForumThread.get_threads_by_thread_subject_paginated(
-                thread_subject, current, pageSize
+            threads, total, next_cursor = ForumThread.get_threads_by_thread_subject_paginated(
+                thread_subject, current, pageSize, cursor, with_total
             )
         elif thread_text:
-            threads, total = ForumThread.get_threads_by_thread_text_paginated(
-                thread_text, current, pageSize
+            threads, total, next_cursor = ForumThread.get_threads_by_thread_text_paginated(
+                thread_text, current, pageSize, cursor, with_total
             )
         elif thread_category:
-            threads, total = ForumThread.get_threads_by_category_paginated(
-                thread_category, current, pageSize
+            threads, total, next_cursor = ForumThread.get_threads_by_category_paginated(
+                thread_category, current, pageSize, cursor, with_total
             )
         else:
-            threads, total = ForumThread.get_threads_paginated(current, pageSize)
+            threads, total, next_cursor = ForumThread.get_threads_paginated(
+                current, pageSize, cursor, with_total
+            )
 
         return {
             "success": True,
             "code": "THREADS_FOUND",
             "message": "Success.",
             "data": {
-                "threads": [thread.to_dict() for thread in threads],
-                "pagination": {
-                    "current": current,
-                    "pageSize": pageSize,
-                    "total": total,
-                },
+                "threads": ForumThread.to_dict_list(threads, snippets),
+                "pagination": pagination_info(current, pageSize, total, cursor, next_cursor),
             },
         }, HTTPStatus.OK
@@ -1,12 +1,13 @@
 # -*- encoding: utf-8 -*-
 
 from http import HTTPStatus
-from flask import request, jsonify, Response, stream_with_context
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from functools import wraps
-import requests
 
+from core import llm_cache
 from core.config import BaseConfig
+from core.upstream import chatgpt_client, relay_stream
 
 from .user import jwt_token_required, admin_required, teacher_required
 
@@ -47,15 +48,22 @@ class ChatGPTAPIProxy(Resource):
         }
 
         stream = data.get('stream', False)
-        chatgpt_api_endpoint = BaseConfig.CHATGPT_API_BASE + "/chat/completions"
-        
-        response = requests.post(chatgpt_api_endpoint, headers=headers, json=data, stream=stream)
 
-        if stream:
-            def generate():
-                for chunk in response.iter_content(chunk_size=1024):
-                    yield chunk
+        # Deterministic completions may be answered from the cache
+        cache_key = llm_cache.cache_key(data)
+        if cache_key is not None:
+            cached = llm_cache.lookup(cache_key)
+            if cached is not None:
+                return cached, HTTPStatus.OK, {llm_cache.CACHE_HEADER: "HIT"}
 
-            return Response(stream_with_context(generate()), content_type=response.headers['Content-Type'])
+        response = chatgpt_client.post("/chat/completions", headers=headers, json=data, stream=stream)
+
+        if stream:
+            return relay_stream(response)
+        elif cache_key is not None:
+            payload = response.json()
+            if response.status_code == HTTPStatus.OK:
+                llm_cache.store(cache_key, payload)
+            return payload, response.status_code, {llm_cache.CACHE_HEADER: "MISS"}
         else:
-            return jsonify(response.json())
+            return response.json(), response.status_code
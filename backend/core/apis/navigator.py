@@ -1,9 +1,12 @@
 # -*- encoding: utf-8 -*-
 
+import hashlib
+import json
 from http import HTTPStatus
-from flask import request
+from flask import Response, request
 from flask_restx import Namespace, Resource, fields
 
+from core.cache import TTLCache
 from core.config import BaseConfig
 from core.models import Category, WebAddress
 
@@ -93,6 +96,59 @@ delete_category_model = nav_ns.model('DeleteCategory', {
     'id': fields.Integer(required=True, description='Category ID')
 })
 
+"""
+    Navigator tree cache
+"""
+
+# Serialized response bodies of the read-only tree endpoints, keyed by endpoint.
+# Writes in this process clear it, the TTL bounds staleness across workers.
+navigator_cache = TTLCache(BaseConfig.NAVIGATOR_CACHE_SIZE, BaseConfig.NAVIGATOR_CACHE_TTL)
+
+
+def invalidate_navigator_cache():
+    navigator_cache.clear()
+
+
+def cached_json_response(key, build):
+    """
+        Serve a JSON body built by `build` from the navigator cache with an ETag,
+        answers 304 when the client already has the current version.
+        Returns None when `build` has nothing to serve.
+    """
+    entry = navigator_cache.get(key)
+    if entry is None:
+        payload = build()
+        if payload is None:
+            return None
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = (body, hashlib.sha256(body).hexdigest()[:32])
+        navigator_cache.set(key, entry)
+
+    body, etag = entry
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # always revalidate, the 304 is cheap
+    return response.make_conditional(request)
+
+
+def build_categories():
+    categories = Category.get_category_tree()
+    if not categories:
+        return None
+    return {"success": True, "code": "CATEGORIES_FOUND", "data": [category.to_dict() for category in categories]}
+
+
+def build_all():
+    data = []
+    for category in Category.get_category_tree():
+        data.append({
+            "name": category.name,
+            "name_en": category.name_en,
+            "cover": category.cover,
+            "web_addresses": [web_address.to_dict() for web_address in category.web_addresses]
+        })
+    return {"success": True, "code": "DATA_FOUND", "data": data}
+
 """
     Flask-Restx routes
 """
@@ -121,6 +177,7 @@ class CategoryApi(Resource):
             return {"success": False, "code": "CATEGORY_EXISTS", "message": "Category already exists."}, HTTPStatus.BAD_REQUEST
         
         category = Category.add_category(name, name_en, abbreviation, dept_website, cover)
+        invalidate_navigator_cache()
         if category:
             return {"success": True, "code": "CATEGORY_ADDED", "message": "Category added.", "category": category.to_dict()}, HTTPStatus.CREATED
         else:
@@ -163,6 +220,7 @@ class CategoryApi(Resource):
             return {"success": False, "code": "CATEGORY_NOT_FOUND", "message": "Category not found."}, HTTPStatus.NOT_FOUND
         
         category = Category.update_category(category_id, name, name_en, abbreviation, dept_website, cover)
+        invalidate_navigator_cache()
         if category:
             return {"success": True, "code": "CATEGORY_UPDATED", "message": "Category updated.", "data": category.to_dict()}, HTTPStatus.OK
         else:
@@ -183,6 +241,7 @@ class CategoryApi(Resource):
             return {"success": False, "code": "CATEGORY_NOT_FOUND", "message": "Category not found."}, HTTPStatus.NOT_FOUND
         
         if Category.delete_category(category_id):
+            invalidate_navigator_cache()
             return {"success": True, "code": "CATEGORY_DELETED", "message": "Category deleted."}, HTTPStatus.OK
         else:
             return {"success": False, "code": "CATEGORY_NOT_DELETED", "message": "Category not deleted."}, HTTPStatus.INTERNAL_SERVER_ERROR
@@ -219,6 +278,7 @@ class CategoryByIdApi(Resource):
             return {"success": False, "code": "CATEGORY_NOT_FOUND", "message": "Category not found."}, HTTPStatus.NOT_FOUND
         
         category = Category.update_category(id, name, name_en, abbreviation, dept_website, cover)
+        invalidate_navigator_cache()
         if category:
             return {"success": True, "code": "CATEGORY_UPDATED", "message": "Category updated.", "data": category.to_dict()}, HTTPStatus.OK
         else:
@@ -233,6 +293,7 @@ class CategoryByIdApi(Resource):
             return {"success": False, "code": "CATEGORY_NOT_FOUND", "message": "Category not found."}, HTTPStatus.NOT_FOUND
         
         if Category.delete_category(id):
+            invalidate_navigator_cache()
             return {"success": True, "code": "CATEGORY_DELETED", "message": "Category deleted."}, HTTPStatus.OK
         else:
             return {"success": False, "code": "CATEGORY_NOT_DELETED", "message": "Category not deleted."}, HTTPStatus.INTERNAL_SERVER_ERROR
@@ -242,9 +303,9 @@ class CategoryByIdApi(Resource):
 class CategoriesApi(Resource):
     @jwt_token_required
     def get(self, cls):
-        categories = Category.get_all_categories()
-        if categories:
-            return {"success": True, "code": "CATEGORIES_FOUND", "data": [category.to_dict() for category in categories]}, HTTPStatus.OK
+        response = cached_json_response("categories", build_categories)
+        if response is not None:
+            return response
         else:
             return {"success": False, "code": "CATEGORIES_NOT_FOUND", "message": "No categories found."}, HTTPStatus.NOT_FOUND
 
@@ -278,6 +339,7 @@ class WebAddressApi(Resource):
         
         # 添加新网址
         web_address = WebAddress.add_web_address(category_id, url, icon, title, title_en, subtitle, subtitle_en, description, description_en)
+        invalidate_navigator_cache()
         if web_address:
             return {"success": True, "code": "WEBADDR_ADDED", "message": "Web address added.", "web_address": web_address.to_dict()}, HTTPStatus.CREATED
         else:
@@ -328,6 +390,7 @@ class WebAddressApi(Resource):
 
         # 更新网址
         web_address = WebAddress.update_web_address(id, category_id, url, icon, title, title_en, subtitle, subtitle_en, description, description_en)
+        invalidate_navigator_cache()
         if web_address:
             return {"success": True, "code": "WEBADDR_UPDATED", "message": "Web address updated.", "data": web_address.to_dict()}, HTTPStatus.OK
         else:
@@ -348,6 +411,7 @@ class WebAddressApi(Resource):
             return {"success": False, "code": "WEBADDR_NOT_FOUND", "message": "Web address not found."}, HTTPStatus.NOT_FOUND
         
         if WebAddress.delete_web_address(id):
+            invalidate_navigator_cache()
             return {"success": True, "code": "WEBADDR_DELETED", "message": "Web address deleted."}, HTTPStatus.OK
         else:
             return {"success": False, "code": "WEBADDR_NOT_DELETED", "message": "Web address not deleted."}, HTTPStatus.INTERNAL_SERVER_ERROR
@@ -391,6 +455,7 @@ class WebAddressByIdApi(Resource):
 
         # 更新网址
         web_address = WebAddress.update_web_address(id, category_id, url, icon, title, title_en, subtitle, subtitle_en, description, description_en)
+        invalidate_navigator_cache()
         if web_address:
             return {"success": True, "code": "WEBADDR_UPDATED", "message": "Web address updated.", "data": web_address.to_dict()}, HTTPStatus.OK
         else:
@@ -405,6 +470,7 @@ class WebAddressByIdApi(Resource):
             return {"success": False, "code": "WEBADDR_NOT_FOUND", "message": "Web address not found."}, HTTPStatus.NOT_FOUND
 
         if WebAddress.delete_web_address(id):
+            invalidate_navigator_cache()
             return {"success": True, "code": "WEBADDR_DELETED", "message": "Web address deleted."}, HTTPStatus.OK
         else:
             return {"success": False, "code": "WEBADDR_NOT_DELETED", "message": "Web address not deleted."}, HTTPStatus.INTERNAL_SERVER_ERROR
@@ -434,16 +500,4 @@ class web_addressesApi(Resource):
 class AllApi(Resource):
     @jwt_token_required
     def get(self, cls):
-        categories = Category.get_all_categories()
-        web_addresses = WebAddress.get_all_web_addresses()
-
-        data = []
-        for category in categories:
-            data.append({
-                "name": category.name,
-                "name_en": category.name_en,
-                "cover": category.cover,
-                "web_addresses": web_addresses
-            })
-        
-        return {"success": True, "code": "DATA_FOUND", "data": data}, HTTPStatus.OK
+        return cached_json_response("all", build_all)
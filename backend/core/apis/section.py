@@ -5,6 +5,7 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 
 from core.config import BaseConfig
+from core.pagination import cursor_args, pagination_info
 from core.models import Course, Section
 from core.models import db
 
@@ -345,6 +346,8 @@ class SectionsApi(Resource):
         type="integer",
         default=BaseConfig.PAGE_SIZE,
     )
+    @section_ns.param("cursor", "Cursor of the next page, empty for the first page (cursor mode)")
+    @section_ns.param("withTotal", "Count the total in cursor mode", type="boolean", default=False)
     @jwt_token_required
     def get(self, cls):
         data = request.args
@@ -355,24 +358,27 @@ class SectionsApi(Resource):
 
         current = data.get("current", 1, type=int)
         pageSize = data.get("pageSize", BaseConfig.PAGE_SIZE, type=int)
+        cursor, with_total = cursor_args(data)
 
         # if not course_id and not course_code:
         #     return {"success": False, "code": "COURSE_IDENTIFIER_MISSING", "message": "Course ID or course code is required."}, HTTPStatus.BAD_REQUEST
 
         if course_id and course_id != "null":
-            sections, total = Section.get_sections_by_course_id_paginated(
-                course_id, current, pageSize
+            sections, total, next_cursor = Section.get_sections_by_course_id_paginated(
+                course_id, current, pageSize, cursor, with_total
             )
         elif course_code and course_code != "null":
-            sections, total = Section.get_sections_by_course_code_paginated(
-                course_code, current, pageSize
+            sections, total, next_cursor = Section.get_sections_by_course_code_paginated(
+                course_code, current, pageSize, cursor, with_total
             )
         elif keyword:
-            sections, total = Section.get_sections_by_keyword_paginated(
-                keyword, current, pageSize
+            sections, total, next_cursor = Section.get_sections_by_keyword_paginated(
+                keyword, current, pageSize, cursor, with_total
             )
         else:
-            sections, total = Section.get_all_sections_paginated(current, pageSize)
+            sections, total, next_cursor = Section.get_all_sections_paginated(
+                current, pageSize, cursor, with_total
+            )
 
         return {
             "success": True,
@@ -380,10 +386,6 @@ class SectionsApi(Resource):
             "message": "Success.",
             "data": {
                 "sections": [section.to_dict() for section in sections],
-                "pagination": {
-                    "total": total,
-                    "current": current,
-                    "pageSize": pageSize,
-                },
+                "pagination": pagination_info(current, pageSize, total, cursor, next_cursor),
             },
         }, HTTPStatus.OK
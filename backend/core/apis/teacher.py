@@ -1,145 +1,287 @@
 import requests
+import hashlib
 import json
+import time
 from http import HTTPStatus
 from flask import request
 from flask_restx import Namespace, Resource
 from sqlalchemy.exc import SQLAlchemyError
+from core.config import BaseConfig
 from core.models import Teacher, TeacherInfo
 from core.models import db
+from core.models.jwt_token_blocklist import utcnow
+from core.staff_directory import StaffDirectoryCrawler
+from core.swap import SwapError, SwapInProgress, prepare_shadow_tables, finish_shadow_tables, rollback_tables, shadow_table, supports_swap, swap_lock, swap_tables
+from core.utils import import_stats
 from .user import jwt_token_required, admin_required
-from sqlalchemy import text
+from sqlalchemy import func, text
 
 teacher_ns = Namespace(name="Teacher", description="Teacher related APIs")
 
 
+def record_hash(teacher):
+    # SHA-256 of the canonical JSON of a staff directory record
+    data = json.dumps(teacher, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def build_teacher_row(teacher):
+    """
+        Teacher columns of a staff directory record, without the ID
+    """
+    return dict(
+        mis_id=teacher.get("id"),
+        name=(
+            teacher.get("name") + " " + teacher.get("name_en")
+            if teacher.get("name_en") != teacher.get("name")
+            else teacher.get("name_en")
+        ),
+        name_en=teacher.get("name_en"),
+        email=teacher.get("email"),
+        gender="M" if teacher.get("gender") == 1 else "F",
+        title=teacher.get("teacher_title", {}).get("title_en"),
+        first_name=teacher.get("first"),
+        middle_name=teacher.get("middle"),
+        last_name=teacher.get("last"),
+        username=teacher.get("username"),
+        nationality=teacher.get("nation"),
+        phone=teacher.get("telephone"),
+        phone_short=teacher.get("telephone_short"),
+        employee_number=teacher.get("number"),
+        office_room=teacher.get("room"),
+        position=teacher.get("position"),
+        photo_url=(
+            f"https://staff.uic.edu.cn{teacher.get('photo')}"
+            if teacher.get("photo")
+            else ""
+        ),
+        record_hash=record_hash(teacher),
+        deleted_at=None,
+    )
+
+
+def build_teacher_info_rows(teacher, teacher_id):
+    """
+        TeacherInfo columns of a staff directory record, one row per language
+    """
+    rows = []
+    # 创建 TeacherInfo 记录
+    if isinstance(teacher.get("info"), dict):
+        for lang, info in teacher["info"].items():
+            # 防脏数据检查：检查 info 是否为 []，如果是，则转换为空 dict()
+            if isinstance(info, list):
+                # print("WARNING EMPTY INFO: lang={}, id={}".format(lang, teacher_id))
+                info = dict()
+            rows.append(dict(
+                teacher_id=teacher_id,
+                lang=lang,
+                admin_title=(
+                    teacher["teacher_title"].get("admin_title_en", "")
+                    if lang == "en"
+                    else teacher["teacher_title"].get("admin_title", "")
+                ),
+                academic_title=(
+                    teacher["teacher_title"].get("title_en", "")
+                    if lang == "en"
+                    else teacher["teacher_title"].get("title", "")
+                ),
+                academic=info.get("academic", ""),
+                education=info.get("education", ""),
+                timetable_name=info.get("timetable", {}).get("name", ""),
+                timetable_url=(
+                    f"https://staff.uic.edu.cn{info.get('timetable', {}).get('url', '')}"
+                    if info.get("timetable", {}).get("url")
+                    else ""
+                ),
+                tutor_type=info.get("tutor_type", ""),
+                timetable_file_name=info.get("timetable_file_name", ""),
+                research_file_url=info.get("research_file", ""),
+                research_file_name=info.get("research_file_name", ""),
+                publications_file_url=info.get("publications_file", ""),
+                publications_file_name=info.get(
+                    "publications_file_name", ""
+                ),
+                special_honor=info.get("special_honor", ""),
+            ))
+    return rows
+
+
+def number_teachers(teachers):
+    # 预先分配教师 ID，TeacherInfo 直接引用，无需逐条 flush
+    teacher_rows = []
+    teacher_info_rows = []
+    for teacher_id, teacher in enumerate(teachers, start=1):
+        teacher_rows.append(dict(id=teacher_id, **build_teacher_row(teacher)))
+        teacher_info_rows.extend(build_teacher_info_rows(teacher, teacher_id))
+    return teacher_rows, teacher_info_rows
+
+
+def replace_teacher_data(teachers):
+    """
+        Delete all teachers and insert the given records, IDs are assigned from 1
+    """
+    teacher_rows, teacher_info_rows = number_teachers(teachers)
+
+    # 清空现有数据
+    db.session.query(TeacherInfo).delete()
+    db.session.query(Teacher).delete()
+
+    # 判断数据库dialect，重置自增 ID
+    if db.engine.dialect.name == "mysql" or db.engine.dialect.name == "mariadb":
+        db.session.execute(text("ALTER TABLE teacher_info AUTO_INCREMENT = 1"))
+        db.session.execute(text("ALTER TABLE teacher AUTO_INCREMENT = 1"))
+
+    rows = Teacher.bulk_insert(teacher_rows)
+    rows += TeacherInfo.bulk_insert(teacher_info_rows)
+    return {"teachers": len(teacher_rows), "rows": rows}
+
+
+def swap_teacher_data(teachers):
+    """
+        Load the records into shadow tables and swap them in atomically, the old tables become `__prev`
+    """
+    teacher_rows, teacher_info_rows = number_teachers(teachers)
+
+    # 写入影子表，校验后原子替换，旧表保留为 __prev
+    with swap_lock([Teacher, TeacherInfo]):
+        prepare_shadow_tables([Teacher, TeacherInfo])
+        rows = Teacher.bulk_insert(teacher_rows, table=shadow_table(Teacher))
+        rows += TeacherInfo.bulk_insert(teacher_info_rows, table=shadow_table(TeacherInfo))
+        db.session.commit()
+        finish_shadow_tables({Teacher: len(teacher_rows), TeacherInfo: len(teacher_info_rows)})
+        swap_tables([Teacher, TeacherInfo])
+    return {"teachers": len(teacher_rows), "rows": rows}
+
+
+def sync_teacher_data(teachers):
+    """
+        Apply only the changed staff directory records, matched on mis_id by their record hash.
+        Teachers keep their IDs, info rows are matched on (teacher, language),
+        teachers no longer listed are soft-deleted and restored if they come back.
+    """
+    current = {
+        mis_id: (id, digest, deleted_at)
+        for id, mis_id, digest, deleted_at in db.session.query(
+            Teacher.id, Teacher.mis_id, Teacher.record_hash, Teacher.deleted_at
+        )
+    }
+    next_id = (db.session.query(func.max(Teacher.id)).scalar() or 0) + 1
+
+    inserts, updates, info_rows = [], [], []
+    listed = set()
+    for teacher in teachers:
+        row = build_teacher_row(teacher)
+        listed.add(row["mis_id"])
+        existing = current.get(row["mis_id"])
+        if existing is None:
+            row["id"] = next_id
+            next_id += 1
+            inserts.append(row)
+        elif existing[1] != row["record_hash"] or existing[2] is not None:
+            row["id"] = existing[0]
+            updates.append(row)
+        else:
+            continue
+        info_rows.extend(build_teacher_info_rows(teacher, row["id"]))
+
+    now = utcnow()
+    departures = [
+        {"id": id, "deleted_at": now}
+        for mis_id, (id, _, deleted_at) in current.items()
+        if mis_id not in listed and deleted_at is None
+    ]
+
+    # Info rows of the updated teachers, by (teacher, language)
+    current_info = dict()
+    updated_ids = [row["id"] for row in updates]
+    for start in range(0, len(updated_ids), BaseConfig.IMPORT_CHUNK_SIZE):
+        chunk = updated_ids[start:start + BaseConfig.IMPORT_CHUNK_SIZE]
+        for id, teacher_id, lang in db.session.query(TeacherInfo.id, TeacherInfo.teacher_id, TeacherInfo.lang) \
+                .filter(TeacherInfo.teacher_id.in_(chunk)):
+            current_info[(teacher_id, lang)] = id
+    info_inserts, info_updates = [], []
+    for row in info_rows:
+        id = current_info.pop((row["teacher_id"], row["lang"]), None)
+        if id is None:
+            info_inserts.append(row)
+        else:
+            info_updates.append(dict(id=id, **row))
+
+    rows = TeacherInfo.bulk_delete(list(current_info.values()))
+    rows += Teacher.bulk_update(updates)
+    rows += Teacher.bulk_insert(inserts)
+    rows += Teacher.bulk_update(departures)
+    rows += TeacherInfo.bulk_update(info_updates)
+    rows += TeacherInfo.bulk_insert(info_inserts)
+
+    return {
+        "teachers": {
+            "inserted": len(inserts),
+            "updated": len(updates),
+            "deleted": len(departures),
+            "unchanged": len(teachers) - len(inserts) - len(updates),
+        },
+        "rows": rows,
+    }
+
+
 @teacher_ns.route("/import")
 class TeacherImportApi(Resource):
+    @teacher_ns.param("mode", "replace (default): reload the tables in place, "
+                              "incremental: apply only the changed records, keeping teacher IDs, "
+                              "swap: load shadow tables and swap them in (MySQL only)")
     @jwt_token_required
     @admin_required
     def post(self, cls):
         """
         Import teachers from UIC website
         """
+        mode = request.args.get("mode", "replace")
+        if mode not in ("replace", "incremental", "swap"):
+            return {
+                "success": False,
+                "code": "INVALID_MODE",
+                "message": "Import mode must be replace, incremental or swap.",
+            }, HTTPStatus.BAD_REQUEST
+        if mode == "swap" and not supports_swap():
+            return {
+                "success": False,
+                "code": "SWAP_NOT_SUPPORTED",
+                "message": "Swap imports need MySQL or MariaDB.",
+            }, HTTPStatus.BAD_REQUEST
+
         try:
-            # 从指定 URL 获取数据
-            base_url = "https://staff.uic.edu.cn/teacher/teacher/list?access-token=&page={}&pageSize=500&key=&lang=en"
-            page = 0
-            teachers = []
-            while True:
-                response = requests.get(base_url.format(page))
-                response.raise_for_status()  # 检查请求是否成功
-                data = response.json()
-                total = data.get("data", {}).get("total", 0)
-                # print(f"Total teachers: {total}")
-                # print(f"Page {page + 1}/{(total + 499) // 500}")
-                page_teachers = data.get("data", {}).get("data", [])
-                if not page_teachers:
-                    break
-                teachers.extend(page_teachers)
-                page += 1
-                if len(teachers) >= total:
-                    break
-            teachers.sort(key=lambda x: x.get("id"))  # 排序教师列表
+            # 从教职员目录获取数据（并发分页，带超时与重试）
+            with StaffDirectoryCrawler() as crawler:
+                teachers = crawler.fetch_all()
             # debug: write teachers to file
             # with open('teacher-list.json', 'w', encoding='utf-8') as file:
             #     json.dump({"data": teachers}, file, ensure_ascii=False, indent=4)
 
-            # for debug in teachers:
-            #     print(teachers.index(debug), debug.get('username'))
-
-            # 清空现有数据
-            db.session.query(TeacherInfo).delete()
-            db.session.query(Teacher).delete()
-
-            # 判断数据库dialect，重置自增 ID
-            print(db.engine.dialect.name)
-            if db.engine.dialect.name == "mysql" or db.engine.dialect.name == "mariadb":
-                db.session.execute(text("ALTER TABLE teacher_info AUTO_INCREMENT = 1"))
-                db.session.execute(text("ALTER TABLE teacher AUTO_INCREMENT = 1"))
-
-            for teacher in teachers:
-                # 创建 Teacher 实例
-                teacher_instance = Teacher(
-                    id=None,
-                    mis_id=teacher.get("id"),
-                    name=(
-                        teacher.get("name") + " " + teacher.get("name_en")
-                        if teacher.get("name_en") != teacher.get("name")
-                        else teacher.get("name_en")
-                    ),
-                    name_en=teacher.get("name_en"),
-                    email=teacher.get("email"),
-                    gender="M" if teacher.get("gender") == 1 else "F",
-                    title=teacher.get("teacher_title", {}).get("title_en"),
-                    first_name=teacher.get("first"),
-                    middle_name=teacher.get("middle"),
-                    last_name=teacher.get("last"),
-                    username=teacher.get("username"),
-                    nationality=teacher.get("nation"),
-                    phone=teacher.get("telephone"),
-                    phone_short=teacher.get("telephone_short"),
-                    employee_number=teacher.get("number"),
-                    office_room=teacher.get("room"),
-                    position=teacher.get("position"),
-                    photo_url=(
-                        f"https://staff.uic.edu.cn{teacher.get('photo')}"
-                        if teacher.get("photo")
-                        else ""
-                    ),
-                )
-                db.session.add(teacher_instance)
-                db.session.flush()  # 获取教师 ID
-
-                # 创建 TeacherInfo 实例
-                if isinstance(teacher.get("info"), dict):
-                    for lang, info in teacher["info"].items():
-                        # print(teacher_instance.id, teacher_instance.mis_id)
-                        # 防脏数据检查：检查 info 是否为 []，如果是，则转换为空 dict()
-                        if isinstance(info, list):
-                            # print("WARNING EMPTY INFO: lang={}, id={}, name={}".format(lang, teacher_instance.id, teacher_instance.name))
-                            info = dict()
-                        teacher_info_instance = TeacherInfo(
-                            id=None,
-                            teacher_id=teacher_instance.id,
-                            lang=lang,
-                            admin_title=(
-                                teacher["teacher_title"].get("admin_title_en", "")
-                                if lang == "en"
-                                else teacher["teacher_title"].get("admin_title", "")
-                            ),
-                            academic_title=(
-                                teacher["teacher_title"].get("title_en", "")
-                                if lang == "en"
-                                else teacher["teacher_title"].get("title", "")
-                            ),
-                            academic=info.get("academic", ""),
-                            education=info.get("education", ""),
-                            timetable_name=info.get("timetable", {}).get("name", ""),
-                            timetable_url=(
-                                f"https://staff.uic.edu.cn{info.get('timetable', {}).get('url', '')}"
-                                if info.get("timetable", {}).get("url")
-                                else ""
-                            ),
-                            tutor_type=info.get("tutor_type", ""),
-                            timetable_file_name=info.get("timetable_file_name", ""),
-                            research_file_url=info.get("research_file", ""),
-                            research_file_name=info.get("research_file_name", ""),
-                            publications_file_url=info.get("publications_file", ""),
-                            publications_file_name=info.get(
-                                "publications_file_name", ""
-                            ),
-                            special_honor=info.get("special_honor", ""),
-                        )
-                        db.session.add(teacher_info_instance)
-
+            started = time.perf_counter()
+            if mode == "incremental":
+                result = sync_teacher_data(teachers)
+            elif mode == "swap":
+                result = swap_teacher_data(teachers)
+            else:
+                result = replace_teacher_data(teachers)
             db.session.commit()
+            elapsed = time.perf_counter() - started
             return {
                 "success": True,
                 "code": "TEACHERS_IMPORTED",
                 "message": "Teacher data imported.",
+                "data": {"mode": mode, **result, **import_stats(result["rows"], elapsed)},
             }, HTTPStatus.OK
 
-        except SQLAlchemyError as e:
+        except SwapInProgress as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "code": "SWAP_IN_PROGRESS",
+                "message": str(e),
+            }, HTTPStatus.CONFLICT
+        except (SQLAlchemyError, SwapError) as e:
             db.session.rollback()
             return {
                 "success": False,
@@ -158,3 +300,43 @@ class TeacherImportApi(Resource):
                 "code": "UNKNOWN_ERROR",
                 "message": str(e),
             }, HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@teacher_ns.route("/import/rollback")
+class TeacherImportRollbackApi(Resource):
+    @jwt_token_required
+    @admin_required
+    def post(self, cls):
+        """
+        Swap the teacher tables back to the generation before the last swap import
+        """
+        if not supports_swap():
+            return {
+                "success": False,
+                "code": "SWAP_NOT_SUPPORTED",
+                "message": "Swap imports need MySQL or MariaDB.",
+            }, HTTPStatus.BAD_REQUEST
+        try:
+            with swap_lock([Teacher, TeacherInfo]):
+                rollback_tables([Teacher, TeacherInfo])
+                db.session.commit()
+        except SwapInProgress as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "code": "SWAP_IN_PROGRESS",
+                "message": str(e),
+            }, HTTPStatus.CONFLICT
+        except (SQLAlchemyError, SwapError) as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "code": "ROLLBACK_FAILED",
+                "message": str(e),
+            }, HTTPStatus.INTERNAL_SERVER_ERROR
+
+        return {
+            "success": True,
+            "code": "TEACHER_IMPORT_ROLLED_BACK",
+            "message": "Teacher data rolled back to the previous import.",
+        }, HTTPStatus.OK
@@ -7,9 +7,12 @@ from flask import request, render_template
 from flask_mail import Message
 from flask_restx import Namespace, Resource, fields
 from functools import wraps
+import time
 import jwt
 
+from core.cache import TTLCache
 from core.config import BaseConfig
+from core.pagination import cursor_args, pagination_info
 from core.models import User, JWTTokenBlocklist
 
 from core.utils import mail
@@ -79,46 +82,83 @@ change_user_type_model = user_ns.model("ChangeUserType", {
     "user_type": fields.String(required=True, description="User type", example="TEACHER")
 })
 
+"""
+   Authenticated principal cache
+"""
+
+# token digest -> {"claims": decoded token, "user": user snapshot}
+principal_cache = TTLCache(BaseConfig.PRINCIPAL_CACHE_SIZE, BaseConfig.PRINCIPAL_CACHE_TTL)
+
+def invalidate_user_principals(user_id):
+    """
+       Drop every cached principal of the user, call it whenever the user's status fields change
+    """
+    principal_cache.pop_where(lambda principal: principal["user"]["id"] == user_id)
+
 """
    JWT token required
 """
+def authenticate(token):
+    """
+       Check the value of an Authorization header, returns (user, None) when it is valid
+       and (None, (response body, status)) otherwise. Also used by the async gateway.
+    """
+    if not token:
+        return None, ({"success": False, "code": "NO_TOKEN", "message": "No token provided."}, 401)
+    
+    # check if the token starts with "Bearer "
+    if not token.startswith("Bearer "):
+        return None, ({"success": False, "code": "INVALID_TOKEN", "message": "Invalid token format."}, 401)
+    
+    # extract the token value
+    token = token.split(" ")[1]
+    
+    # use the cached principal if the token has been verified recently
+    digest = JWTTokenBlocklist.digest(token)
+    principal = principal_cache.get(digest)
+    if principal:
+        if principal["claims"]["exp"] <= time.time():
+            principal_cache.pop(digest)
+            return None, ({"success": False, "code": "EXPIRED_TOKEN", "message": "Expired token."}, 401)
+        # another process may have blocklisted the token since it was cached
+        if JWTTokenBlocklist.is_token_blocklisted(token):
+            principal_cache.pop(digest)
+            return None, ({"success": False, "code": "INVALID_TOKEN", "message": "Token is in the blocklist. The user has already logged out."}, 401)
+        return User.from_snapshot(principal["user"]), None
+    
+    try:
+        token_data = jwt.decode(token, BaseConfig.JWT_SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        return None, ({"success": False, "code": "EXPIRED_TOKEN", "message": "Expired token."}, 401)
+    except jwt.InvalidTokenError:
+        return None, ({"success": False, "code": "INVALID_TOKEN", "message": "Invalid token."}, 401)
+    
+    # check if the token is in the blocklist
+    user = User.get_by_email(token_data["email"])
+    
+    # check if the user exists
+    if not user:
+        return None, ({"success": False, "code": "INVALID_TOKEN", "message": "Invalid user."}, 401)
+    # check if the token is in the blocklist
+    if JWTTokenBlocklist.is_token_blocklisted(token):
+        return None, ({"success": False, "code": "INVALID_TOKEN", "message": "Token is in the blocklist. The user has already logged out."}, 401)
+    # check if the user is active
+    if not user.check_jwt_auth_active():
+        return None, ({"success": False, "code": "INVALID_TOKEN", "message": "Token is invalid. The user has already logged out."}, 401)
+    
+    principal_cache.set(digest, {"claims": token_data, "user": user.to_snapshot()})
+    
+    return user, None
+
 def jwt_token_required(func):
     """
        Decorator function to check if the user is authenticated
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        
-        if not token:
-            return {"success": False, "code": "NO_TOKEN", "message": "No token provided."}, 401
-        
-        # check if the token starts with "Bearer "
-        if not token.startswith("Bearer "):
-            return {"success": False, "code": "INVALID_TOKEN", "message": "Invalid token format."}, 401
-        
-        # extract the token value
-        token = token.split(" ")[1]
-        
-        try:
-            token_data = jwt.decode(token, BaseConfig.JWT_SECRET_KEY, algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            return {"success": False, "code": "EXPIRED_TOKEN", "message": "Expired token."}, 401
-        except jwt.InvalidTokenError:
-            return {"success": False, "code": "INVALID_TOKEN", "message": "Invalid token."}, 401
-        
-        # check if the token is in the blocklist
-        user = User.get_by_email(token_data["email"])
-        
-        # check if the user exists
-        if not user:
-            return {"success": False, "code": "INVALID_TOKEN", "message": "Invalid user."}, 401
-        # check if the token is in the blocklist
-        if JWTTokenBlocklist.is_token_blocklisted(token):
-            return {"success": False, "code": "INVALID_TOKEN", "message": "Token is in the blocklist. The user has already logged out."}, 401
-        # check if the user is active
-        if not user.check_jwt_auth_active():
-            return {"success": False, "code": "INVALID_TOKEN", "message": "Token is invalid. The user has already logged out."}, 401
+        user, error = authenticate(request.headers.get("Authorization"))
+        if error:
+            return error
         
         return func(user, *args, **kwargs)
     return wrapper
@@ -248,7 +288,7 @@ class VCodeVerificationApi(Resource):
             return {"success": False, "code": "VCODE_MISSING", "message": "vCode is missing."}, HTTPStatus.BAD_REQUEST
         
         # check whether the vCode is in the blocklist
-        if JWTTokenBlocklist.is_token_blocklisted(vCode):
+        if JWTTokenBlocklist.is_token_blocklisted(vCode, token_type="vCode"):
             return {"success": False, "code": "VCODE_USED", "message": "vCode has already been used."}, HTTPStatus.BAD_REQUEST
 
         try:
@@ -287,7 +327,7 @@ class RegisterApi(Resource):
             return {"success": False, "code": "VCODE_MISSING", "message": "vCode is missing."}, HTTPStatus.BAD_REQUEST
         
         # check whether the vCode is in the blocklist
-        if JWTTokenBlocklist.is_token_blocklisted(vCode):
+        if JWTTokenBlocklist.is_token_blocklisted(vCode, token_type="vCode"):
             return {"success": False, "code": "VCODE_USED", "message": "vCode has already been used."}, HTTPStatus.BAD_REQUEST
 
         try:
@@ -353,8 +393,7 @@ class RegisterApi(Resource):
         # create the user
         if User.register(username, email, password, user_type, account_status, default_entrypoint):
             # make vCode invalid
-            jwt_block = JWTTokenBlocklist(jwt_token=vCode, token_type="vCode")
-            jwt_block.save()
+            JWTTokenBlocklist.add_token(vCode, token_type="vCode")
             return {"success": True, "code": "REGISTRATION_SUCCESSFUL", "message": "User registered successfully."}, HTTPStatus.CREATED
         else:
             return {"success": False, "code": "REGISTRATION_FAILED", "message": "User registration failed."}, HTTPStatus.INTERNAL_SERVER_ERROR
@@ -481,6 +520,7 @@ class LoginApi(Resource):
         
         # login the user
         user.save()
+        invalidate_user_principals(user.id)
         
         return {"success": True, "code": "LOGIN_SUCCESSFUL", "message": "User logged in successfully.", "data": {"userToken": token, "user": user.to_dict()}}, HTTPStatus.OK
 
@@ -507,12 +547,12 @@ class LogoutApi(Resource):
         _jwt_token = _jwt_token.split(" ")[1]
         
         # put the jwt token in the blocklist
-        jwt_block = JWTTokenBlocklist(jwt_token=_jwt_token, token_type="token")
-        jwt_block.save()
+        JWTTokenBlocklist.add_token(_jwt_token, token_type="token")
         
         # set the jwt auth active status
         self.set_jwt_auth_active(False)
         self.save()
+        invalidate_user_principals(self.id)
         
         return {"success": True, "code": "LOGOUT_SUCCESSFUL", "message": "User logged out successfully."}, HTTPStatus.OK
 
@@ -596,6 +636,7 @@ class UserApi(Resource):
             user.set_default_entrypoint(default_entrypoint)
 
         user.save()
+        invalidate_user_principals(user.id)
 
         return {"success": True, "code": "USER_UPDATED", "message": "User updated successfully."}, HTTPStatus.OK
     
@@ -621,6 +662,7 @@ class UserApi(Resource):
             return {"success": False, "code": "USER_NOT_FOUND", "message": "User not found."}, HTTPStatus.NOT_FOUND
         
         # delete the user
+        invalidate_user_principals(user.id)
         user.delete()
         
         return {"success": True, "code": "USER_DELETED", "message": "User deleted successfully."}, HTTPStatus.OK
@@ -697,6 +739,7 @@ class UserByIdApi(Resource):
             user.set_account_status(account_status)
         
         user.save()
+        invalidate_user_principals(user.id)
         
         return {"success": True, "code": "USER_UPDATED", "message": "User updated successfully."}, HTTPStatus.OK
     
@@ -718,6 +761,7 @@ class UserByIdApi(Resource):
             return {"success": False, "code": "USER_NOT_FOUND", "message": "User not found."}, HTTPStatus.NOT_FOUND
         
         # delete the user
+        invalidate_user_principals(user.id)
         user.delete()
         
         return {"success": True, "code": "USER_DELETED", "message": "User deleted successfully."}, HTTPStatus.OK
@@ -777,6 +821,7 @@ class ChangePasswordApi(Resource):
         # set the new password
         self.set_password(new_password)
         self.save()
+        invalidate_user_principals(self.id)
         
         return {"success": True, "code": "PASSWORD_CHANGED", "message": "Password changed successfully."}, HTTPStatus.OK
 
@@ -810,6 +855,7 @@ class AccountStatusApi(Resource):
         # set the account status
         user.set_account_status(account_status)
         user.save()
+        invalidate_user_principals(user.id)
         
         return {"success": True, "code": "ACCOUNT_STATUS_UPDATED", "message": "Account status updated successfully."}, HTTPStatus.OK
     
@@ -843,6 +889,7 @@ class UserTypeApi(Resource):
         # set the user type
         user.set_user_type(user_type)
         user.save()
+        invalidate_user_principals(user.id)
         
         return {"success": True, "code": "USER_TYPE_UPDATED", "message": "User type updated successfully."}, HTTPStatus.OK
 
@@ -876,6 +923,7 @@ class DefaultEntrypointApi(Resource):
         # set the default entrypoint
         user.set_default_entrypoint(default_entrypoint)
         user.save()
+        invalidate_user_principals(user.id)
         
         return {"success": True, "code": "DEFAULT_ENTRYPOINT_UPDATED", "message": "Default entrypoint updated successfully."}, HTTPStatus.OK
 
@@ -887,6 +935,8 @@ class UserListApi(Resource):
     @user_ns.response(500, "Get users failed due to internal server error")
     @user_ns.param("current", "Current page", type=int, default=1)
     @user_ns.param("pageSize", "Page size", type=int, default=BaseConfig.PAGE_SIZE)
+    @user_ns.param("cursor", "Cursor of the next page, empty for the first page (cursor mode)")
+    @user_ns.param("withTotal", "Count the total in cursor mode", type=bool, default=False)
     @jwt_token_required
     @admin_required
     def get(self, cls):
@@ -897,11 +947,12 @@ class UserListApi(Resource):
 
         current = data.get("current", 1, type=int)
         pageSize = data.get("pageSize", BaseConfig.PAGE_SIZE, type=int)
+        cursor, with_total = cursor_args(data)
 
         # get all users
-        users, total = User.get_all_users_paginated(current, pageSize)
+        users, total, next_cursor = User.get_all_users_paginated(current, pageSize, cursor, with_total)
         if not users:
             return {"success": False, "code": "USERS_NOT_FOUND", "message": "Users not found."}, HTTPStatus.NOT_FOUND
         
-        return {"success": True, "code": "USERS_FOUND", "message": "Users found.", "data": {"users": [user.to_dict() for user in users], "pagination": {"total": total, "current": current, "pageSize": pageSize}}}, HTTPStatus.OK
+        return {"success": True, "code": "USERS_FOUND", "message": "Users found.", "data": {"users": [user.to_dict() for user in users], "pagination": pagination_info(current, pageSize, total, cursor, next_cursor)}}, HTTPStatus.OK
     
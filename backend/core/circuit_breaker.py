@@ -0,0 +1,180 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Circuit breakers
+
+    Every upstream API has a breaker that keeps the outcomes of its calls over the
+    last CIRCUIT_WINDOW seconds. Too many failed calls (connection errors, timeouts,
+    5xx responses) or slow calls open the circuit: calls then fail right away with
+    CircuitOpenError instead of waiting on an upstream that is down. After
+    CIRCUIT_OPEN_SECONDS the circuit is half-open and lets a few probe calls through,
+    it closes when they all succeed and opens again on the first one that fails.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from .config import BaseConfig
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+breakers = dict()  # name -> CircuitBreaker
+
+
+class CircuitOpenError(Exception):
+
+    def __init__(self, breaker, retry_after):
+        super().__init__(f"Circuit of {breaker.name} is open")
+        self.breaker = breaker
+        self.retry_after = retry_after  # seconds
+
+    def to_dict(self):
+        """
+            The body of the 503 response
+        """
+        return {
+            "success": False,
+            "code": "UPSTREAM_CIRCUIT_OPEN",
+            "message": f"{self.breaker.title} API is unavailable, try again in {self.retry_after} seconds.",
+            "data": {"upstream": self.breaker.name, "retry_after": self.retry_after},
+        }
+
+
+class CircuitBreaker():
+
+    def __init__(self, name, title=None):
+        self.name = name
+        self.title = title or name.capitalize()
+        self.window = BaseConfig.CIRCUIT_WINDOW
+        self.min_calls = BaseConfig.CIRCUIT_MIN_CALLS
+        self.error_rate = BaseConfig.CIRCUIT_ERROR_RATE
+        self.slow_call_seconds = BaseConfig.CIRCUIT_SLOW_CALL_SECONDS
+        self.slow_call_rate = BaseConfig.CIRCUIT_SLOW_CALL_RATE
+        self.open_seconds = BaseConfig.CIRCUIT_OPEN_SECONDS
+        self.probes = BaseConfig.CIRCUIT_PROBES
+
+        self.state = CLOSED
+        self.calls = deque()  # (finished at, failed, slow) of the calls in the window
+        self.failures = 0
+        self.slow_calls = 0
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.probes_passed = 0
+        self.times_opened = 0
+        self.rejected = 0  # calls failed fast
+        self.lock = threading.Lock()
+
+        breakers[name] = self
+
+    def before_call(self):
+        """
+            Raises CircuitOpenError when the call may not go through, otherwise returns
+            whether it is a probe. Pass that on to after_call, which must follow every
+            call let through.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.open_seconds - now
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self, math.ceil(remaining))
+                self.state = HALF_OPEN
+                self.probes_in_flight = 0
+                self.probes_passed = 0
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight + self.probes_passed >= self.probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(self, 1)
+                self.probes_in_flight += 1
+                return True
+            return False
+
+    def after_call(self, seconds, failed, probe=False):
+        slow = seconds >= self.slow_call_seconds
+        with self.lock:
+            now = time.monotonic()
+            if probe:
+                self.probes_in_flight -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self.probes_passed += 1
+                    if self.probes_passed >= self.probes:
+                        self._close()
+                return
+
+            # Calls started before the circuit opened say nothing new
+            if self.state != CLOSED:
+                return
+            self.calls.append((now, failed, slow))
+            self.failures += failed
+            self.slow_calls += slow
+            self._trim(now)
+            if len(self.calls) >= self.min_calls and (
+                    100 * self.failures >= self.error_rate * len(self.calls)
+                    or 100 * self.slow_calls >= self.slow_call_rate * len(self.calls)):
+                self._open(now)
+
+    def _trim(self, now):
+        while self.calls and self.calls[0][0] <= now - self.window:
+            _, failed, slow = self.calls.popleft()
+            self.failures -= failed
+            self.slow_calls -= slow
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+
+    def _close(self):
+        self.state = CLOSED
+        self.calls.clear()
+        self.failures = 0
+        self.slow_calls = 0
+
+    def to_dict(self):
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            state = self.state
+            retry_after = None
+            if state == OPEN:
+                remaining = self.opened_at + self.open_seconds - now
+                if remaining > 0:
+                    retry_after = math.ceil(remaining)
+                else:
+                    state = HALF_OPEN  # the next call is a probe
+
+            calls = len(self.calls)
+            return {
+                "name": self.name,
+                "state": state,
+                "retry_after": retry_after,
+                "window": {
+                    "calls": calls,
+                    "failures": self.failures,
+                    "slow_calls": self.slow_calls,
+                    "error_rate": round(100 * self.failures / calls, 1) if calls else None,
+                    "slow_call_rate": round(100 * self.slow_calls / calls, 1) if calls else None,
+                },
+                "probes_in_flight": self.probes_in_flight if self.state == HALF_OPEN else 0,
+                "probes_passed": self.probes_passed if self.state == HALF_OPEN else 0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "config": {
+                    "window": self.window,
+                    "min_calls": self.min_calls,
+                    "error_rate": self.error_rate,
+                    "slow_call_seconds": self.slow_call_seconds,
+                    "slow_call_rate": self.slow_call_rate,
+                    "open_seconds": self.open_seconds,
+                    "probes": self.probes,
+                },
+            }
@@ -23,6 +23,9 @@ class BaseConfig():
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Create tables and apply pending migrations at startup, disable to run `flask migrate` manually
+    DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() == 'true'
+
     PAGE_SIZE = 10
     
     ALLOW_GUEST_REGISTER = True
@@ -32,6 +35,54 @@ class BaseConfig():
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt_secret_key')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=48)
 
+    # Authenticated principals are cached per process, keyed by token digest
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 4096))
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 60))  # seconds
+
+    # Blocklisted tokens are purged after they expire, a Bloom filter answers most lookups in memory
+    JWT_BLOCKLIST_SYNC_INTERVAL = int(os.getenv('JWT_BLOCKLIST_SYNC_INTERVAL', 30))  # seconds
+    JWT_BLOCKLIST_SYNC_MARGIN = int(os.getenv('JWT_BLOCKLIST_SYNC_MARGIN', 60))  # seconds each sync overlaps the last one
+    JWT_BLOCKLIST_REBUILD_INTERVAL = int(os.getenv('JWT_BLOCKLIST_REBUILD_INTERVAL', 3600))  # seconds
+    JWT_BLOCKLIST_FILTER_CAPACITY = 100000
+    JWT_BLOCKLIST_FILTER_ERROR_RATE = 0.001
+
+    # Usernames shown next to forum threads and replies, cached per process by user ID
+    USERNAME_CACHE_SIZE = int(os.getenv('USERNAME_CACHE_SIZE', 10000))
+    USERNAME_CACHE_TTL = int(os.getenv('USERNAME_CACHE_TTL', 300))  # seconds
+
+    # Must match the server's innodb_ft_min_token_size, shorter search terms are ignored
+    FULLTEXT_MIN_TOKEN_SIZE = int(os.getenv('FULLTEXT_MIN_TOKEN_SIZE', 3))
+    SEARCH_SNIPPET_LENGTH = int(os.getenv('SEARCH_SNIPPET_LENGTH', 120))  # characters
+
+    # Rows per multi-row INSERT when importing courses, sections and teachers
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+    # Timetable rows read and normalized at a time, bounds the memory used by an upload
+    IMPORT_READ_BATCH_SIZE = int(os.getenv('IMPORT_READ_BATCH_SIZE', 5000))
+    # Course description PDFs are extracted in shards of pages on a process pool, 0 workers = one per CPU
+    PDF_PAGES_PER_SHARD = int(os.getenv('PDF_PAGES_PER_SHARD', 50))
+    PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', 0))
+
+    # Uploads and imports run as background jobs, staged files are shared by all worker processes
+    IMPORT_STAGING_DIR = os.getenv('IMPORT_STAGING_DIR', os.path.join(BASE_DIR, 'staging'))
+    IMPORT_STAGING_RETENTION = int(os.getenv('IMPORT_STAGING_RETENTION', 7 * 24 * 3600))  # seconds, for finished jobs and unused cache entries
+    IMPORT_CACHE_DIR = os.getenv('IMPORT_CACHE_DIR', os.path.join(IMPORT_STAGING_DIR, 'cache'))  # parsed uploads by content
+    IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', 2))  # threads per process, 0 runs no jobs in this process
+    IMPORT_JOB_POLL_INTERVAL = int(os.getenv('IMPORT_JOB_POLL_INTERVAL', 5))  # seconds
+    IMPORT_JOB_STALE_AFTER = int(os.getenv('IMPORT_JOB_STALE_AFTER', 120))  # seconds without heartbeat before a job is requeued
+    IMPORT_JOB_MAX_ATTEMPTS = int(os.getenv('IMPORT_JOB_MAX_ATTEMPTS', 3))
+
+    # Teacher list of the staff directory, read by the teacher import
+    STAFF_DIRECTORY_URL = os.getenv('STAFF_DIRECTORY_URL', 'https://staff.uic.edu.cn/teacher/teacher/list')
+    STAFF_DIRECTORY_PAGE_SIZE = int(os.getenv('STAFF_DIRECTORY_PAGE_SIZE', 500))
+    STAFF_DIRECTORY_CONCURRENCY = int(os.getenv('STAFF_DIRECTORY_CONCURRENCY', 4))  # pages fetched at a time
+    STAFF_DIRECTORY_TIMEOUT = int(os.getenv('STAFF_DIRECTORY_TIMEOUT', 30))  # seconds per request
+    STAFF_DIRECTORY_RETRIES = int(os.getenv('STAFF_DIRECTORY_RETRIES', 3))
+    STAFF_DIRECTORY_BACKOFF = float(os.getenv('STAFF_DIRECTORY_BACKOFF', 0.5))  # seconds, doubled on every retry
+
+    # Serialized navigator tree, cleared on every category or web address change
+    NAVIGATOR_CACHE_SIZE = int(os.getenv('NAVIGATOR_CACHE_SIZE', 8))
+    NAVIGATOR_CACHE_TTL = int(os.getenv('NAVIGATOR_CACHE_TTL', 600))  # seconds
+
     JWT_REGISTRATION_TOKEN_SECRET_KEY = os.getenv('JWT_REGISTRATION_TOKEN_SECRET_KEY', 'jwt_registration_token_secret_key')
     JWT_REGISTRATION_TOKEN_EXPIRES = timedelta(hours=1)
 
@@ -48,12 +99,32 @@ class BaseConfig():
     DIFY_API_BASE = os.getenv('DIFY_API_BASE', 'http://host.docker.internal:3439/v1')
     DIFY_APP_API_KEY = os.getenv('DIFY_APP_API_KEY', 'app-redacted')
     DIFY_DATASET_API_KEY = os.getenv('DIFY_DATASET_API_KEY', 'dataset-redacted')
+    DIFY_POOL_SIZE = int(os.getenv('DIFY_POOL_SIZE', 32))  # kept-alive connections to DIFY_API_BASE
+    DIFY_CONNECT_TIMEOUT = float(os.getenv('DIFY_CONNECT_TIMEOUT', 5))  # seconds
+    DIFY_READ_TIMEOUT = float(os.getenv('DIFY_READ_TIMEOUT', 120))  # seconds without data, also between streamed chunks
 
     # LLM API Configuration
     CHATGPT_API_BASE = os.getenv('CHATGPT_API_BASE', 'https://api.gptapi.us/v1')
     CHATGPT_API_KEY = os.getenv('CHATGPT_API_KEY', 'sk-redacted')
     CHATGPT_API_MODEL = os.getenv('CHATGPT_API_MODEL', 'gpt-4o')
+    CHATGPT_POOL_SIZE = int(os.getenv('CHATGPT_POOL_SIZE', 16))  # kept-alive connections to CHATGPT_API_BASE
+    CHATGPT_CONNECT_TIMEOUT = float(os.getenv('CHATGPT_CONNECT_TIMEOUT', 5))  # seconds
+    CHATGPT_READ_TIMEOUT = float(os.getenv('CHATGPT_READ_TIMEOUT', 120))  # seconds without data, also between streamed chunks
+    LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', 0))  # cached deterministic completions (core/llm_cache.py), 0 turns the cache off
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 3600))  # seconds
 
     SILICONFLOW_API_BASE = os.getenv('SILICONFLOW_API_BASE', 'https://api.siliconflow.cn/v1')
     SILICONFLOW_API_KEY = os.getenv('SILICONFLOW_API_KEY', 'sk-redacted')
-    SILICONFLOW_API_MODEL = os.getenv('SILICONFLOW_API_MODEL', 'Qwen/Qwen2.5-Coder-32B-Instruct')
\ No newline at end of file
+    SILICONFLOW_API_MODEL = os.getenv('SILICONFLOW_API_MODEL', 'Qwen/Qwen2.5-Coder-32B-Instruct')
+
+    # Async gateway serving the /dify and /llmapi routes (uvicorn core.gateway:gateway)
+    GATEWAY_MAX_CONNECTIONS = int(os.getenv('GATEWAY_MAX_CONNECTIONS', 1000))  # upstream connections, a streamed answer holds one
+
+    # Circuit breakers of the Dify and LLM APIs (core/circuit_breaker.py)
+    CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', 60))  # seconds of calls the rates are taken over
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', 20))  # calls in the window before the circuit may open
+    CIRCUIT_ERROR_RATE = int(os.getenv('CIRCUIT_ERROR_RATE', 50))  # percent of failed calls opening the circuit
+    CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', 30))  # calls slower to respond count as slow
+    CIRCUIT_SLOW_CALL_RATE = int(os.getenv('CIRCUIT_SLOW_CALL_RATE', 80))  # percent of slow calls opening the circuit
+    CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', 30))  # seconds calls fail fast before probing
+    CIRCUIT_PROBES = int(os.getenv('CIRCUIT_PROBES', 3))  # successful probes closing the circuit again
\ No newline at end of file
@@ -0,0 +1,427 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Async gateway
+
+    Serves the /dify and /llmapi routes on asyncio (uvicorn core.gateway:gateway), so a
+    streamed answer waiting on its upstream costs a coroutine instead of a WSGI worker
+    thread. The routes mirror apis/dify.py and apis/llmapi.py and authenticate with the
+    same checks, run on a worker thread in the Flask app context.
+    Each upstream shares the circuit breaker of its UpstreamClient.
+    The gateway process runs no import jobs (IMPORT_WORKERS=0) and leaves migrations
+    to the backend (DB_AUTO_MIGRATE=false), startup then only syncs the JWT blocklist.
+"""
+
+import json
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from . import app, llm_cache, startup
+from .apis.user import authenticate
+from .circuit_breaker import CircuitOpenError, breakers
+from .config import BaseConfig
+from .models import db
+from .upstream import EndpointStats, chatgpt_client, cut_events, dify_client
+
+
+class AsyncUpstream():
+
+    def __init__(self, client):
+        self.name = client.name
+        self.base_url = client.base_url
+        self.verify = client.verify
+        self.pool_size = client.pool_size
+        self.timeout = client.timeout
+        self.breaker = client.breaker
+        self.client = None
+        self.endpoints = dict()  # endpoint -> EndpointStats
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.streams = 0  # streamed responses still open
+
+    def open(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            verify=self.verify,
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+            limits=httpx.Limits(max_connections=BaseConfig.GATEWAY_MAX_CONNECTIONS,
+                                max_keepalive_connections=self.pool_size),
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def request(self, method, path, endpoint=None, stream=False, **kwargs):
+        """
+            Send a request, a streamed response must be closed by the caller.
+            Stats and circuit breaker outcomes are recorded like UpstreamClient does,
+            up to the response headers. Raises CircuitOpenError while the circuit is open.
+        """
+        probe = self.breaker.before_call()
+        endpoint = f"{method} {endpoint or path}"
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        error = True
+        try:
+            response = await self.client.send(self.client.build_request(method, path, **kwargs), stream=stream)
+            error = response.status_code >= 500
+            if stream:
+                self.streams += 1
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.breaker.after_call(elapsed, error, probe)
+            self.in_flight -= 1
+            self.endpoints.setdefault(endpoint, EndpointStats()).record(elapsed, error)
+
+    async def iter_events(self, response):
+        """
+            The body of a streamed response cut at event boundaries, see upstream.iter_events.
+            Closing the generator, which Starlette does when the client goes away,
+            closes the upstream response.
+        """
+        tail = b""
+        try:
+            async for chunk in response.aiter_bytes():
+                events, tail = cut_events(tail + chunk if tail else chunk)
+                if events:
+                    yield events
+            if tail:
+                yield tail
+        finally:
+            self.streams -= 1
+            await response.aclose()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "circuit": self.breaker.to_dict()["state"],
+            "max_connections": BaseConfig.GATEWAY_MAX_CONNECTIONS,
+            "keepalive_connections": self.pool_size,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "open_streams": self.streams,
+            "endpoints": {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())},
+        }
+
+
+dify = AsyncUpstream(dify_client)
+chatgpt = AsyncUpstream(chatgpt_client)
+upstreams = (dify, chatgpt)
+
+
+@asynccontextmanager
+async def lifespan(_):
+    startup(app)
+    for upstream in upstreams:
+        upstream.open()
+    yield
+    for upstream in upstreams:
+        await upstream.close()
+
+
+gateway = FastAPI(title="UIC Information Center Gateway", lifespan=lifespan,
+                  docs_url=None, redoc_url=None, openapi_url=None)
+gateway.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+@gateway.exception_handler(404)
+async def not_found(request, error):
+    return JSONResponse({"success": False, "message": "Not found."}, status_code=404)
+
+
+"""
+    Helpers
+"""
+
+def authenticate_in_app(authorization):
+    with app.app_context():
+        try:
+            return authenticate(authorization)
+        finally:
+            db.session.remove()
+
+
+async def current_user(request, admin=False):
+    """
+        (user, None) for a valid token, (None, error response) otherwise
+    """
+    user, error = await run_in_threadpool(authenticate_in_app, request.headers.get("Authorization"))
+    if error is None and admin and user.get_user_type() != "ADMIN":
+        error = ({"success": False, "code": "NO PERMISSION", "message": "No permission."}, 403)
+    if error is not None:
+        return None, JSONResponse(error[0], status_code=error[1])
+    return user, None
+
+
+def app_headers():
+    return {"Authorization": "Bearer " + BaseConfig.DIFY_APP_API_KEY}
+
+
+def dataset_headers():
+    return {"Authorization": "Bearer " + BaseConfig.DIFY_DATASET_API_KEY}
+
+
+async def relay(upstream, method, path, endpoint=None, stream=False, keep_status=False, **kwargs):
+    """
+        The upstream response as a gateway response. Streams are passed on event by event,
+        other bodies as they are with status 200 like the Dify routes return them, or with
+        the upstream status when `keep_status`.
+    """
+    try:
+        response = await upstream.request(method, path, endpoint, stream=stream, **kwargs)
+    except CircuitOpenError as e:
+        return JSONResponse(e.to_dict(), status_code=503, headers={"Retry-After": str(e.retry_after)})
+    except httpx.TimeoutException:
+        return JSONResponse({
+            "success": False,
+            "code": "UPSTREAM_TIMEOUT",
+            "message": f"{upstream.breaker.title} API did not respond in time.",
+        }, status_code=504)
+    except httpx.HTTPError:
+        return JSONResponse({
+            "success": False,
+            "code": "UPSTREAM_UNAVAILABLE",
+            "message": f"{upstream.breaker.title} API is unavailable.",
+        }, status_code=502)
+
+    if stream:
+        return StreamingResponse(upstream.iter_events(response), status_code=response.status_code, headers={
+            "Content-Type": response.headers.get("Content-Type", "text/event-stream"),
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+    return Response(response.content, status_code=response.status_code if keep_status else 200,
+                    media_type="application/json")
+
+
+"""
+    Dify routes, see apis/dify.py
+"""
+
+@gateway.post("/api/v1/dify/chat-messages")
+async def dify_chat_messages(request: Request):
+    user, error = await current_user(request)
+    if error:
+        return error
+    data = await request.json()
+    data["user"] = user.get_uuid()
+    return await relay(dify, "POST", "/chat-messages", json=data, headers=app_headers(),
+                       stream=data.get("response_mode", "") == "streaming")
+
+
+# 获取对话历史消息
+@gateway.get("/api/v1/dify/messages")
+async def dify_messages(request: Request):
+    user, error = await current_user(request)
+    if error:
+        return error
+    params = dict(request.query_params, user=user.get_uuid())
+    return await relay(dify, "GET", "/messages", params=params, headers=app_headers())
+
+
+# 获取对话历史消息-分享
+@gateway.get("/api/v1/dify/shared-messages")
+async def dify_shared_messages(request: Request):
+    conversation_id = request.query_params.get("conversation_id")
+    user = request.query_params.get("user")
+    if not conversation_id:
+        return JSONResponse({"success": False, "message": "conversation_id is required"}, status_code=400)
+    if not user:
+        return JSONResponse({"success": False, "message": "user is required"}, status_code=400)
+    params = {"conversation_id": conversation_id, "user": user}  # 防止用户传入其他参数
+    return await relay(dify, "GET", "/messages", params=params, headers=app_headers())
+
+
+# 获取下一轮建议问题列表
+@gateway.get("/api/v1/dify/messages/{message_id}/suggested")
+async def dify_suggested(request: Request, message_id: str):
+    user, error = await current_user(request)
+    if error:
+        return error
+    return await relay(dify, "GET", f"/messages/{message_id}/suggested", "/messages/{message_id}/suggested",
+                       params={"user": user.get_uuid()}, headers=app_headers())
+
+
+# 获取会话列表
+@gateway.get("/api/v1/dify/conversations")
+async def dify_conversations(request: Request):
+    user, error = await current_user(request)
+    if error:
+        return error
+    params = dict(request.query_params, user=user.get_uuid())
+    return await relay(dify, "GET", "/conversations", params=params, headers=app_headers())
+
+
+# 重命名会话
+@gateway.post("/api/v1/dify/conversations/{conversation_id}/name")
+async def dify_rename_conversation(request: Request, conversation_id: str):
+    user, error = await current_user(request)
+    if error:
+        return error
+    data = await request.json()
+    data["user"] = user.get_uuid()
+    return await relay(dify, "POST", f"/conversations/{conversation_id}/name", "/conversations/{conversation_id}/name",
+                       json=data, headers=app_headers())
+
+
+# 删除会话
+@gateway.delete("/api/v1/dify/conversations/{conversation_id}")
+async def dify_delete_conversation(request: Request, conversation_id: str):
+    user, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return await relay(dify, "DELETE", f"/conversations/{conversation_id}", "/conversations/{conversation_id}",
+                       json={"user": user.get_uuid()}, headers=app_headers())
+
+
+# 知识库列表
+@gateway.get("/api/v1/dify/datasets")
+async def dify_datasets(request: Request):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return await relay(dify, "GET", "/datasets", params=dict(request.query_params), headers=dataset_headers())
+
+
+# 知识库文档列表
+@gateway.get("/api/v1/dify/datasets/{dataset_id}/documents")
+async def dify_dataset_documents(request: Request, dataset_id: str):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return await relay(dify, "GET", f"/datasets/{dataset_id}/documents", "/datasets/{dataset_id}/documents",
+                       params=dict(request.query_params), headers=dataset_headers())
+
+
+# 删除文档
+@gateway.delete("/api/v1/dify/datasets/{dataset_id}/documents/{document_id}")
+async def dify_delete_document(request: Request, dataset_id: str, document_id: str):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return await relay(dify, "DELETE", f"/datasets/{dataset_id}/documents/{document_id}",
+                       "/datasets/{dataset_id}/documents/{document_id}", headers=dataset_headers())
+
+
+# 通过文件创建文档
+@gateway.post("/api/v1/dify/datasets/{dataset_id}/document/create-by-file")
+async def dify_create_document(request: Request, dataset_id: str):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    form = await request.form()
+    file = form["file"]
+    data = {key: value for key, value in form.items() if key != "file"}
+    files = {"file": (file.filename, await file.read(), file.content_type)}
+    return await relay(dify, "POST", f"/datasets/{dataset_id}/document/create-by-file",
+                       "/datasets/{dataset_id}/document/create-by-file", data=data, files=files,
+                       headers=dataset_headers())
+
+
+# 上游连接与各接口延迟统计
+@gateway.get("/api/v1/dify/upstream/stats")
+async def upstream_stats(request: Request):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return {
+        "success": True,
+        "code": "UPSTREAM_STATS",
+        "message": "Upstream client stats.",
+        "data": [upstream.stats() for upstream in upstreams],
+    }
+
+
+# 上游熔断器状态
+@gateway.get("/api/v1/dify/upstream/circuit-breakers")
+async def upstream_circuit_breakers(request: Request):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return {
+        "success": True,
+        "code": "CIRCUIT_BREAKERS",
+        "message": "Upstream circuit breaker states.",
+        "data": [breaker.to_dict() for breaker in breakers.values()],
+    }
+
+
+"""
+    Dify demo routes, see apis/dify.py
+"""
+
+@gateway.post("/api/v1/dify/demo/chat-messages")
+async def dify_demo_chat_messages(request: Request):
+    data = await request.json()
+    data["user"] = "demo_user"
+    return await relay(dify, "POST", "/chat-messages", json=data, headers=app_headers(),
+                       stream=data.get("response_mode", "") == "streaming")
+
+
+@gateway.get("/api/v1/dify/demo/messages")
+async def dify_demo_messages(request: Request):
+    params = dict(request.query_params, user="demo_user")
+    return await relay(dify, "GET", "/messages", params=params, headers=app_headers())
+
+
+@gateway.get("/api/v1/dify/demo/messages/{message_id}/suggested")
+async def dify_demo_suggested(message_id: str):
+    return await relay(dify, "GET", f"/messages/{message_id}/suggested", "/messages/{message_id}/suggested",
+                       params={"user": "demo_user"}, headers=app_headers())
+
+
+@gateway.get("/api/v1/dify/demo/conversations")
+async def dify_demo_conversations(request: Request):
+    params = dict(request.query_params, user="demo_user")
+    return await relay(dify, "GET", "/conversations", params=params, headers=app_headers())
+
+
+# 管理员删除 demo_user 会话
+@gateway.delete("/api/v1/dify/demo/conversations/{conversation_id}")
+async def dify_demo_delete_conversation(request: Request, conversation_id: str):
+    _, error = await current_user(request, admin=True)
+    if error:
+        return error
+    return await relay(dify, "DELETE", f"/conversations/{conversation_id}", "/conversations/{conversation_id}",
+                       json={"user": "demo_user"}, headers=app_headers())
+
+
+"""
+    LLM routes, see apis/llmapi.py
+"""
+
+@gateway.post("/api/v1/llmapi/chatgpt/chat/completions")
+async def chatgpt_completions(request: Request):
+    _, error = await current_user(request)
+    if error:
+        return error
+    data = await request.json()
+    headers = {"Authorization": "Bearer " + BaseConfig.CHATGPT_API_KEY}
+
+    # Deterministic completions may be answered from the cache
+    cache_key = llm_cache.cache_key(data)
+    if cache_key is None:
+        return await relay(chatgpt, "POST", "/chat/completions", json=data, headers=headers,
+                           stream=bool(data.get("stream", False)), keep_status=True)
+    cached = llm_cache.lookup(cache_key)
+    if cached is not None:
+        return JSONResponse(cached, headers={llm_cache.CACHE_HEADER: "HIT"})
+
+    response = await relay(chatgpt, "POST", "/chat/completions", json=data, headers=headers, keep_status=True)
+    if response.status_code == 200:
+        try:
+            llm_cache.store(cache_key, json.loads(response.body))
+        except ValueError:
+            pass
+    response.headers[llm_cache.CACHE_HEADER] = "MISS"
+    return response
@@ -0,0 +1,126 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Background jobs
+
+    Jobs are rows of the `import_job` table, their inputs and outputs are staged on disk.
+    Every worker process runs a small thread pool and a dispatcher that claims queued
+    jobs with a conditional UPDATE, so each job runs exactly once across processes.
+    The dispatcher also sends heartbeats for the jobs it runs and requeues running
+    jobs whose worker died, which is how jobs survive a restart. A requeued job may
+    still be running in a worker that was only slow; every claim is a new attempt,
+    and an attempt that lost its job can no longer report, commit or finish it.
+"""
+
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import upload_cache
+from .models import db, ImportJob, JobLost
+from .tasks import start_periodic_task
+
+HANDLERS = dict()
+
+WORKER_NAME = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_handler(kind):
+    """
+        Register the function that runs jobs of a kind. It gets the job and returns
+        the result dict, exceptions fail the job with their message. Call job.fence()
+        in the transaction that commits the job's work, right before the commit.
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobRunner():
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import-job")
+        self.running = set()  # (job ID, attempt)
+        self.lock = threading.Lock()
+
+    def free_slots(self):
+        with self.lock:
+            return self.workers - len(self.running)
+
+    def submit(self, job_id):
+        """
+            Run a queued job in this process unless another worker claimed it first
+        """
+        if self.free_slots() <= 0:
+            return False
+        attempt = ImportJob.claim(job_id, WORKER_NAME)
+        if attempt is None:
+            return False
+        with self.lock:
+            self.running.add((job_id, attempt))
+        self.executor.submit(self.run, job_id, attempt)
+        return True
+
+    def run(self, job_id, attempt):
+        with self.app.app_context():
+            try:
+                job = ImportJob.get_by_id(job_id)
+                job.claimed_attempt = attempt
+                result = HANDLERS[job.kind](job)
+                if not ImportJob.succeed(job_id, attempt, result):
+                    raise JobLost(f"Import job {job_id} was requeued")
+            except JobLost:
+                db.session.rollback()
+                self.app.logger.warning(f"Import job {job_id} was requeued, dropped attempt {attempt}")
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception(f"Import job {job_id} failed")
+                ImportJob.fail(job_id, attempt, str(e) or e.__class__.__name__)
+            finally:
+                db.session.remove()
+                with self.lock:
+                    self.running.discard((job_id, attempt))
+
+    def dispatch(self):
+        """
+            Periodic task: heartbeats, requeue jobs of dead workers, pick up queued jobs
+        """
+        with self.lock:
+            running = list(self.running)
+        ImportJob.heartbeat(running)
+        ImportJob.requeue_stale()
+        ImportJob.purge_staging()
+        upload_cache.purge()
+        for job_id in ImportJob.queued_ids(self.free_slots()):
+            self.submit(job_id)
+
+
+runner = None
+
+
+def start_job_runner(app):
+    """
+        Run jobs in this process, unless IMPORT_WORKERS is 0 (the async gateway)
+    """
+    global runner
+    if app.config["IMPORT_WORKERS"] <= 0:
+        return None
+    runner = JobRunner(app, app.config["IMPORT_WORKERS"])
+    start_periodic_task(app, "import-job-dispatcher", app.config["IMPORT_JOB_POLL_INTERVAL"], runner.dispatch)
+    return runner
+
+
+def enqueue(job):
+    """
+        Commit a new job and start it right away when this process has a free worker,
+        otherwise the dispatcher of any process picks it up.
+        Stage the job's files before, after a flush has assigned the job ID.
+    """
+    job.save()
+    if runner is not None:
+        runner.submit(job.id)
+    return job
@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    LLM response cache
+
+    Non-streaming chat completions asking for a deterministic answer (temperature 0,
+    a single choice) are answered from a size-bounded LRU cache whose entries expire
+    after LLM_CACHE_TTL seconds. The key is a hash of the canonical request body, so
+    any difference in model, messages or sampling parameters is a different entry.
+    The cache is off unless LLM_CACHE_SIZE is set. Responses to eligible requests
+    carry X-Cache: HIT or MISS.
+"""
+
+import hashlib
+import json
+
+from .cache import TTLCache
+from .config import BaseConfig
+
+CACHE_HEADER = "X-Cache"
+
+# Completion payloads by request key, per process
+llm_cache = TTLCache(BaseConfig.LLM_CACHE_SIZE, BaseConfig.LLM_CACHE_TTL)
+
+
+def canonical(value):
+    """
+        value with numbers as floats, so 0 and 0.0 give the same key
+    """
+    if isinstance(value, dict):
+        return {key: canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [canonical(item) for item in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def cache_key(data):
+    """
+        The cache key of a completion request, None when it may not be answered from the cache
+    """
+    if BaseConfig.LLM_CACHE_SIZE <= 0 or not isinstance(data, dict):
+        return None
+    if data.get("stream") or data.get("temperature") != 0 or data.get("n", 1) != 1:
+        return None
+    body = canonical({key: value for key, value in data.items() if key != "stream"})
+    text = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def lookup(key):
+    return llm_cache.get(key)
+
+
+def store(key, payload):
+    """
+        Cache a completion payload, error payloads are not cached
+    """
+    if isinstance(payload, dict) and payload.get("choices") and not payload.get("error"):
+        llm_cache.set(key, payload)
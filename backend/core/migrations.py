@@ -0,0 +1,176 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Schema bootstrap and versioned migrations
+
+    The schema is bootstrapped once when the serving process starts (core.startup),
+    or by `flask migrate` when DB_AUTO_MIGRATE is off, not on every request.
+    Each migration runs once and is recorded in the `schema_migration` table.
+    A database created by `mariadb/init.sql` already has the tables but no
+    migration history, so every migration must be safe to run against it.
+"""
+
+from sqlalchemy import inspect, insert, select, text, update
+
+from .models import db
+from .models import Course, ForumThread, Category, WebAddress, JWTTokenBlocklist, SchemaMigration, ImportJob, Teacher
+from .models.jwt_token_blocklist import utcnow
+from .search import create_fulltext_index
+
+MIGRATION_LOCK_NAME = "uicinfocenter_schema_migration"
+MIGRATION_LOCK_TIMEOUT = 60  # seconds
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """
+        Register a migration function under a version number
+    """
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def create_indexes(connection, model, *index_names):
+    """
+        Create the named indexes declared on a model if they do not exist yet
+    """
+    for index in model.__table__.indexes:
+        if index.name in index_names:
+            index.create(connection, checkfirst=True)
+
+
+def add_columns(connection, model, *column_names):
+    """
+        Add the named columns declared on a model if the table does not have them yet
+    """
+    table = model.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for name in column_names:
+        if name not in existing:
+            column = table.c[name]
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(connection.dialect)}"
+            ))
+
+
+"""
+    Migrations
+"""
+
+@migration(1, "Create tables")
+def create_tables(connection):
+    db.metadata.create_all(connection)
+
+
+@migration(2, "Add lookup indexes")
+def add_lookup_indexes(connection):
+    create_indexes(connection, Course, "ix_course_name_en")
+    create_indexes(connection, ForumThread, "ix_forum_thread_thread_subject", "ix_forum_thread_thread_category")
+    create_indexes(connection, Category, "ix_nav_category_name")
+    create_indexes(connection, WebAddress, "ix_nav_webaddr_url")
+
+
+@migration(3, "Store JWT blocklist entries as token digests with expiry")
+def compact_jwt_blocklist(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("jwt_token_blocklist")}
+    if "jwt_token" not in columns:
+        return
+
+    # Keep the old table until the converted rows are in place
+    connection.execute(text("ALTER TABLE jwt_token_blocklist RENAME TO jwt_token_blocklist_old"))
+    JWTTokenBlocklist.__table__.create(connection)
+
+    now = utcnow()
+    entries = dict()
+    for token, token_type in connection.execute(text("SELECT jwt_token, token_type FROM jwt_token_blocklist_old")):
+        expires_at = JWTTokenBlocklist.token_expires_at(token)
+        if expires_at > now:  # expired tokens are rejected anyway
+            entries[JWTTokenBlocklist.digest(token)] = {"token_type": token_type, "expires_at": expires_at}
+    if entries:
+        connection.execute(insert(JWTTokenBlocklist), [
+            {"token_digest": digest, **entry} for digest, entry in entries.items()
+        ])
+
+    connection.execute(text("DROP TABLE jwt_token_blocklist_old"))
+
+
+@migration(4, "Add full-text search indexes for courses and sections")
+def add_course_search_indexes(connection):
+    create_fulltext_index(connection, "course")
+    create_fulltext_index(connection, "section")
+
+
+@migration(5, "Add full-text search indexes for forum threads and replies")
+def add_forum_search_indexes(connection):
+    create_fulltext_index(connection, "forum_thread")
+    create_fulltext_index(connection, "forum_reply")
+
+
+@migration(6, "Add the import job table")
+def add_import_jobs(connection):
+    ImportJob.__table__.create(connection, checkfirst=True)
+
+
+@migration(7, "Track staff directory changes and departures of teachers")
+def add_teacher_sync_columns(connection):
+    add_columns(connection, Teacher, "record_hash", "deleted_at")
+
+
+@migration(8, "Record when JWT blocklist entries were added")
+def add_jwt_blocklist_created_at(connection):
+    add_columns(connection, JWTTokenBlocklist, "created_at")
+    create_indexes(connection, JWTTokenBlocklist, "ix_jwt_token_blocklist_created_at")
+    # Existing entries are in every filter, which is rebuilt at startup
+    connection.execute(update(JWTTokenBlocklist).where(JWTTokenBlocklist.created_at.is_(None))
+                       .values(created_at=utcnow()))
+
+
+"""
+    Runner
+"""
+
+def is_mysql(connection):
+    return connection.dialect.name in ("mysql", "mariadb")
+
+
+def run_migrations(connection):
+    """
+        Apply all pending migrations in version order, returns the applied versions
+    """
+    SchemaMigration.__table__.create(connection, checkfirst=True)
+    connection.commit()
+
+    applied = set(connection.execute(select(SchemaMigration.version)).scalars())
+    pending = [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] not in applied]
+
+    for version, description, upgrade in pending:
+        upgrade(connection)
+        connection.execute(insert(SchemaMigration).values(version=version, description=description))
+        connection.commit()
+
+    return [version for version, _, _ in pending]
+
+
+def bootstrap_database(app):
+    """
+        Create the schema and apply pending migrations
+        WARNING: This will not create the database, only the tables.
+        So, you need to create the database first. (MySQL only)
+    """
+    with app.app_context():
+        with db.engine.connect() as connection:
+            # Serialize concurrent workers that start at the same time
+            if is_mysql(connection):
+                acquired = connection.execute(text("SELECT GET_LOCK(:name, :timeout)"), {
+                    "name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT,
+                }).scalar()
+                if acquired != 1:  # 0 on timeout, NULL on error
+                    raise RuntimeError(f"Could not take the schema migration lock within {MIGRATION_LOCK_TIMEOUT} seconds")
+            try:
+                return run_migrations(connection)
+            finally:
+                if is_mysql(connection):
+                    connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
@@ -11,4 +11,6 @@ from .jwt_token_blocklist import JWTTokenBlocklist
 from .forum_thread import ForumThread
 from .forum_reply import ForumReply
 from .user import User
-from .navigator import Category, WebAddress
\ No newline at end of file
+from .navigator import Category, WebAddress
+from .schema_migration import SchemaMigration
+from .import_job import ImportJob, JobLost
\ No newline at end of file
@@ -1,7 +1,9 @@
 # -*- encoding: utf-8 -*-
 
 from datetime import datetime
+from sqlalchemy import delete, insert, update
 from . import db
+from core.config import BaseConfig
 
 class Base(db.Model):
     __abstract__ = True
@@ -22,5 +24,38 @@ class Base(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    @classmethod
+    def bulk_insert(cls, rows, chunk_size=None, table=None):
+        """
+            Insert a list of column dicts with executemany, `chunk_size` rows per statement,
+            into `table` when given (a copy of the model's table).
+            Rows must all have the same keys. Does not commit. Returns the number of rows inserted.
+        """
+        chunk_size = chunk_size or BaseConfig.IMPORT_CHUNK_SIZE
+        table = cls.__table__ if table is None else table
+        for start in range(0, len(rows), chunk_size):
+            db.session.execute(insert(table), rows[start:start + chunk_size])
+        return len(rows)
+
+    @classmethod
+    def bulk_update(cls, rows, chunk_size=None):
+        """
+            Update rows by primary key from a list of column dicts that include `id`. Does not commit.
+        """
+        chunk_size = chunk_size or BaseConfig.IMPORT_CHUNK_SIZE
+        for start in range(0, len(rows), chunk_size):
+            db.session.execute(update(cls), rows[start:start + chunk_size])
+        return len(rows)
+
+    @classmethod
+    def bulk_delete(cls, ids, chunk_size=None):
+        """
+            Delete rows by primary key. Does not commit.
+        """
+        chunk_size = chunk_size or BaseConfig.IMPORT_CHUNK_SIZE
+        for start in range(0, len(ids), chunk_size):
+            db.session.execute(delete(cls.__table__).where(cls.__table__.c.id.in_(ids[start:start + chunk_size])))
+        return len(ids)
+
     def to_dict(self):
         return {column.name: str(getattr(self, column.name)) for column in self.__table__.columns}
\ No newline at end of file
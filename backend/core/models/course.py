@@ -1,5 +1,8 @@
 # -*- encoding: utf-8 -*-
 
+from sqlalchemy import case, func, select
+
+from ..pagination import paginate
 from . import db
 from .base import Base
 
@@ -11,7 +14,7 @@ class Course(Base):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, unique=True)
 
     course_code = db.Column(db.String(255), unique=True, nullable=False)  # AIM3083
-    name_en = db.Column(db.String(255), nullable=False)  # 2D Computer Animation
+    name_en = db.Column(db.String(255), nullable=False, index=True)  # 2D Computer Animation
     name_cn = db.Column(db.String(255), nullable=True)  # 2D Computer Animation
     units = db.Column(db.Integer, nullable=False, default=3)  # 3 or 1
     curriculum_type = db.Column(
@@ -102,41 +105,61 @@ class Course(Base):
         ).all()
 
     @classmethod
-    def get_courses_by_name_or_code_paginated(cls, name_or_code, page, per_page):
-        result = cls.query.filter(
+    def get_courses_by_name_or_code_paginated(cls, name_or_code, page, per_page, cursor=None, with_total=True):
+        query = cls.query.filter(
             cls.name_en.ilike(f"%{name_or_code}%")
             | cls.course_code.ilike(f"%{name_or_code}%")
-        ).paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+        )
+        return paginate(query, [cls.id], page, per_page, cursor, with_total)
 
     @classmethod
-    def get_courses_by_keyword_paginated(cls, keyword, page, per_page):
+    def get_courses_by_keyword_paginated(cls, keyword, page, per_page, cursor=None, with_total=True):
         from .section import Section
+        from ..search import fulltext_matches
 
-        result = (
-            cls.query.join(Section, Section.course_id == cls.id)
-            .filter(
+        course_code = keyword.strip().upper()
+        course_hits = fulltext_matches("course", keyword)
+        section_hits = fulltext_matches("section", keyword)
+
+        if course_hits is None or section_hits is None:
+            # No full-text index, search with ILIKE
+            course_filter = (
                 cls.name_en.ilike(f"%{keyword}%")
                 | cls.course_code.ilike(f"%{keyword}%")
                 | cls.offering_faculty.ilike(f"%{keyword}%")
                 | cls.offering_programme.ilike(f"%{keyword}%")
                 # | cls.description.ilike(f"%{keyword}%") # No course desc to avoid irrelevant results
-                | Section.teachers.ilike(f"%{keyword}%")
-                | Section.classroom.ilike(f"%{keyword}%")
             )
-            .distinct()
-            .paginate(page=page, per_page=per_page, error_out=False)
-        )
-        return result.items, result.total
+            section_filter = Section.teachers.ilike(f"%{keyword}%") | Section.classroom.ilike(f"%{keyword}%")
+            query = cls.query.filter(
+                course_filter | cls.id.in_(select(Section.course_id).where(section_filter))
+            )
+            order_by = [case((cls.course_code == course_code, 0), else_=1), cls.id]
+        else:
+            query = (
+                cls.query.outerjoin(course_hits, course_hits.c.id == cls.id)
+                .filter(
+                    course_hits.c.id.isnot(None)
+                    | cls.course_code.like(f"{course_code}%")
+                    | cls.id.in_(select(Section.course_id).join(section_hits, section_hits.c.id == Section.id))
+                )
+            )
+            # Exact course code first, then by relevance
+            order_by = [
+                case((cls.course_code == course_code, 0), else_=1),
+                func.coalesce(course_hits.c.score, 0).desc(),
+                cls.id,
+            ]
+
+        return paginate(query, order_by, page, per_page, cursor, with_total)
 
     @classmethod
     def get_all_courses(cls):
         return cls.query.all()
 
     @classmethod
-    def get_all_courses_paginated(cls, page, per_page):
-        result = cls.query.paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_all_courses_paginated(cls, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query, [cls.id], page, per_page, cursor, with_total)
 
     @classmethod
     def get_courses_by_ids(cls, ids):
@@ -1,5 +1,6 @@
 # -*- encoding: utf-8 -*-
 
+from ..pagination import paginate
 from . import db
 from .base import Base
 from .user import User
@@ -21,15 +22,23 @@ class ForumReply(Base):
         self.user_id = user_id
         self.reply_text = reply_text
 
-    def to_dict(self):
+    def to_dict(self, usernames=None):
+        if usernames is None:
+            usernames = User.get_usernames_by_ids([self.user_id])
         return {
             "id": self.id,
             "thread_id": self.thread_id,
             "user_id": self.user_id,
-            "username": User.get_by_id(self.user_id).username,
+            "username": usernames.get(self.user_id),
             "reply_text": self.reply_text,
         }
 
+    @classmethod
+    def to_dict_list(cls, replies):
+        # Resolve all authors of the page at once
+        usernames = User.get_usernames_by_ids([reply.user_id for reply in replies])
+        return [reply.to_dict(usernames) for reply in replies]
+
     @classmethod
     def get_reply_by_id(cls, reply_id):
         return cls.query.filter_by(id=reply_id).first()
@@ -39,11 +48,9 @@ class ForumReply(Base):
         return cls.query.filter_by(thread_id=thread_id).all()
 
     @classmethod
-    def get_replies_by_thread_id_paginated(cls, thread_id, page, per_page):
-        result = cls.query.filter_by(thread_id=thread_id).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        return result.items, result.total
+    def get_replies_by_thread_id_paginated(cls, thread_id, page, per_page, cursor=None, with_total=True):
+        query = cls.query.filter_by(thread_id=thread_id)
+        return paginate(query, [cls.id], page, per_page, cursor, with_total)
 
     @classmethod
     def add_reply(cls, thread_id, user_id, reply_text):
@@ -1,6 +1,9 @@
 # -*- encoding: utf-8 -*-
 
+from sqlalchemy import func, select
+
 from core.models.forum_reply import ForumReply
+from ..pagination import paginate
 from . import db
 from .base import Base
 from .user import User
@@ -12,9 +15,9 @@ class ForumThread(Base):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, unique=True)
     
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    thread_subject = db.Column(db.String(255), nullable=False)
+    thread_subject = db.Column(db.String(255), nullable=False, index=True)
     thread_text = db.Column(db.Text())
-    thread_category = db.Column(db.String(255), nullable=False)
+    thread_category = db.Column(db.String(255), nullable=False, index=True)
 
     thread_replies = db.relationship('ForumReply', backref='forum_thread', lazy=True, cascade='all, delete-orphan')
 
@@ -25,16 +28,28 @@ class ForumThread(Base):
         self.thread_text = thread_text
         self.thread_category = thread_category
 
-    def to_dict(self):
+    def to_dict(self, usernames=None):
+        if usernames is None:
+            usernames = User.get_usernames_by_ids([self.user_id])
         return {
             "id": self.id,
             "user_id": self.user_id,
-            "username": User.get_by_id(self.user_id).username,
+            "username": usernames.get(self.user_id),
             "thread_subject": self.thread_subject,
             "thread_text": self.thread_text,
             "thread_category": self.thread_category
         }
     
+    @classmethod
+    def to_dict_list(cls, threads, snippets=None):
+        # Resolve all authors of the page at once
+        usernames = User.get_usernames_by_ids([thread.user_id for thread in threads])
+        items = [thread.to_dict(usernames) for thread in threads]
+        if snippets is not None:
+            for item in items:
+                item["snippet"] = snippets.get(item["id"])
+        return items
+
     @classmethod
     def get_thread_by_id(cls, thread_id):
         return cls.query.filter_by(id=thread_id).first()
@@ -44,58 +59,112 @@ class ForumThread(Base):
         return cls.query.filter_by(user_id=user_id).all()
     
     @classmethod
-    def get_threads_by_user_id_paginated(cls, user_id, page, per_page):
-        result = cls.query.filter_by(user_id=user_id).paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_threads_by_user_id_paginated(cls, user_id, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query.filter_by(user_id=user_id), [cls.id], page, per_page, cursor, with_total)
     
     @classmethod
     def get_threads_by_thread_subject(cls, thread_subject):
         return cls.query.filter_by(thread_subject=thread_subject).all()
     
     @classmethod
-    def get_threads_by_thread_subject_paginated(cls, thread_subject, page, per_page):
-        result = cls.query.filter_by(thread_subject=thread_subject).paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_threads_by_thread_subject_paginated(cls, thread_subject, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query.filter_by(thread_subject=thread_subject), [cls.id], page, per_page, cursor, with_total)
     
     @classmethod
     def get_threads_by_thread_text(cls, thread_text):
         return cls.query.filter_by(thread_text=thread_text).all()
     
     @classmethod
-    def get_threads_by_thread_text_paginated(cls, thread_text, page, per_page):
-        result = cls.query.filter_by(thread_text=thread_text).paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_threads_by_thread_text_paginated(cls, thread_text, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query.filter_by(thread_text=thread_text), [cls.id], page, per_page, cursor, with_total)
     
     @classmethod
     def get_threads_by_category(cls, thread_category):
         return cls.query.filter_by(thread_category=thread_category).all()
     
     @classmethod
-    def get_threads_by_category_paginated(cls, thread_category, page, per_page):
-        result = cls.query.filter_by(thread_category=thread_category).paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_threads_by_category_paginated(cls, thread_category, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query.filter_by(thread_category=thread_category), [cls.id], page, per_page, cursor, with_total)
     
     @classmethod
     def get_threads(cls):
         return cls.query.all()
     
     @classmethod
-    def get_threads_paginated(cls, page, per_page):
-        result = cls.query.paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_threads_paginated(cls, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query, [cls.id], page, per_page, cursor, with_total)
     
     @classmethod
     def search_threads(cls, keyword, page, per_page):
         result = cls.query.filter(cls.thread_subject.contains(keyword) | cls.thread_text.contains(keyword) | cls.thread_category.contains(keyword)).paginate(page=page, per_page=per_page, error_out=False)
         return result.items, result
     
-    # 有问题
     @classmethod
-    def search_threads_and_replies(cls, keyword, page, per_page):
-        # 同时查询主题和帖子回复，返回符合要求的帖子
-        threads = cls.query.filter(cls.thread_subject.contains(keyword) | cls.thread_text.contains(keyword) | cls.thread_category.contains(keyword) | cls.thread_replies.any(ForumReply.reply_text.contains(keyword))).paginate(page=page, per_page=per_page, error_out=False)
-        return threads.items, threads.total
-    
+    def search_threads_and_replies(cls, keyword, page, per_page, cursor=None, with_total=True):
+        # 同时查询主题和帖子回复，返回符合要求的帖子, 按相关度排序
+        from ..search import fulltext_matches
+
+        thread_hits = fulltext_matches("forum_thread", keyword)
+        reply_hits = fulltext_matches("forum_reply", keyword)
+
+        if thread_hits is None or reply_hits is None:
+            # No full-text index, search with LIKE
+            replied = select(ForumReply.thread_id).where(ForumReply.reply_text.contains(keyword))
+            query = cls.query.filter(
+                cls.thread_subject.contains(keyword)
+                | cls.thread_text.contains(keyword)
+                | (cls.thread_category == keyword)
+                | cls.id.in_(replied)
+            )
+            order_by = [cls.id.desc()]
+        else:
+            # Best reply score per thread
+            replied = (
+                select(ForumReply.thread_id.label("thread_id"), func.max(reply_hits.c.score).label("score"))
+                .join(reply_hits, reply_hits.c.id == ForumReply.id)
+                .group_by(ForumReply.thread_id)
+                .subquery()
+            )
+            query = (
+                cls.query.outerjoin(thread_hits, thread_hits.c.id == cls.id)
+                .outerjoin(replied, replied.c.thread_id == cls.id)
+                .filter(
+                    thread_hits.c.id.isnot(None)
+                    | replied.c.thread_id.isnot(None)
+                    | (cls.thread_category == keyword)
+                )
+            )
+            order_by = [
+                (func.coalesce(thread_hits.c.score, 0) + func.coalesce(replied.c.score, 0)).desc(),
+                cls.id.desc(),
+            ]
+
+        return paginate(query, order_by, page, per_page, cursor, with_total)
+
+    @classmethod
+    def get_search_snippets(cls, threads, keyword):
+        """
+            Match snippet of each thread, taken from the thread text or else its best matching reply
+        """
+        from ..search import fulltext_matches, make_snippet
+
+        snippets = {thread.id: make_snippet(thread.thread_text, keyword) for thread in threads}
+        missing = [thread_id for thread_id, snippet in snippets.items() if snippet is None]
+        if not missing:
+            return snippets
+
+        reply_hits = fulltext_matches("forum_reply", keyword)
+        query = select(ForumReply.thread_id, ForumReply.reply_text).where(ForumReply.thread_id.in_(missing))
+        if reply_hits is None:
+            query = query.where(ForumReply.reply_text.contains(keyword)).order_by(ForumReply.id)
+        else:
+            query = query.join(reply_hits, reply_hits.c.id == ForumReply.id).order_by(reply_hits.c.score.desc())
+
+        for thread_id, reply_text in db.session.execute(query):
+            if snippets[thread_id] is None:
+                snippets[thread_id] = make_snippet(reply_text, keyword)
+        return snippets
+
     @classmethod
     def add_thread(cls, user_id, thread_subject, thread_text, thread_category):
         thread = cls(user_id, thread_subject, thread_text, thread_category)
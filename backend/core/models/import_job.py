@@ -0,0 +1,270 @@
+# -*- encoding: utf-8 -*-
+
+import json
+import os
+import shutil
+from datetime import timedelta
+from sqlalchemy import and_, or_, select, update
+from . import db
+from .base import Base
+from .jwt_token_blocklist import utcnow
+from core.config import BaseConfig
+
+job_kind_enum = db.Enum('timetable', 'descriptions', 'import', name='job_kind_enum')
+job_status_enum = db.Enum('queued', 'running', 'succeeded', 'failed', name='job_status_enum')
+
+
+class JobLost(Exception):
+    """
+        The job was requeued and claimed again since this attempt started, its work must not be committed
+    """
+    pass
+
+
+class ImportJob(Base):
+    """
+        A course upload or import that runs in the background.
+        The uploaded file and the parsed data are staged on disk under `staging_dir`,
+        so any worker process can pick the job up, also after a restart.
+    """
+
+    __tablename__ = 'import_job'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, unique=True)
+
+    kind = db.Column(job_kind_enum, nullable=False)  # timetable: parse an xlsx, descriptions: parse a pdf, import: load parsed data
+    status = db.Column(job_status_enum, nullable=False, default='queued', index=True)
+    user_id = db.Column(db.Integer, nullable=True)  # the admin who started the job
+    filename = db.Column(db.String(255), nullable=True)  # Course_List_and_Timetable_Semester_1_of_AY2024-25.xlsx
+    semester = db.Column(db.String(64), nullable=True)  # Semester 1 of AY2024-25
+    mode = db.Column(db.String(16), nullable=True)  # import mode: replace, incremental, swap
+    timetable_job_id = db.Column(db.Integer, nullable=True)  # import jobs: the parsed timetable to load
+    descriptions_job_id = db.Column(db.Integer, nullable=True)  # import jobs: the parsed descriptions, optional
+
+    stage = db.Column(db.String(255), nullable=True)  # Reading the timetable
+    rows_total = db.Column(db.Integer, nullable=True)
+    rows_done = db.Column(db.Integer, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+
+    worker = db.Column(db.String(64), nullable=True)  # hostname:pid of the process running the job
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)  # UTC
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # refreshed while running, a stale one means the worker died
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # The attempt this process runs, set by the job runner. Not a column: it must not be
+    # refreshed from the row, which another worker may have claimed again meanwhile.
+    claimed_attempt = None
+
+    def __init__(self, kind, user_id=None, filename=None, semester=None, mode=None,
+                 timetable_job_id=None, descriptions_job_id=None):
+        super(ImportJob, self).__init__()
+        self.kind = kind
+        self.status = 'queued'
+        self.user_id = user_id
+        self.filename = filename
+        self.semester = semester
+        self.mode = mode
+        self.timetable_job_id = timetable_job_id
+        self.descriptions_job_id = descriptions_job_id
+        self.attempts = 0
+        self.created_at = utcnow()
+
+    @staticmethod
+    def staging_path(job_id, name=""):
+        return os.path.join(BaseConfig.IMPORT_STAGING_DIR, str(job_id), name)
+
+    @property
+    def staging_dir(self):
+        return self.staging_path(self.id)
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    @property
+    def expired(self):
+        """
+            Whether `purge_staging` removed the staged files of this upload
+        """
+        return not os.path.isdir(self.staging_dir)
+
+    def to_dict(self):
+        end = self.finished_at or utcnow()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "filename": self.filename,
+            "semester": self.semester,
+            "mode": self.mode,
+            "stage": self.stage,
+            "progress": {
+                "rows_done": self.rows_done,
+                "rows_total": self.rows_total,
+                "percent": round(100 * self.rows_done / self.rows_total, 1) if self.rows_total else None,
+            },
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "timing": {
+                "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
+                "started_at": self.started_at.isoformat() + "Z" if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() + "Z" if self.finished_at else None,
+                "queued_seconds": round(((self.started_at or end) - self.created_at).total_seconds(), 3),
+                "run_seconds": round((end - self.started_at).total_seconds(), 3) if self.started_at else None,
+            },
+        }
+
+    @classmethod
+    def get_by_id(cls, job_id):
+        return db.session.get(cls, job_id)
+
+    @classmethod
+    def latest(cls, kind, after_id=0, status=None):
+        query = cls.query.filter(cls.kind == kind, cls.id > after_id)
+        if status is not None:
+            query = query.filter(cls.status == status)
+        return query.order_by(cls.id.desc()).first()
+
+    @classmethod
+    def active_import(cls):
+        return cls.query.filter(cls.kind == 'import', cls.status.in_(('queued', 'running'))).first()
+
+    """
+        State changes
+        Issued as single UPDATE statements on their own connection, so they are
+        visible to other workers at once and never commit a job's own transaction.
+        `attempts` is the owner token: the changes of a running job only apply while
+        it is still running the attempt that made them, so a worker that was taken
+        for dead and requeued cannot overwrite the next attempt.
+    """
+
+    @classmethod
+    def update_job(cls, job_id, *criteria, **values):
+        with db.engine.begin() as connection:
+            return connection.execute(update(cls).where(cls.id == job_id, *criteria).values(**values)).rowcount
+
+    @classmethod
+    def owned(cls, attempt):
+        # Criteria of a job still running the given attempt
+        return cls.status == 'running', cls.attempts == attempt
+
+    @classmethod
+    def claim(cls, job_id, worker):
+        """
+            Mark a queued job as running by this worker and return the attempt number,
+            None if another worker got it first
+        """
+        now = utcnow()
+        with db.engine.begin() as connection:
+            if cls.import_in_progress(connection, job_id):
+                connection.execute(update(cls).where(cls.id == job_id, cls.status == 'queued')
+                                   .values(status='failed', error='Another import is in progress.', finished_at=now))
+                return None
+            claimed = connection.execute(
+                update(cls).where(cls.id == job_id, cls.status == 'queued')
+                .values(status='running', worker=worker, started_at=now, heartbeat_at=now, attempts=cls.attempts + 1)
+            ).rowcount
+            if claimed != 1:
+                return None
+            return connection.execute(select(cls.attempts).where(cls.id == job_id)).scalar()
+
+    @classmethod
+    def import_in_progress(cls, connection, job_id):
+        """
+            Whether the job is an import that must not run: another import is running, or
+            an older one is queued. The import API checks this too, but two requests can
+            both pass that check; the locking read makes concurrent claims wait for each
+            other (MySQL), so only one of the imports they queued ever runs.
+        """
+        active = connection.execute(select(cls.id, cls.status)
+                                    .where(cls.kind == 'import', cls.status.in_(('queued', 'running')))
+                                    .with_for_update()).all()
+        if job_id not in {id for id, _ in active}:
+            return False
+        return any(id != job_id and (status == 'running' or id < job_id) for id, status in active)
+
+    def report(self, stage, rows_done=None, rows_total=None):
+        """
+            Progress of the running attempt, raises JobLost when the job is no longer its own
+        """
+        values = {"stage": stage, "heartbeat_at": utcnow()}
+        if rows_done is not None:
+            values["rows_done"] = rows_done
+        if rows_total is not None:
+            values["rows_total"] = rows_total
+        if not self.update_job(self.id, *self.owned(self.claimed_attempt), **values):
+            raise JobLost(f"Import job {self.id} was requeued")
+
+    def fence(self):
+        """
+            Check in the current transaction, right before committing the job's work, that
+            the job is still this attempt's. The row stays locked until the commit (MySQL),
+            so it cannot be requeued in between. Raises JobLost otherwise.
+        """
+        rows = db.session.execute(update(ImportJob).where(ImportJob.id == self.id, *self.owned(self.claimed_attempt))
+                                  .values(heartbeat_at=utcnow())).rowcount
+        if rows != 1:
+            raise JobLost(f"Import job {self.id} was requeued")
+
+    @classmethod
+    def succeed(cls, job_id, attempt, result):
+        return cls.update_job(job_id, *cls.owned(attempt), status='succeeded', stage='Done',
+                              result=json.dumps(result), error=None, finished_at=utcnow()) == 1
+
+    @classmethod
+    def fail(cls, job_id, attempt, error):
+        return cls.update_job(job_id, *cls.owned(attempt), status='failed', error=error,
+                              finished_at=utcnow()) == 1
+
+    @classmethod
+    def heartbeat(cls, attempts):
+        """
+            `attempts` are the (job ID, attempt) pairs this process runs
+        """
+        if attempts:
+            with db.engine.begin() as connection:
+                connection.execute(update(cls).where(or_(*(and_(cls.id == job_id, *cls.owned(attempt))
+                                                           for job_id, attempt in attempts)))
+                                   .values(heartbeat_at=utcnow()))
+
+    @classmethod
+    def requeue_stale(cls):
+        """
+            Put running jobs back in the queue whose worker stopped sending heartbeats,
+            or fail them after too many attempts. Returns the number of requeued jobs.
+        """
+        stale = utcnow() - timedelta(seconds=BaseConfig.IMPORT_JOB_STALE_AFTER)
+        criteria = (cls.status == 'running', cls.heartbeat_at < stale)
+        with db.engine.begin() as connection:
+            connection.execute(update(cls).where(*criteria, cls.attempts >= BaseConfig.IMPORT_JOB_MAX_ATTEMPTS)
+                               .values(status='failed', error='The worker running the job stopped.',
+                                       finished_at=utcnow()))
+            return connection.execute(update(cls).where(*criteria).values(status='queued', worker=None)).rowcount
+
+    @classmethod
+    def queued_ids(cls, limit):
+        return [id for (id,) in db.session.query(cls.id).filter(cls.status == 'queued')
+                .order_by(cls.id).limit(limit).all()]
+
+    @classmethod
+    def purge_staging(cls):
+        """
+            Remove the staged files of jobs that finished longer ago than the retention period
+        """
+        if not os.path.isdir(BaseConfig.IMPORT_STAGING_DIR):
+            return
+        staged = [int(name) for name in os.listdir(BaseConfig.IMPORT_STAGING_DIR) if name.isdigit()]
+        if not staged:
+            return
+        expired = utcnow() - timedelta(seconds=BaseConfig.IMPORT_STAGING_RETENTION)
+        # Keep the uploads a queued or running import still reads
+        in_use = {job_id for job in cls.query.filter(cls.kind == 'import', cls.status.in_(('queued', 'running')))
+                  for job_id in (job.timetable_job_id, job.descriptions_job_id)}
+        for (job_id,) in db.session.query(cls.id).filter(cls.id.in_(staged), cls.finished_at < expired).all():
+            if job_id in in_use:
+                continue
+            shutil.rmtree(cls.staging_path(job_id), ignore_errors=True)
@@ -1,23 +1,142 @@
 # -*- encoding: utf-8 -*-
 
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import jwt
 from . import db
 from .base import Base
+from core.bloom import BloomFilter
+from core.config import BaseConfig
 
 token_type_enum = db.Enum('token', 'vCode', name='token_type_enum')
 
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class JWTTokenBlocklist(Base):
 
     __tablename__ = 'jwt_token_blocklist'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, unique=True)
 
-    jwt_token = db.Column(db.Text(), unique=True, nullable=False)
+    token_digest = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the token, hex
     token_type = db.Column(token_type_enum, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC, the row is purged afterwards
+    created_at = db.Column(db.DateTime, nullable=True, index=True)  # UTC, when the token was blocklisted
 
-    def __init__(self, jwt_token, token_type):
-        self.jwt_token = jwt_token
+    # In-memory pre-filter of blocklisted digests, rebuilt and synced by the periodic task
+    bloom_filter = None
+    bloom_filter_synced_at = None  # UTC, when the last sync or rebuild started
+    bloom_filter_built_at = 0
+    bloom_filter_lock = threading.Lock()
+
+    def __init__(self, token_digest, token_type, expires_at):
+        self.token_digest = token_digest
         self.token_type = token_type
+        self.expires_at = expires_at
+        self.created_at = utcnow()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def token_expires_at(token):
+        # The signature has been checked by the caller, only the expiry is needed here
+        try:
+            exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        except jwt.InvalidTokenError:
+            exp = None
+        if exp is None:
+            return utcnow() + BaseConfig.JWT_ACCESS_TOKEN_EXPIRES
+        return datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+
+    @classmethod
+    def add_token(cls, token, token_type):
+        digest = cls.digest(token)
+        entry = cls(token_digest=digest, token_type=token_type, expires_at=cls.token_expires_at(token))
+        entry.save()
+        if cls.bloom_filter is not None:
+            cls.bloom_filter.add(digest)
+        return entry
+
+    @classmethod
+    def filter_is_current(cls):
+        """
+            Whether the periodic task synced the filter recently, entries other processes
+            added since are at most one sync interval old
+        """
+        if cls.bloom_filter is None or cls.bloom_filter_synced_at is None:
+            return False
+        stale = timedelta(seconds=BaseConfig.JWT_BLOCKLIST_SYNC_INTERVAL + BaseConfig.JWT_BLOCKLIST_SYNC_MARGIN)
+        return utcnow() - cls.bloom_filter_synced_at <= stale
+
+    @classmethod
+    def is_token_blocklisted(cls, token, token_type="token"):
+        """
+            Tokens blocklisted by this process are in the filter at once, those of other
+            processes after the next periodic sync. A miss is answered without the database
+            while the filter is current. Used vCodes are always looked up: they are rare,
+            and replaying one within a sync interval must not work.
+        """
+        digest = cls.digest(token)
+        if token_type != "vCode" and cls.filter_is_current():
+            # A Bloom filter has no false negatives, so a miss needs no lookup
+            if digest not in cls.bloom_filter:
+                return False
+        return db.session.query(db.exists().where(cls.token_digest == digest)).scalar()
+
+    @classmethod
+    def rebuild_filter(cls):
+        started = utcnow()
+        rows = db.session.query(cls.token_digest).filter(cls.expires_at > started).all()
+
+        bloom_filter = BloomFilter(max(len(rows) * 2, BaseConfig.JWT_BLOCKLIST_FILTER_CAPACITY),
+                                   BaseConfig.JWT_BLOCKLIST_FILTER_ERROR_RATE)
+        for (digest,) in rows:
+            bloom_filter.add(digest)
+
+        with cls.bloom_filter_lock:
+            cls.bloom_filter = bloom_filter
+            cls.bloom_filter_synced_at = started
+            cls.bloom_filter_built_at = time.monotonic()
+
+    @classmethod
+    def sync_filter(cls):
+        """
+            Add entries inserted by other processes since the last sync. IDs are assigned on
+            insert, not on commit, so a high-water mark on the ID would skip entries committed
+            out of order; the window overlaps the last one by JWT_BLOCKLIST_SYNC_MARGIN instead,
+            longer than any commit takes or the clocks of two processes differ.
+        """
+        started = utcnow()
+        since = cls.bloom_filter_synced_at - timedelta(seconds=BaseConfig.JWT_BLOCKLIST_SYNC_MARGIN)
+        rows = db.session.query(cls.token_digest).filter(cls.created_at >= since).all()
+        with cls.bloom_filter_lock:
+            for (digest,) in rows:
+                cls.bloom_filter.add(digest)
+            cls.bloom_filter_synced_at = started
+
+    @classmethod
+    def purge_expired(cls):
+        deleted = cls.query.filter(cls.expires_at <= utcnow()).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
 
     @classmethod
-    def is_token_blocklisted(cls, token):
-        return db.session.query(db.exists().where(cls.jwt_token == token)).scalar()
\ No newline at end of file
+    def maintain(cls):
+        """
+            Periodic task: purge expired rows and keep the pre-filter up to date
+        """
+        cls.purge_expired()
+        # Rebuild from time to time to shed purged digests and to resize the filter
+        if (cls.bloom_filter is None
+                or len(cls.bloom_filter) > cls.bloom_filter.capacity
+                or time.monotonic() - cls.bloom_filter_built_at > BaseConfig.JWT_BLOCKLIST_REBUILD_INTERVAL):
+            cls.rebuild_filter()
+        else:
+            cls.sync_filter()
@@ -1,3 +1,5 @@
+from sqlalchemy.orm import contains_eager
+
 from . import db
 from .base import Base
 
@@ -5,7 +7,7 @@ class Category(Base):
     __tablename__ = 'nav_category'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False, index=True)
     name_en = db.Column(db.String(255), nullable=True)
     abbreviation = db.Column(db.String(255), nullable=True)
     dept_website = db.Column(db.String(255), nullable=True)
@@ -46,6 +48,16 @@ class Category(Base):
     @classmethod
     def get_all_categories(cls):
         return cls.query.all()
+
+    @classmethod
+    def get_category_tree(cls):
+        """
+            All categories with their web addresses loaded in a single joined query
+        """
+        return cls.query.outerjoin(cls.web_addresses) \
+            .options(contains_eager(cls.web_addresses)) \
+            .order_by(cls.id, WebAddress.id) \
+            .all()
     
     @classmethod
     def add_category(cls, name, name_en, abbreviation, dept_website, cover):
@@ -80,7 +92,7 @@ class WebAddress(Base):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     category_id = db.Column(db.Integer, db.ForeignKey('nav_category.id'), nullable=False)
-    url = db.Column(db.String(255), nullable=False)
+    url = db.Column(db.String(255), nullable=False, index=True)
     icon = db.Column(db.String(255), nullable=True)
     title = db.Column(db.String(255), nullable=False)
     title_en = db.Column(db.String(255), nullable=True)
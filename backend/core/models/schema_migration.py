@@ -0,0 +1,21 @@
+# -*- encoding: utf-8 -*-
+
+from sqlalchemy import func
+from . import db
+from .base import Base
+
+
+class SchemaMigration(Base):
+
+    __tablename__ = "schema_migration"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, unique=True)
+
+    version = db.Column(db.Integer, unique=True, nullable=False)  # 1, 2, 3, ...
+    description = db.Column(db.String(255), nullable=False)  # Create tables
+    applied_at = db.Column(db.DateTime, default=func.now(), nullable=False)
+
+    def __init__(self, version, description):
+        super(SchemaMigration, self).__init__()
+        self.version = version
+        self.description = description
@@ -1,5 +1,8 @@
 # -*- encoding: utf-8 -*-
 
+from sqlalchemy import case, func
+from sqlalchemy.orm import contains_eager, joinedload
+from ..pagination import paginate
 from . import db
 from .base import Base
 from .course import Course
@@ -53,8 +56,8 @@ class Section(Base):
         return {
             "id": self.id,
             "course_id": self.course_id,
-            "course_code": Course.get_course_by_id(self.course_id).course_code,
-            "course_name": Course.get_course_by_id(self.course_id).name_en,
+            "course_code": self.course.course_code,
+            "course_name": self.course.name_en,
             "offer_semester": self.offer_semester,
             "section_number": self.section_number,
             "classroom": self.classroom,
@@ -73,11 +76,14 @@ class Section(Base):
         return cls.query.filter_by(course_id=course_id).all()
 
     @classmethod
-    def get_sections_by_course_id_paginated(cls, course_id, page, per_page):
-        result = cls.query.filter_by(course_id=course_id).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        return result.items, result.total
+    def query_with_course(cls):
+        # Load the course in the same query, to_dict needs its code and name
+        return cls.query.options(joinedload(cls.course))
+
+    @classmethod
+    def get_sections_by_course_id_paginated(cls, course_id, page, per_page, cursor=None, with_total=True):
+        query = cls.query_with_course().filter_by(course_id=course_id)
+        return paginate(query, [cls.id], page, per_page, cursor, with_total)
 
     @classmethod
     def get_sections_by_course_code(cls, course_code):
@@ -87,34 +93,54 @@ class Section(Base):
         return []
 
     @classmethod
-    def get_sections_by_course_code_paginated(cls, course_code, page, per_page):
+    def get_sections_by_course_code_paginated(cls, course_code, page, per_page, cursor=None, with_total=True):
         course = Course.get_course_by_code(course_code)
         if course:
-            result = cls.query.filter_by(course_id=course.id).paginate(
-                page=page, per_page=per_page, error_out=False
-            )
-            return result.items, result.total
-        return [], 0
+            query = cls.query_with_course().filter_by(course_id=course.id)
+            return paginate(query, [cls.id], page, per_page, cursor, with_total)
+        return [], 0, None
 
     @classmethod
-    def get_sections_by_keyword_paginated(cls, keyword, page, per_page):
-        # 根据 course_name, course_code, section_number, classroom, schedule, hours, remarks, teachers 进行模糊查询
-        result = (
-            cls.query.join(Course, Course.id == cls.course_id)
-            .filter(
+    def get_sections_by_keyword_paginated(cls, keyword, page, per_page, cursor=None, with_total=True):
+        # 根据 course_name, course_code, classroom, teachers 进行搜索
+        from ..search import fulltext_matches
+
+        course_code = keyword.strip().upper()
+        course_hits = fulltext_matches("course", keyword)
+        section_hits = fulltext_matches("section", keyword)
+
+        query = cls.query.join(Course, Course.id == cls.course_id).options(contains_eager(cls.course))
+        if course_hits is None or section_hits is None:
+            # No full-text index, search with ILIKE
+            query = query.filter(
                 Course.name_en.ilike(f"%{keyword}%")
                 | Course.course_code.ilike(f"%{keyword}%")
                 | cls.classroom.ilike(f"%{keyword}%")
                 | cls.teachers.ilike(f"%{keyword}%")
             )
-            .paginate(page=page, per_page=per_page, error_out=False)
-        )
-        return result.items, result.total
+            order_by = [case((Course.course_code == course_code, 0), else_=1), cls.id]
+        else:
+            query = (
+                query.outerjoin(section_hits, section_hits.c.id == cls.id)
+                .outerjoin(course_hits, course_hits.c.id == Course.id)
+                .filter(
+                    section_hits.c.id.isnot(None)
+                    | course_hits.c.id.isnot(None)
+                    | Course.course_code.like(f"{course_code}%")
+                )
+            )
+            # Exact course code first, then by relevance
+            order_by = [
+                case((Course.course_code == course_code, 0), else_=1),
+                (func.coalesce(section_hits.c.score, 0) + func.coalesce(course_hits.c.score, 0)).desc(),
+                cls.id,
+            ]
+
+        return paginate(query, order_by, page, per_page, cursor, with_total)
 
     @classmethod
-    def get_all_sections_paginated(cls, page, per_page):
-        result = cls.query.paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_all_sections_paginated(cls, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query_with_course(), [cls.id], page, per_page, cursor, with_total)
 
     @classmethod
     def add_section(
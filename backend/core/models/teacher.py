@@ -26,9 +26,11 @@ class Teacher(Base):
     office_room = db.Column(db.String(255), nullable=True)  # T8-401-R7
     position = db.Column(db.String(255), nullable=True)  # Professor\Chief Student Affairs Officer
     photo_url = db.Column(db.String(255), nullable=True)  # /attachment/images/2023/09/09/image_1694246750_ob5RLbGP.jpeg
+    record_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the staff directory record, to detect changes
+    deleted_at = db.Column(db.DateTime, nullable=True)  # UTC, set when the teacher left the staff directory
     info = db.relationship("TeacherInfo", backref="teacher", lazy=True, cascade="all, delete-orphan")
 
-    def __init__(self, id, mis_id, name, name_en, email, gender, title, first_name, middle_name, last_name, username, nationality, phone, phone_short, employee_number, office_room, position, photo_url):
+    def __init__(self, id, mis_id, name, name_en, email, gender, title, first_name, middle_name, last_name, username, nationality, phone, phone_short, employee_number, office_room, position, photo_url, record_hash=None, deleted_at=None):
         self.id = id
         self.mis_id = mis_id
         self.name = name
@@ -47,6 +49,8 @@ class Teacher(Base):
         self.office_room = office_room
         self.position = position
         self.photo_url = photo_url
+        self.record_hash = record_hash
+        self.deleted_at = deleted_at
 
 class TeacherInfo(Base):
 
@@ -1,11 +1,16 @@
 # -*- encoding: utf-8 -*-
 
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.security import generate_password_hash, check_password_hash
 from uuid import uuid4
 from . import db
 from .base import Base
+from core.cache import TTLCache
+from core.pagination import paginate
+from core.config import BaseConfig
 from core.utils import convert_dt
 
 user_type_enum = db.Enum(
@@ -21,6 +26,9 @@ account_status_enum = db.Enum(
     "ACTIVE", "INACTIVE", name="account_status_enum", default="ACTIVE"
 )
 
+# user id -> username, dropped whenever the user is saved or deleted
+username_cache = TTLCache(BaseConfig.USERNAME_CACHE_SIZE, BaseConfig.USERNAME_CACHE_TTL)
+
 
 class User(Base):
 
@@ -65,6 +73,16 @@ class User(Base):
         self.account_status = account_status
         self.default_entrypoint = default_entrypoint
 
+    def save(self):
+        user_id = self.id
+        super(User, self).save()
+        username_cache.pop(user_id)
+
+    def delete(self):
+        user_id = self.id
+        super(User, self).delete()
+        username_cache.pop(user_id)
+
     def get_id(self):
         return self.id
 
@@ -133,6 +151,28 @@ class User(Base):
             "updated_at": convert_dt(self.updated_at),
         }
 
+    def to_snapshot(self):
+        """
+            Column values of the user, used to rebuild it later without a query
+        """
+        return {column.key: getattr(self, column.key) for column in self.__table__.columns}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+            Rebuild a user from a snapshot and attach it to the current session without a query.
+            When the session already holds that user, that instance is returned instead.
+        """
+        user = cls.__mapper__.class_manager.new_instance()
+        for key, value in snapshot.items():
+            set_committed_value(user, key, value)
+        make_transient_to_detached(user)
+        loaded = db.session.identity_map.get(inspect(user).key)
+        if loaded is not None:
+            return loaded
+        db.session.add(user)
+        return user
+
     @classmethod
     def register(
         cls,
@@ -184,6 +224,26 @@ class User(Base):
         return cls.query.filter_by(username=username).first()
 
     @classmethod
-    def get_all_users_paginated(cls, page, per_page):
-        result = cls.query.paginate(page=page, per_page=per_page, error_out=False)
-        return result.items, result.total
+    def get_usernames_by_ids(cls, user_ids):
+        """
+            Resolve the usernames of many users with at most one query, returns {user_id: username}
+        """
+        usernames = dict()
+        missing = list()
+        for user_id in set(user_ids):
+            username = username_cache.get(user_id)
+            if username is None:
+                missing.append(user_id)
+            else:
+                usernames[user_id] = username
+
+        if missing:
+            for user_id, username in db.session.query(cls.id, cls.username).filter(cls.id.in_(missing)):
+                username_cache.set(user_id, username)
+                usernames[user_id] = username
+
+        return usernames
+
+    @classmethod
+    def get_all_users_paginated(cls, page, per_page, cursor=None, with_total=True):
+        return paginate(cls.query, [cls.id], page, per_page, cursor, with_total)
@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Pagination for list endpoints
+
+    Page-number mode (`current`/`pageSize`) uses OFFSET and always counts the rows.
+    Cursor mode (`cursor`, empty for the first page) seeks past the sort keys of the
+    last row of the previous page, so deep pages cost the same as the first one,
+    and counts the rows only when `withTotal` is set.
+"""
+
+import base64
+import json
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    data = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, length):
+    """
+        The sort key values of a cursor, raises InvalidCursor unless it holds `length` scalars
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor(cursor)
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def sort_key(ordering):
+    """
+        (expression, descending) of an ORDER BY item such as `Course.id` or `score.desc()`
+    """
+    if isinstance(ordering, UnaryExpression) and ordering.modifier in (operators.desc_op, operators.asc_op):
+        return ordering.element, ordering.modifier is operators.desc_op
+    return ordering, False
+
+
+def seek_after(keys, values):
+    """
+        Rows that sort after the given key values: (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+    """
+    clauses = []
+    for position, (expression, descending) in enumerate(keys):
+        equal = [key == value for (key, _), value in zip(keys[:position], values)]
+        after = expression < values[position] if descending else expression > values[position]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def paginate(query, order_by, page, per_page, cursor=None, with_total=True):
+    """
+        A page of `query` sorted by `order_by`, which must end with a unique column.
+        Returns (items, total, next_cursor); total is None when not counted and
+        next_cursor is None on the last page or in page-number mode.
+    """
+    query = query.order_by(*order_by)
+
+    if cursor is None:
+        result = query.paginate(page=page, per_page=per_page, error_out=False)
+        return result.items, result.total, None
+
+    per_page = max(per_page, 1)
+    keys = [sort_key(ordering) for ordering in order_by]
+    total = query.order_by(None).count() if with_total else None
+
+    keyed = query.add_columns(*(expression for expression, _ in keys))
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        keyed = keyed.filter(seek_after(keys, values))
+
+    # One extra row tells whether there is a next page
+    rows = keyed.limit(per_page + 1).all()
+    next_cursor = encode_cursor(list(rows[per_page - 1][1:])) if len(rows) > per_page else None
+    return [row[0] for row in rows[:per_page]], total, next_cursor
+
+
+def cursor_args(args):
+    """
+        The `cursor` and `withTotal` query parameters, cursor is None in page-number mode
+    """
+    cursor = args.get("cursor")
+    with_total = args.get("withTotal", "false").lower() in ("1", "true")
+    return cursor, with_total
+
+
+def pagination_info(current, page_size, total, cursor=None, next_cursor=None):
+    """
+        The `pagination` block of a list response
+    """
+    if cursor is None:
+        return {"total": total, "current": current, "pageSize": page_size}
+    return {"total": total, "pageSize": page_size, "nextCursor": next_cursor}
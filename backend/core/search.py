@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Full-text search
+
+    MariaDB/MySQL searches FULLTEXT indexes with MATCH ... AGAINST in boolean mode.
+    SQLite searches FTS5 tables that triggers keep in sync with the base tables.
+    On other databases `fulltext_matches` returns None and callers fall back to ILIKE.
+    The indexes are created by the migrations from `FULLTEXT_INDEXES`.
+"""
+
+import re
+
+from sqlalchemy import Float, Integer, column, select, table, text
+from sqlalchemy.dialects.mysql import match
+
+from .config import BaseConfig
+from .models import db
+
+# table -> (index name, indexed columns)
+FULLTEXT_INDEXES = {
+    "course": ("ft_course", ("course_code", "name_en", "offering_faculty", "offering_programme")),
+    "section": ("ft_section", ("teachers", "classroom")),
+    "forum_thread": ("ft_forum_thread", ("thread_subject", "thread_text")),
+    "forum_reply": ("ft_forum_reply", ("reply_text",)),
+}
+
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def fulltext_dialect(bind):
+    name = bind.dialect.name
+    if name in ("mysql", "mariadb"):
+        return "mysql"
+    if name == "sqlite":
+        return "sqlite"
+    return None
+
+
+def search_terms(keyword):
+    return TERM_PATTERN.findall(keyword or "")
+
+
+def make_snippet(value, keyword, length=None):
+    """
+        The part of a text around the first occurrence of a search term, marked with ellipses where cut.
+        Returns None when no term occurs in the text.
+    """
+    if not value:
+        return None
+    length = length or BaseConfig.SEARCH_SNIPPET_LENGTH
+    terms = search_terms(keyword) or [keyword.strip()]
+    found = re.search("|".join(re.escape(term) for term in terms if term), value, re.IGNORECASE)
+    if found is None:
+        return None
+
+    start = max(0, found.start() - length // 3)
+    end = min(len(value), start + length)
+    start = max(0, end - length)
+    snippet = " ".join(value[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(value) else "")
+
+
+"""
+    Index maintenance
+"""
+
+def create_fulltext_index(connection, table_name, target=None):
+    """
+        Create the full-text index of a table if it does not exist yet,
+        on `target` instead when given (a copy of the table)
+    """
+    index_name, columns = FULLTEXT_INDEXES[table_name]
+    dialect = fulltext_dialect(connection)
+    table_name = target or table_name
+
+    if dialect == "mysql":
+        existing = {row[2] for row in connection.execute(text(f"SHOW INDEX FROM `{table_name}`"))}
+        if index_name not in existing:
+            column_list = ", ".join(f"`{name}`" for name in columns)
+            connection.execute(text(f"CREATE FULLTEXT INDEX `{index_name}` ON `{table_name}` ({column_list})"))
+
+    elif dialect == "sqlite":
+        fts_table = f"{table_name}_fts"
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{name}" for name in columns)
+        old_values = ", ".join(f"old.{name}" for name in columns)
+        delete_old = (f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+                      f"VALUES ('delete', old.id, {old_values});")
+        insert_new = f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});"
+
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} "
+            f"USING fts5({column_list}, content='{table_name}', content_rowid='id')"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table_name} BEGIN {insert_new} END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table_name} BEGIN {delete_old} END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table_name} BEGIN {delete_old} {insert_new} END"
+        ))
+        # Index the rows that existed before the triggers
+        connection.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+
+"""
+    Queries
+"""
+
+def fulltext_matches(table_name, keyword):
+    """
+        Subquery of (id, score) for the rows of a table matching every term of the keyword,
+        a higher score is more relevant. Terms match as prefixes, so "COMP30" finds COMP3013.
+        Returns None when the database has no full-text index or the keyword has no indexable term.
+    """
+    _, columns = FULLTEXT_INDEXES[table_name]
+    terms = search_terms(keyword)
+    dialect = fulltext_dialect(db.engine)
+
+    if dialect == "mysql":
+        # Terms shorter than innodb_ft_min_token_size are not indexed and would never match
+        terms = [term for term in terms if len(term) >= BaseConfig.FULLTEXT_MIN_TOKEN_SIZE]
+        if not terms:
+            return None
+        source = table(table_name, column("id"), *(column(name) for name in columns))
+        relevance = match(*(source.c[name] for name in columns),
+                          against=" ".join(f"+{term}*" for term in terms)).in_boolean_mode()
+        return select(source.c.id.label("id"), relevance.label("score")).where(relevance).subquery()
+
+    if dialect == "sqlite":
+        if not terms:
+            return None
+        fts_table = f"{table_name}_fts"
+        # LIMIT -1 keeps SQLite from flattening this into an aggregate query, where bm25() is not allowed
+        statement = text(
+            f"SELECT rowid AS id, -bm25({fts_table}) AS score FROM {fts_table} WHERE {fts_table} MATCH :query LIMIT -1"
+        ).bindparams(query=" AND ".join(f'"{term}"*' for term in terms))
+        return statement.columns(id=Integer, score=Float).subquery()
+
+    return None
@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Staff directory crawler
+
+    Reads the teacher list of the staff directory (STAFF_DIRECTORY_URL). The first
+    page tells the total, the remaining pages are then fetched concurrently over one
+    pooled session. Every request has a timeout, failed connections and 429/5xx
+    responses are retried with exponential backoff.
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import BaseConfig
+
+
+class StaffDirectoryCrawler():
+
+    def __init__(self, url=None, page_size=None, concurrency=None, timeout=None, retries=None, backoff=None):
+        self.url = url or BaseConfig.STAFF_DIRECTORY_URL
+        self.page_size = page_size or BaseConfig.STAFF_DIRECTORY_PAGE_SIZE
+        self.concurrency = concurrency or BaseConfig.STAFF_DIRECTORY_CONCURRENCY
+        self.timeout = timeout or BaseConfig.STAFF_DIRECTORY_TIMEOUT
+        retries = BaseConfig.STAFF_DIRECTORY_RETRIES if retries is None else retries
+        backoff = BaseConfig.STAFF_DIRECTORY_BACKOFF if backoff is None else backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.concurrency,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+                respect_retry_after_header=True,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fetch_page(self, page):
+        """
+            (total, teachers) of a page, pages are numbered from 0
+        """
+        response = self.session.get(self.url, timeout=self.timeout, params={
+            "access-token": "", "page": page, "pageSize": self.page_size, "key": "", "lang": "en",
+        })
+        response.raise_for_status()
+        data = response.json().get("data") or {}
+        return data.get("total", 0), data.get("data") or []
+
+    def fetch_all(self):
+        """
+            All teachers sorted by their directory ID, raises requests.RequestException on failure
+        """
+        total, teachers = self.fetch_page(0)
+        pages = math.ceil(total / self.page_size)
+        if teachers and pages > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, pages - 1)) as executor:
+                for _, page_teachers in executor.map(self.fetch_page, range(1, pages)):
+                    teachers.extend(page_teachers)
+
+        # The list may shift while it is paged through, keep one entry per teacher
+        unique = {teacher.get("id"): teacher for teacher in reversed(teachers)}
+        return sorted(unique.values(), key=lambda teacher: teacher.get("id"))
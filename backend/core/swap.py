@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Zero-downtime table reloads (MySQL/MariaDB only)
+
+    A group of related tables is loaded into shadow copies (`course__next`, ...),
+    checked, and swapped in with one atomic RENAME TABLE, so readers see either
+    the old or the new data and never a half-loaded table. The replaced tables are
+    kept as `<table>__prev` until the next swap, `rollback_tables` swaps them back.
+
+    Models are given parents first, e.g. (Course, Section). Swaps and rollbacks of
+    the same tables run under `swap_lock`, so they never interleave.
+"""
+
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import MetaData, text
+
+from .models import db
+from .search import FULLTEXT_INDEXES, create_fulltext_index
+
+SHADOW_SUFFIX = "__next"
+PREVIOUS_SUFFIX = "__prev"
+
+SWAP_LOCK_TIMEOUT = 5  # seconds
+
+
+class SwapError(Exception):
+    pass
+
+
+class SwapInProgress(SwapError):
+    pass
+
+
+def supports_swap():
+    return db.engine.dialect.name in ("mysql", "mariadb")
+
+
+@contextmanager
+def swap_lock(models):
+    """
+        Hold the named lock of a group of tables for a whole swap or rollback, on its own
+        connection so that commits in between keep it. Raises SwapInProgress when another
+        process holds it.
+    """
+    name = "uicinfocenter_swap_" + models[0].__tablename__
+    with db.engine.connect() as connection:
+        acquired = connection.execute(text("SELECT GET_LOCK(:name, :timeout)"), {
+            "name": name, "timeout": SWAP_LOCK_TIMEOUT,
+        }).scalar()
+        if acquired != 1:  # 0 on timeout, NULL on error
+            tables = ", ".join(model.__tablename__ for model in models)
+            raise SwapInProgress(f"Another swap or rollback of {tables} is in progress.")
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+
+def shadow_table(model):
+    """
+        Table object of the shadow copy of a model's table, for inserts
+    """
+    return model.__table__.to_metadata(MetaData(), name=model.__tablename__ + SHADOW_SUFFIX)
+
+
+def drop_tables(names):
+    if names:
+        db.session.execute(text("DROP TABLE IF EXISTS " + ", ".join(f"`{name}`" for name in names)))
+
+
+def prepare_shadow_tables(models):
+    """
+        Create empty shadow copies of the tables. Full-text indexes are dropped,
+        `finish_shadow_tables` builds them after the load, which is much faster.
+    """
+    names = {model.__tablename__ for model in models}
+    generation = int(time.time())
+
+    drop_tables([name + SHADOW_SUFFIX for name in reversed([model.__tablename__ for model in models])])
+    for model in models:
+        table = model.__tablename__
+        shadow = table + SHADOW_SUFFIX
+        db.session.execute(text(f"CREATE TABLE `{shadow}` LIKE `{table}`"))
+
+        if table in FULLTEXT_INDEXES:
+            db.session.execute(text(f"ALTER TABLE `{shadow}` DROP INDEX `{FULLTEXT_INDEXES[table][0]}`"))
+
+        # CREATE TABLE ... LIKE copies no foreign keys. Point them at the shadow parents,
+        # named by generation because constraint names are unique per database and survive renames.
+        for foreign_key in model.__table__.foreign_keys:
+            parent = foreign_key.column.table.name
+            if parent in names:
+                parent += SHADOW_SUFFIX
+            db.session.execute(text(
+                f"ALTER TABLE `{shadow}` ADD CONSTRAINT `fk_{table}_{foreign_key.parent.name}_{generation}` "
+                f"FOREIGN KEY (`{foreign_key.parent.name}`) REFERENCES `{parent}` (`{foreign_key.column.name}`)"
+            ))
+
+
+def finish_shadow_tables(expected_rows):
+    """
+        Build the full-text indexes and check the row count of every shadow table
+    """
+    connection = db.session.connection()
+    for model, expected in expected_rows.items():
+        table = model.__tablename__
+        shadow = table + SHADOW_SUFFIX
+        if table in FULLTEXT_INDEXES:
+            create_fulltext_index(connection, table, target=shadow)
+
+        rows = db.session.execute(text(f"SELECT COUNT(*) FROM `{shadow}`")).scalar()
+        if rows != expected:
+            raise SwapError(f"{shadow} has {rows} rows, expected {expected}.")
+
+
+def swap_tables(models):
+    """
+        Atomically replace the live tables with their shadow copies, keeping the old ones as `__prev`
+    """
+    tables = [model.__tablename__ for model in models]
+    drop_tables([table + PREVIOUS_SUFFIX for table in reversed(tables)])
+    renames = []
+    for table in tables:
+        renames.append(f"`{table}` TO `{table}{PREVIOUS_SUFFIX}`")
+        renames.append(f"`{table}{SHADOW_SUFFIX}` TO `{table}`")
+    db.session.execute(text("RENAME TABLE " + ", ".join(renames)))
+
+
+def rollback_tables(models):
+    """
+        Atomically swap the live tables with the previous generation, calling it again rolls forward
+    """
+    tables = [model.__tablename__ for model in models]
+    existing = set(db.session.execute(text("SHOW TABLES")).scalars())
+    missing = [table + PREVIOUS_SUFFIX for table in tables if table + PREVIOUS_SUFFIX not in existing]
+    if missing:
+        raise SwapError(f"No previous generation to roll back to: {', '.join(missing)} not found.")
+
+    renames = []
+    for table in tables:
+        renames.append(f"`{table}` TO `{table}__swap`")
+        renames.append(f"`{table}{PREVIOUS_SUFFIX}` TO `{table}`")
+        renames.append(f"`{table}__swap` TO `{table}{PREVIOUS_SUFFIX}`")
+    db.session.execute(text("RENAME TABLE " + ", ".join(renames)))
@@ -0,0 +1,22 @@
+# -*- encoding: utf-8 -*-
+
+import threading
+
+
+def start_periodic_task(app, name, interval, func):
+    """
+        Run `func` inside an app context right away and then every `interval` seconds on a daemon thread
+    """
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    func()
+                except Exception:
+                    app.logger.exception(f"Periodic task {name} failed")
+            stop.wait(interval)
+
+    stop = threading.Event()
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,87 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Cache of parsed uploads
+
+    Parsed frames are stored as Parquet files under IMPORT_CACHE_DIR, keyed by the
+    SHA-256 of the uploaded file, the parser version and anything else the output
+    depends on, so uploading the same file again skips the parsing.
+    Needs pyarrow, without it nothing is cached.
+"""
+
+import hashlib
+import os
+import time
+
+import pandas as pd
+
+from .config import BaseConfig
+
+try:
+    import pyarrow  # noqa: F401, the Parquet engine
+except ImportError:
+    pyarrow = None
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(kind, version, digest, *parts):
+    """
+        File name prefix of a cache entry, `parts` are other inputs of the parser such as the semester
+    """
+    extra = hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16] if parts else ""
+    return "-".join(filter(None, (kind, f"v{version}", digest, extra)))
+
+
+def cache_path(key, name):
+    return os.path.join(BaseConfig.IMPORT_CACHE_DIR, f"{key}.{name}.parquet")
+
+
+def load_frames(key, names):
+    """
+        The cached frames by name, None when caching is off or any of them is missing
+    """
+    if pyarrow is None:
+        return None
+    paths = [cache_path(key, name) for name in names]
+    try:
+        for path in paths:
+            os.utime(path)  # recently used entries are kept by `purge`
+        return {name: pd.read_parquet(path) for name, path in zip(names, paths)}
+    except FileNotFoundError:  # missing, or purged by another process meanwhile
+        return None
+    except (OSError, ValueError):  # a corrupt entry is parsed again and replaced
+        return None
+
+
+def store_frames(key, frames):
+    if pyarrow is None:
+        return
+    os.makedirs(BaseConfig.IMPORT_CACHE_DIR, exist_ok=True)
+    for name, frame in frames.items():
+        # Write then rename, readers in other processes never see a partial file
+        path = cache_path(key, name)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(temporary, index=False)
+        os.replace(temporary, path)
+
+
+def purge():
+    """
+        Remove entries that have not been used for IMPORT_STAGING_RETENTION seconds
+    """
+    if not os.path.isdir(BaseConfig.IMPORT_CACHE_DIR):
+        return
+    expired = time.time() - BaseConfig.IMPORT_STAGING_RETENTION
+    for entry in os.scandir(BaseConfig.IMPORT_CACHE_DIR):
+        if entry.is_file() and entry.stat().st_mtime < expired:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
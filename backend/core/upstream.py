@@ -0,0 +1,285 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Upstream HTTP clients
+
+    Proxied APIs are called through an UpstreamClient: one requests session per
+    upstream with a pool of kept-alive connections and connect/read timeouts on
+    every request. Each client records the latency of its endpoints and how busy
+    its connection pool is, `stats()` reports both. Calls go through the circuit
+    breaker of the upstream, which fails them fast while the upstream is down.
+    `relay_stream` passes a streamed upstream response (server-sent events) on
+    to the client event by event.
+"""
+
+import threading
+import time
+from collections import deque
+
+import requests
+from flask import Response
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import CircuitBreaker
+from .config import BaseConfig
+
+# Latencies kept per endpoint for the percentiles
+LATENCY_SAMPLES = 1000
+
+# Most bytes read at once from a stream that is not chunked
+STREAM_READ_SIZE = 64 * 1024
+
+# Blank lines ending a server-sent event
+EVENT_BOUNDARIES = (b"\n\n", b"\r\n\r\n", b"\r\r")
+
+clients = dict()  # name -> UpstreamClient
+
+
+class EndpointStats():
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0  # connection errors, timeouts and 5xx responses
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # seconds
+
+    def record(self, seconds, error):
+        self.requests += 1
+        self.errors += error
+        self.latencies.append(seconds)
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1) if latencies else None
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": {
+                "avg": round(1000 * sum(latencies) / len(latencies), 1) if latencies else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(1000 * latencies[-1], 1) if latencies else None,
+            },
+        }
+
+
+class UpstreamClient():
+
+    def __init__(self, name, base_url, pool_size, connect_timeout, read_timeout, verify=True, title=None):
+        self.name = name
+        self.title = title or name.capitalize()  # in error messages
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+
+        # Without pool_block a request finding every connection busy opens an extra
+        # one that is closed afterwards, those are counted in `saturated`
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self.endpoints = dict()  # endpoint -> EndpointStats
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0  # requests started while the pool had no idle connection
+        self.lock = threading.Lock()
+        self.breaker = CircuitBreaker(name, self.title)
+
+        clients[name] = self
+
+    def request(self, method, path, endpoint=None, **kwargs):
+        """
+            Send a request to base_url + path. `endpoint` names the path in the stats,
+            give it for paths with IDs in them. The latency is measured until the
+            response headers arrived, for streamed responses that is the first byte.
+            Raises requests.RequestException like requests does, and
+            CircuitOpenError without sending the request while the circuit is open.
+        """
+        probe = self.breaker.before_call()
+        kwargs.setdefault("timeout", self.timeout)
+        # Per request, a session default would lose to REQUESTS_CA_BUNDLE from the environment
+        kwargs.setdefault("verify", self.verify)
+        endpoint = f"{method.upper()} {endpoint or path}"
+        saturated = self.idle_connections() == 0
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.saturated += saturated
+
+        started = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(method, self.base_url + path, **kwargs)
+            error = response.status_code >= 500
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.breaker.after_call(elapsed, error, probe)
+            with self.lock:
+                self.in_flight -= 1
+                self.endpoints.setdefault(endpoint, EndpointStats()).record(elapsed, error)
+
+    def get(self, path, endpoint=None, **kwargs):
+        return self.request("GET", path, endpoint, **kwargs)
+
+    def post(self, path, endpoint=None, **kwargs):
+        return self.request("POST", path, endpoint, **kwargs)
+
+    def delete(self, path, endpoint=None, **kwargs):
+        return self.request("DELETE", path, endpoint, **kwargs)
+
+    def connection_pools(self):
+        manager = self.adapter.poolmanager
+        with manager.pools.lock:
+            return [manager.pools[key] for key in manager.pools.keys()]
+
+    def idle_connections(self):
+        """
+            Connections free for the next request, None before the first request
+        """
+        pools = [pool.pool for pool in self.connection_pools() if pool.pool is not None]
+        return sum(queue.qsize() for queue in pools) if pools else None
+
+    def pool_stats(self):
+        """
+            Connections of the urllib3 pools: `in_use` are checked out, streamed
+            responses hold theirs until they are read or closed
+        """
+        pools = []
+        for pool in self.connection_pools():
+            if pool.pool is None:
+                continue
+            pools.append({
+                "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                "maxsize": pool.pool.maxsize,
+                "in_use": pool.pool.maxsize - pool.pool.qsize(),
+                "connections_opened": pool.num_connections,
+                "requests_sent": pool.num_requests,
+            })
+        return pools
+
+    def stats(self):
+        with self.lock:
+            endpoints = {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())}
+            in_flight, peak_in_flight, saturated = self.in_flight, self.peak_in_flight, self.saturated
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "circuit": self.breaker.to_dict()["state"],
+            "pool_size": self.pool_size,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "in_flight": in_flight,
+            "peak_in_flight": peak_in_flight,
+            "saturated": saturated,
+            "pools": self.pool_stats(),
+            "endpoints": endpoints,
+        }
+
+
+def upstream_title(error):
+    """
+        The title of the upstream a requests exception was raised for
+    """
+    url = getattr(error.request, "url", None) or ""
+    for client in clients.values():
+        if url.startswith(client.base_url):
+            return client.title
+    return "Upstream"
+
+
+"""
+    Streaming
+"""
+
+def iter_raw(response):
+    """
+        The body of a streamed response as it arrives, without waiting for a buffer to fill
+    """
+    if response.raw.chunked:
+        yield from response.iter_content(chunk_size=None)  # one item per HTTP chunk
+    else:
+        while True:
+            data = response.raw.read1(STREAM_READ_SIZE, decode_content=True)
+            if not data:
+                return
+            yield data
+
+
+def event_end(data):
+    """
+        The end of the last complete event in data, 0 if there is none
+    """
+    end = 0
+    for boundary in EVENT_BOUNDARIES:
+        found = data.rfind(boundary)
+        if found >= 0:
+            end = max(end, found + len(boundary))
+    return end
+
+
+def cut_events(data):
+    """
+        (complete events, incomplete rest) of data, data ending on an event boundary is returned as it is
+    """
+    end = event_end(data)
+    if end == len(data):
+        return data, b""
+    return data[:end], data[end:]
+
+
+def iter_events(response):
+    """
+        The body of an event stream cut at event boundaries: everything up to the
+        last complete event is passed on as soon as it arrived, an incomplete event
+        is held until its end arrives. Chunks holding whole events are passed on as they are.
+    """
+    tail = b""
+    for chunk in iter_raw(response):
+        events, tail = cut_events(tail + chunk if tail else chunk)
+        if events:
+            yield events
+    if tail:
+        yield tail
+
+
+def relay_stream(response):
+    """
+        A Flask response relaying a streamed upstream response. When the client goes
+        away the server closes the generator, which closes the upstream response, so
+        the upstream stops generating instead of streaming into a dead connection.
+    """
+    def generate():
+        try:
+            yield from iter_events(response)
+        finally:
+            response.close()
+
+    relay = Response(generate(), status=response.status_code,
+                     content_type=response.headers.get("Content-Type"))
+    relay.headers["Cache-Control"] = "no-cache"
+    relay.headers["X-Accel-Buffering"] = "no"  # reverse proxies pass events on unbuffered
+    relay.call_on_close(response.close)
+    return relay
+
+
+dify_client = UpstreamClient(
+    "dify",
+    BaseConfig.DIFY_API_BASE,
+    pool_size=BaseConfig.DIFY_POOL_SIZE,
+    connect_timeout=BaseConfig.DIFY_CONNECT_TIMEOUT,
+    read_timeout=BaseConfig.DIFY_READ_TIMEOUT,
+    verify=False,
+)
+
+chatgpt_client = UpstreamClient(
+    "chatgpt",
+    BaseConfig.CHATGPT_API_BASE,
+    pool_size=BaseConfig.CHATGPT_POOL_SIZE,
+    connect_timeout=BaseConfig.CHATGPT_CONNECT_TIMEOUT,
+    read_timeout=BaseConfig.CHATGPT_READ_TIMEOUT,
+    title="ChatGPT",
+)
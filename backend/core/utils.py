@@ -36,3 +36,12 @@ def convert_dt(dt, tz="Asia/Shanghai") -> str:
     local_dt = utc_dt.astimezone(pytz.timezone(tz))
     # 格式化为字符串
     return local_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def import_stats(rows, elapsed) -> dict:
+    # Rows written by a bulk import and how fast
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed) if elapsed > 0 else None,
+    }
@@ -0,0 +1,28 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    PDF text extraction in pool processes
+
+    Pool processes are spawned, not forked: a fork copies the parent's threads'
+    locks and open database connections mid-use. A spawned process imports the
+    module of the function it runs, so this one lives outside `core` (whose import
+    sets up the whole application) and imports nothing but fitz. It also imports
+    the main module, which must not start anything on import, as app.py does not.
+"""
+
+import fitz  # PyMuPDF for PDF processing
+
+# Keep printable ASCII and newlines: non-ASCII is dropped by encoding, the rest by this table
+CONTROL_CHARACTERS = dict.fromkeys([*range(10), *range(11, 32), 127])
+
+
+def clean_text(value):
+    return value.encode("ascii", "ignore").decode("ascii").translate(CONTROL_CHARACTERS)
+
+
+def extract_pages(pdf_path, start, stop):
+    """
+        Cleaned text of the pages [start, stop) of a PDF
+    """
+    with fitz.open(pdf_path) as doc:
+        return [clean_text(doc[number].get_text()) for number in range(start, stop)]
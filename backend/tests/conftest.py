@@ -0,0 +1,74 @@
+# -*- encoding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from core import app as flask_app  # noqa: E402
+from core.migrations import bootstrap_database  # noqa: E402
+from core.models import db, Course, JWTTokenBlocklist, Section, User  # noqa: E402
+from core.models.user import username_cache  # noqa: E402
+from core.apis.user import principal_cache  # noqa: E402
+
+
+def bind_database(app, uri):
+    """
+        Point the app at another database, `core` binds the configured one on import
+    """
+    app.extensions.pop("sqlalchemy", None)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    db.init_app(app)
+
+
+@pytest.fixture(scope="session")
+def database_uri(tmp_path_factory):
+    uri = f"sqlite:///{tmp_path_factory.mktemp('db') / 'uicinfocenter.db'}"
+    bind_database(flask_app, uri)  # once, the app cannot be set up again after its first request
+    return uri
+
+
+@pytest.fixture
+def app(database_uri):
+    """
+        The app on an empty, migrated SQLite database with fresh per-process caches
+    """
+    with flask_app.app_context():
+        db.drop_all()
+    bootstrap_database(flask_app)
+    JWTTokenBlocklist.bloom_filter = None
+    JWTTokenBlocklist.bloom_filter_synced_at = None
+    principal_cache.clear()
+    username_cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(app, client):
+    with app.app_context():
+        User.register("admin", "admin@example.com", "Passw0rdX", "ADMIN", "ACTIVE", "chat")
+    response = client.post("/api/v1/user/login", json={"email": "admin@example.com", "password": "Passw0rdX"})
+    return {"Authorization": "Bearer " + response.json["data"]["userToken"]}
+
+
+@pytest.fixture
+def sections(app):
+    with app.app_context():
+        for i in range(30):
+            course = Course(None, f"COMP{1000 + i}", f"Data Structures {i}", None, 3, "MR", "", "FST", "CST", "", "")
+            db.session.add(course)
+            db.session.flush()
+            for j in range(2):
+                db.session.add(Section(None, course.id, "2024-2025 Semester 1", str(1001 + j), "T1-101",
+                                       "Mon 10:00-11:50", 3, "", f"Dr. Teacher {i}"))
+        db.session.commit()
@@ -0,0 +1,249 @@
+# -*- encoding: utf-8 -*-
+
+"""
+    Local stand-ins for the upstream services, used by the tests and the benchmarks
+
+    DifyStandIn answers like the Dify API and the OpenAI-compatible chat completions
+    API, StaffDirectoryStandIn like the teacher list of the staff directory. Each
+    serves on a free local port from a daemon thread and counts what it was sent.
+    `python -m tests.stand_in dify` serves a Dify stand-in in the foreground and
+    prints its base URL, for servers under test running in another process.
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StandInServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 1024  # benchmarks open hundreds of connections at once
+
+    def __init__(self, handler):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def root_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count("connections")
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body or b"{}")
+        except ValueError:  # multipart uploads
+            return {}
+
+
+"""
+    Dify and chat completions
+"""
+
+class DifyHandler(StandInHandler):
+    """
+        Streamed answers are shaped by keys of the request body: `_events` events,
+        `_delay` seconds apart, padded by `_pad` bytes, close-delimited instead of
+        chunked with `_close`. `_status` answers a completion with that error status.
+    """
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/_stats":
+            return self.send_json(self.server.stats())
+        if path == "/_mode":
+            query = parse_qs(urlparse(self.path).query)
+            self.server.fail = int(query.get("fail", ["0"])[0])
+            self.server.hang = float(query.get("hang", ["0"])[0])
+            return self.send_json({"fail": self.server.fail, "hang": self.server.hang})
+
+        self.server.count("requests")
+        if self.failing():
+            return
+        if path.startswith("/v1/conversations"):
+            self.send_json({"limit": 20, "has_more": False,
+                            "data": [{"id": f"c{i}", "name": f"Conversation {i}"} for i in range(20)]})
+        elif path.endswith("/suggested"):
+            self.send_json({"result": "success", "data": ["a?", "b?", "c?"]})
+        else:
+            self.send_json({"data": [], "path": self.path})
+
+    def do_DELETE(self):
+        self.server.count("requests")
+        self.read_json()
+        if not self.failing():
+            self.send_json({"result": "success"})
+
+    def do_POST(self):
+        self.server.count("requests")
+        data = self.read_json()
+        if self.failing():
+            return
+        path = urlparse(self.path).path
+        if (path == "/v1/chat-messages" and data.get("response_mode") == "streaming") or \
+                (path == "/v1/chat/completions" and data.get("stream")):
+            self.stream(data)
+        elif path == "/v1/chat/completions":
+            if data.get("_status"):
+                return self.send_json({"error": {"message": "Rate limit reached."}}, data["_status"])
+            self.send_json({
+                "id": f"chatcmpl-{self.server.requests}", "object": "chat.completion", "model": data.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hello."}, "finish_reason": "stop"}],
+            })
+        else:
+            self.send_json({"event": "message", "answer": "Hello.", "conversation_id": "c1", "echo": data})
+
+    def failing(self):
+        if self.server.hang:
+            time.sleep(self.server.hang)
+        if self.server.fail:
+            self.send_json({"message": "Upstream broken."}, self.server.fail)
+            return True
+        return False
+
+    def stream(self, data):
+        close_delimited = data.get("_close")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        if close_delimited:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        else:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def frame(payload):
+            return payload if close_delimited else f"{len(payload):x}\r\n".encode() + payload + b"\r\n"
+
+        events = data.get("_events", 20)
+        delay = data.get("_delay", 0)
+        try:
+            for i in range(events):
+                event = {"event": "message", "answer": f"token{i} ", "conversation_id": "c1", "message_id": "m1"}
+                if data.get("_pad"):
+                    event["pad"] = "x" * data["_pad"]
+                self.wfile.write(frame(f"data: {json.dumps(event)}\n\n".encode()))
+                self.wfile.flush()
+                self.server.count("sent")
+                if delay:
+                    time.sleep(delay)
+            self.wfile.write(frame(b'data: {"event": "message_end"}\n\n') + (b"" if close_delimited else b"0\r\n\r\n"))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count("closed_early")
+            self.close_connection = True
+
+
+class DifyStandIn(StandInServer):
+
+    def __init__(self):
+        self.sent = 0  # streamed events
+        self.closed_early = 0  # streams the client hung up on
+        self.fail = 0  # answer every request with this status
+        self.hang = 0.0  # seconds before answering
+        super().__init__(DifyHandler)
+
+    @property
+    def base_url(self):
+        return self.root_url + "/v1"
+
+    def stats(self):
+        return {"connections": self.connections, "requests": self.requests,
+                "sent": self.sent, "closed_early": self.closed_early}
+
+
+"""
+    Staff directory
+"""
+
+class StaffDirectoryHandler(StandInHandler):
+
+    def do_GET(self):
+        self.server.count("requests")
+        query = parse_qs(urlparse(self.path).query)
+        page, page_size = int(query["page"][0]), int(query["pageSize"][0])
+        with self.server.lock:
+            self.server.hits[page] = self.server.hits.get(page, 0) + 1
+            failing = self.server.hits[page] <= self.server.failures.get(page, 0)
+        time.sleep(self.server.delay)
+        if failing:
+            return self.send_json({"message": "Service unavailable."}, 503)
+
+        stop = min(self.server.total, (page + 1) * page_size)
+        self.send_json({"data": {"total": self.server.total, "data": [
+            self.server.teacher(i) for i in range(page * page_size, stop)
+        ]}})
+
+
+class StaffDirectoryStandIn(StandInServer):
+    """
+        `total` teachers, every page answered after `delay` seconds,
+        `failures` maps a page to the number of 503s it answers first
+    """
+
+    def __init__(self, total, delay=0.0, failures=None):
+        self.total = total
+        self.delay = delay
+        self.failures = failures or dict()
+        self.hits = dict()  # page -> requests
+        super().__init__(StaffDirectoryHandler)
+
+    @property
+    def url(self):
+        return self.root_url + "/teacher/teacher/list"
+
+    @staticmethod
+    def teacher(i):
+        return {"id": i + 1, "name": f"教师{i}", "name_en": f"Teacher {i}", "email": f"teacher{i}@uic.edu.cn",
+                "gender": 1, "teacher_title": {}, "username": f"teacher{i}", "info": []}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["dify"]:
+        sys.exit("usage: python -m tests.stand_in dify")
+    server = DifyStandIn()
+    print(server.base_url, flush=True)
+    threading.Event().wait()
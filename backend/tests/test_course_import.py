@@ -0,0 +1,87 @@
+# -*- encoding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import insert, select
+
+from core.apis import course
+from core.config import BaseConfig
+from core.models import db, Course, ImportJob, Section
+from core.models.jwt_token_blocklist import utcnow
+
+
+@pytest.fixture
+def timetable_job_id(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(BaseConfig, "IMPORT_STAGING_DIR", str(tmp_path))
+    with app.app_context():
+        job = ImportJob("timetable", filename="timetable.xlsx", semester="Semester 1 of AY2024-25")
+        job.status, job.finished_at = "succeeded", utcnow()
+        db.session.add(job)
+        db.session.commit()
+        os.makedirs(job.staging_dir)
+        return job.id
+
+
+def test_import_is_queued_from_staged_upload(app, client, admin_headers, timetable_job_id):
+    response = client.post("/api/v1/course/import", headers=admin_headers)
+
+    assert response.status_code == 202
+    assert response.json["data"]["job"]["status"] == "queued"
+
+
+def test_import_of_purged_upload_is_refused(app, client, admin_headers, timetable_job_id):
+    os.rmdir(ImportJob.staging_path(timetable_job_id))
+
+    response = client.post("/api/v1/course/import", headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.json["code"] == "UPLOAD_EXPIRED"
+    with app.app_context():
+        assert ImportJob.active_import() is None
+
+
+def test_purge_keeps_uploads_of_queued_imports(app, timetable_job_id, monkeypatch):
+    monkeypatch.setattr(BaseConfig, "IMPORT_STAGING_RETENTION", -1)
+    with app.app_context():
+        db.session.add(ImportJob("import", mode="replace", timetable_job_id=timetable_job_id))
+        db.session.commit()
+        ImportJob.purge_staging()
+        assert not ImportJob.get_by_id(timetable_job_id).expired
+
+        ImportJob.query.filter_by(kind="import").update({"status": "succeeded"})
+        db.session.commit()
+        ImportJob.purge_staging()
+        assert ImportJob.get_by_id(timetable_job_id).expired
+
+
+def test_incremental_sync_leaves_ids_to_the_database(app, sections, monkeypatch):
+    with app.app_context():
+        connection = db.session.connection()
+        courses = pd.read_sql(select(Course.__table__), connection)
+        sections_frame = pd.read_sql(select(Section.__table__), connection)
+        new_course = dict(courses.iloc[0], id=1000, course_code="COMP2000", name_en="Operating Systems")
+        courses = pd.concat([courses, pd.DataFrame([new_course])], ignore_index=True)
+        new_section = dict(sections_frame.iloc[0], id=1000, course_id=1000)
+        sections_frame = pd.concat([sections_frame, pd.DataFrame([new_section])], ignore_index=True)
+
+        diff_rows = course.diff_rows
+
+        def add_course_meanwhile(*args):
+            # An admin adds a course through the API while the import runs
+            if not Course.query.filter_by(course_code="COMP3000").count():
+                with db.engine.begin() as other:
+                    other.execute(insert(Course.__table__).values(
+                        course_code="COMP3000", name_en="Compilers", units=3, curriculum_type="MR"))
+            return diff_rows(*args)
+
+        monkeypatch.setattr(course, "diff_rows", add_course_meanwhile)
+        result = course.sync_course_data(courses, sections_frame)
+        db.session.commit()
+
+        assert result["courses"]["inserted"] == 1 and result["sections"]["inserted"] == 1
+        added = Course.query.filter_by(course_code="COMP2000").one()
+        assert added.id == 32
+        assert [section.section_number for section in added.sections] == ["1001"]
+        assert Course.query.filter_by(course_code="COMP3000").one().id == 31
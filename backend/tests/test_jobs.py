@@ -0,0 +1,103 @@
+# -*- encoding: utf-8 -*-
+
+from datetime import timedelta
+
+import pytest
+
+from core import jobs
+from core.models import db, ImportJob, JobLost
+from core.models.jwt_token_blocklist import utcnow
+
+
+@pytest.fixture
+def job_id(app):
+    with app.app_context():
+        job = ImportJob("timetable", filename="timetable.xlsx", semester="Semester 1 of AY2024-25")
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def requeue_and_claim_again(job_id):
+    """
+        What another worker does when this one misses its heartbeats
+    """
+    ImportJob.update_job(job_id, heartbeat_at=utcnow() - timedelta(hours=1))
+    assert ImportJob.requeue_stale() == 1
+    return ImportJob.claim(job_id, "other-worker:1")
+
+
+def test_claim_counts_attempts(app, job_id):
+    with app.app_context():
+        assert ImportJob.claim(job_id, "worker:1") == 1
+        assert ImportJob.claim(job_id, "worker:2") is None
+        assert requeue_and_claim_again(job_id) == 2
+
+
+def test_requeued_attempt_cannot_change_the_job(app, job_id):
+    with app.app_context():
+        first = ImportJob.claim(job_id, "worker:1")
+        second = requeue_and_claim_again(job_id)
+
+        job = ImportJob.get_by_id(job_id)
+        job.claimed_attempt = first
+        with pytest.raises(JobLost):
+            job.report("Reading the timetable")
+        with pytest.raises(JobLost):
+            job.fence()
+        db.session.rollback()
+        assert not ImportJob.succeed(job_id, first, {"courses": 1})
+        assert not ImportJob.fail(job_id, first, "Stopped")
+
+        assert ImportJob.succeed(job_id, second, {"courses": 2})
+        db.session.expire_all()
+        job = ImportJob.get_by_id(job_id)
+        assert (job.status, job.attempts, job.result) == ("succeeded", 2, '{"courses": 2}')
+
+
+def test_runner_drops_a_requeued_attempt(app, job_id, monkeypatch):
+    def handler(job):
+        # The worker stalls, another one takes the job over, then this one carries on
+        requeue_and_claim_again(job.id)
+        job.report("Staged")
+        return {"courses": 1}
+
+    monkeypatch.setitem(jobs.HANDLERS, "timetable", handler)
+    runner = jobs.JobRunner(app, 1)
+    with app.app_context():
+        attempt = ImportJob.claim(job_id, jobs.WORKER_NAME)
+    runner.run(job_id, attempt)
+
+    with app.app_context():
+        job = ImportJob.get_by_id(job_id)
+        assert (job.status, job.attempts, job.worker, job.error) == ("running", 2, "other-worker:1", None)
+    assert runner.running == set()
+
+
+def queue_imports(count):
+    jobs = [ImportJob("import", mode="replace") for _ in range(count)]
+    db.session.add_all(jobs)
+    db.session.commit()
+    return [job.id for job in jobs]
+
+
+def test_second_queued_import_is_refused(app):
+    with app.app_context():
+        # Two admins passed the API check at the same time
+        first, second = queue_imports(2)
+
+        assert ImportJob.claim(second, "worker:2") is None
+        assert ImportJob.claim(first, "worker:1") == 1
+
+        db.session.expire_all()
+        job = ImportJob.get_by_id(second)
+        assert (job.status, job.attempts, job.error) == ("failed", 0, "Another import is in progress.")
+
+
+def test_import_is_refused_while_another_runs(app):
+    with app.app_context():
+        first, second = queue_imports(2)
+        assert ImportJob.claim(first, "worker:1") == 1
+
+        assert ImportJob.claim(second, "worker:2") is None
+        assert ImportJob.get_by_id(second).status == "failed"
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+
+import subprocess
+import sys
+import textwrap
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from conftest import BACKEND_DIR
+from core.apis.user import authenticate
+from core.models import db, JWTTokenBlocklist
+from core.models.jwt_token_blocklist import utcnow
+
+
+def blocklist_in_other_process(database_uri, token):
+    """
+        Blocklist a token from a separate process with its own filter, like another worker
+    """
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {BACKEND_DIR!r})
+        sys.path.insert(0, {BACKEND_DIR + '/tests'!r})
+        from conftest import bind_database, flask_app
+        from core.models import JWTTokenBlocklist
+        bind_database(flask_app, {database_uri!r})
+        with flask_app.app_context():
+            JWTTokenBlocklist.add_token({token!r}, token_type="token")
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=BACKEND_DIR)
+
+
+def test_filter_miss_sees_tokens_blocklisted_by_other_processes(app, database_uri):
+    with app.app_context():
+        JWTTokenBlocklist.rebuild_filter()
+        assert not JWTTokenBlocklist.is_token_blocklisted("other-token")
+        assert not JWTTokenBlocklist.is_token_blocklisted("token")
+
+    blocklist_in_other_process(database_uri, "token")
+
+    with app.app_context():
+        JWTTokenBlocklist.maintain()
+        assert JWTTokenBlocklist.is_token_blocklisted("token")
+        assert not JWTTokenBlocklist.is_token_blocklisted("other-token")
+
+
+def test_cached_principal_rejected_once_other_process_logs_out(app, client, admin_headers, database_uri):
+    with app.app_context():
+        JWTTokenBlocklist.rebuild_filter()
+        user, error = authenticate(admin_headers["Authorization"])  # now cached in this process
+        assert error is None and user.email == "admin@example.com"
+
+    blocklist_in_other_process(database_uri, admin_headers["Authorization"].split(" ")[1])
+
+    with app.app_context():
+        JWTTokenBlocklist.maintain()
+        user, error = authenticate(admin_headers["Authorization"])
+        assert user is None
+        assert error[1] == 401 and error[0]["code"] == "INVALID_TOKEN"
+
+
+def test_sync_picks_up_entries_committed_out_of_order(app):
+    with app.app_context():
+        JWTTokenBlocklist.add_token("late-token", token_type="token")
+        JWTTokenBlocklist.add_token("early-token", token_type="token")
+        late = JWTTokenBlocklist.query.filter_by(token_digest=JWTTokenBlocklist.digest("late-token")).one()
+        # Another process inserted "late-token" first but committed it only after the last sync
+        db.session.delete(late)
+        db.session.commit()
+        JWTTokenBlocklist.rebuild_filter()
+        entry = JWTTokenBlocklist(JWTTokenBlocklist.digest("late-token"), "token", late.expires_at)
+        entry.id, entry.created_at = late.id, utcnow() - timedelta(seconds=5)
+        db.session.add(entry)
+        db.session.commit()
+        assert JWTTokenBlocklist.digest("late-token") not in JWTTokenBlocklist.bloom_filter
+
+        JWTTokenBlocklist.sync_filter()
+
+        assert JWTTokenBlocklist.is_token_blocklisted("late-token")
+        assert JWTTokenBlocklist.is_token_blocklisted("early-token")
+
+
+def test_filter_miss_needs_no_query_until_the_filter_is_stale(app):
+    with app.app_context():
+        JWTTokenBlocklist.rebuild_filter()
+        statements = []
+
+        def listener(connection, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            assert not JWTTokenBlocklist.is_token_blocklisted("token")
+            assert statements == []
+            # Used vCodes are always looked up, as are tokens once the periodic sync stops
+            assert not JWTTokenBlocklist.is_token_blocklisted("token", token_type="vCode")
+            assert len(statements) == 1
+            JWTTokenBlocklist.bloom_filter_synced_at -= timedelta(hours=1)
+            assert not JWTTokenBlocklist.is_token_blocklisted("token")
+            assert len(statements) == 2
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
@@ -0,0 +1,52 @@
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from core import llm_cache
+from core.cache import TTLCache
+from core.config import BaseConfig
+from core.upstream import chatgpt_client
+
+from stand_in import DifyStandIn
+
+URL = "/api/v1/llmapi/chatgpt/chat/completions"
+COMPLETION = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Hi"}], "temperature": 0}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+        The chat completions stand-in, with the response cache on
+    """
+    with DifyStandIn() as server:
+        monkeypatch.setattr(chatgpt_client, "base_url", server.base_url)
+        monkeypatch.setattr(BaseConfig, "LLM_CACHE_SIZE", 16)
+        monkeypatch.setattr(llm_cache, "llm_cache", TTLCache(16, 60))
+        yield server
+
+
+def test_completion_is_cached(client, admin_headers, upstream):
+    first = client.post(URL, headers=admin_headers, json=COMPLETION)
+    second = client.post(URL, headers=admin_headers, json=COMPLETION)
+
+    assert (first.status_code, first.headers["X-Cache"]) == (200, "MISS")
+    assert (second.status_code, second.headers["X-Cache"]) == (200, "HIT")
+    assert second.json == first.json
+    assert upstream.requests == 1
+
+
+def test_error_is_passed_on_and_not_cached(client, admin_headers, upstream):
+    data = dict(COMPLETION, _status=429)
+    for _ in range(2):
+        response = client.post(URL, headers=admin_headers, json=data)
+        assert response.status_code == 429
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.json == {"error": {"message": "Rate limit reached."}}
+    assert upstream.requests == 2
+
+
+def test_error_of_uncacheable_request_is_passed_on(client, admin_headers, upstream):
+    response = client.post(URL, headers=admin_headers, json=dict(COMPLETION, temperature=1, _status=429))
+
+    assert response.status_code == 429
+    assert "X-Cache" not in response.headers
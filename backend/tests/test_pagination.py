@@ -0,0 +1,29 @@
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from core.pagination import encode_cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor([{"a": 1}]),
+    encode_cursor([[1]]),
+    encode_cursor([1, 2]),
+    encode_cursor([]),
+    encode_cursor({"id": 1}),
+    "not-a-cursor!",
+])
+def test_crafted_cursor_is_rejected(client, admin_headers, sections, cursor):
+    response = client.get(f"/api/v1/sections?pageSize=5&cursor={cursor}", headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json["code"] == "INVALID_CURSOR"
+
+
+def test_cursor_pages_through_sections(client, admin_headers, sections):
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = client.get(f"/api/v1/sections?pageSize=25&cursor={cursor}", headers=admin_headers)
+        assert response.status_code == 200
+        ids += [section["id"] for section in response.json["data"]["sections"]]
+        cursor = response.json["data"]["pagination"]["nextCursor"]
+    assert ids == sorted(set(ids)) and len(ids) == 60
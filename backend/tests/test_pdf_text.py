@@ -0,0 +1,25 @@
+# -*- encoding: utf-8 -*-
+
+import fitz
+
+from core.apis.course import extract_pdf_text
+from core.config import BaseConfig
+
+
+def test_pool_extracts_pages_in_order(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "catalogue.pdf")
+    with fitz.open() as doc:
+        for number in range(5):
+            doc.new_page().insert_text((72, 72), f"COMP{1000 + number} Page {number}")
+        doc.save(pdf_path)
+
+    monkeypatch.setattr(BaseConfig, "PDF_PAGES_PER_SHARD", 2)
+    monkeypatch.setattr(BaseConfig, "PDF_EXTRACT_WORKERS", 1)
+    serial = extract_pdf_text(pdf_path)
+    monkeypatch.setattr(BaseConfig, "PDF_EXTRACT_WORKERS", 2)
+    pooled = extract_pdf_text(pdf_path)
+
+    assert pooled == serial
+    assert [line for line in serial.split("\n") if line.startswith("COMP")] == [
+        f"COMP{1000 + number} Page {number}" for number in range(5)
+    ]
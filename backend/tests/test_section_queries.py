@@ -0,0 +1,35 @@
+# -*- encoding: utf-8 -*-
+
+import pytest
+from sqlalchemy import event
+
+from core.models import db
+
+
+def count_statements(app, client, headers, url):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    return len(statements), response.json["data"]["sections"]
+
+
+@pytest.mark.parametrize("query", ["", "&keyword=Data", "&keyword=COMP10"])
+def test_section_list_query_count_does_not_grow_with_page_size(app, client, admin_headers, sections, query):
+    client.get("/api/v1/sections?pageSize=1", headers=admin_headers)  # cache the principal
+
+    small, small_page = count_statements(app, client, admin_headers, f"/api/v1/sections?pageSize=5{query}")
+    large, large_page = count_statements(app, client, admin_headers, f"/api/v1/sections?pageSize=50{query}")
+
+    assert (len(small_page), len(large_page)) == (5, 50)
+    assert all(section["course_code"].startswith("COMP") for section in large_page)
+    assert small == large
@@ -0,0 +1,54 @@
+# -*- encoding: utf-8 -*-
+
+import time
+
+import pytest
+import requests
+
+from core.staff_directory import StaffDirectoryCrawler
+from stand_in import StaffDirectoryStandIn
+
+
+def crawl(server, **kwargs):
+    options = dict(page_size=100, concurrency=4, timeout=5, retries=3, backoff=0.01)
+    options.update(kwargs)
+    with StaffDirectoryCrawler(url=server.url, **options) as crawler:
+        return crawler.fetch_all()
+
+
+def test_fetches_every_page_once_over_pooled_connections():
+    with StaffDirectoryStandIn(total=1234) as server:
+        teachers = crawl(server)
+        assert [teacher["id"] for teacher in teachers] == list(range(1, 1235))
+        assert server.hits == {page: 1 for page in range(13)}
+        assert server.connections <= 4
+
+
+def test_pages_are_fetched_concurrently():
+    with StaffDirectoryStandIn(total=900, delay=0.2) as server:
+        started = time.perf_counter()
+        assert len(crawl(server, concurrency=4)) == 900
+        elapsed = time.perf_counter() - started
+    # first page, then 8 pages 4 at a time: 3 rounds instead of 9
+    assert elapsed < 6 * 0.2
+
+
+def test_failed_pages_are_retried():
+    with StaffDirectoryStandIn(total=500, failures={3: 2}) as server:
+        assert len(crawl(server)) == 500
+        assert server.hits[3] == 3
+
+
+def test_gives_up_after_the_retries():
+    with StaffDirectoryStandIn(total=500, failures={2: 10}) as server:
+        with pytest.raises(requests.RequestException):
+            crawl(server, retries=2)
+        assert server.hits[2] == 3
+
+
+def test_requests_time_out():
+    with StaffDirectoryStandIn(total=100, delay=1) as server:
+        started = time.perf_counter()
+        with pytest.raises(requests.RequestException):
+            crawl(server, timeout=0.2, retries=0)
+        assert time.perf_counter() - started < 0.9
@@ -0,0 +1,40 @@
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from core.apis import course
+from core.models import db, Course, ImportJob, Section
+from core.swap import supports_swap
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/course/import?mode=swap",
+    "/api/v1/course/import/rollback",
+    "/api/v1/teacher/import?mode=swap",
+    "/api/v1/teacher/import/rollback",
+])
+def test_swap_is_refused_on_sqlite(app, client, admin_headers, sections, url):
+    with app.app_context():
+        assert not supports_swap()
+
+    response = client.post(url, headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.json["code"] == "SWAP_NOT_SUPPORTED"
+    with app.app_context():
+        assert ImportJob.query.count() == 0
+        assert (Course.query.count(), Section.query.count()) == (30, 60)
+
+
+def test_rollback_waits_for_running_import(app, client, admin_headers, sections, monkeypatch):
+    monkeypatch.setattr(course, "supports_swap", lambda: True)
+    with app.app_context():
+        db.session.add(ImportJob("import", mode="swap"))
+        db.session.commit()
+
+    response = client.post("/api/v1/course/import/rollback", headers=admin_headers)
+
+    assert response.status_code == 409
+    assert response.json["code"] == "IMPORT_IN_PROGRESS"
+    with app.app_context():
+        assert (Course.query.count(), Section.query.count()) == (30, 60)
@@ -0,0 +1,50 @@
+# -*- encoding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import pytest
+
+from core import upload_cache
+from core.config import BaseConfig
+
+KEY = upload_cache.cache_key("timetable", 1, "0" * 64)
+NAMES = ("courses", "sections")
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(BaseConfig, "IMPORT_CACHE_DIR", str(tmp_path))
+    upload_cache.store_frames(KEY, {name: pd.DataFrame({"id": [1, 2]}) for name in NAMES})
+    return tmp_path
+
+
+def test_frames_are_loaded(cache_dir):
+    frames = upload_cache.load_frames(KEY, NAMES)
+
+    assert set(frames) == set(NAMES)
+    assert frames["sections"]["id"].tolist() == [1, 2]
+
+
+def test_missing_entry_is_a_miss(cache_dir):
+    os.remove(upload_cache.cache_path(KEY, "sections"))
+
+    assert upload_cache.load_frames(KEY, NAMES) is None
+
+
+def test_entry_purged_while_loading(cache_dir, monkeypatch):
+    read_parquet = pd.read_parquet
+
+    def purged_meanwhile(path, *args, **kwargs):
+        # `purge` removes the entry right after the last frame is read
+        frame = read_parquet(path, *args, **kwargs)
+        if path == upload_cache.cache_path(KEY, NAMES[-1]):
+            for name in NAMES:
+                os.remove(upload_cache.cache_path(KEY, name))
+        return frame
+
+    monkeypatch.setattr(pd, "read_parquet", purged_meanwhile)
+    assert set(upload_cache.load_frames(KEY, NAMES)) == set(NAMES)
+
+    # The next upload parses again
+    assert upload_cache.load_frames(KEY, NAMES) is None
@@ -78,6 +78,33 @@ const CourseImport = () => {
   const [courseDataProcessed, setCourseDataProcessed] = useState(false);
   const [courseDescProcessed, setCourseDescProcessed] = useState(false);
 
+  // Uploads and imports run as background jobs, poll until the job has finished
+  const waitForJob = jobId =>
+    new Promise((resolve, reject) => {
+      const poll = () => {
+        fetch(`${apiBaseUrl}/course/jobs/${jobId}`, {
+          method: 'GET',
+          headers: {
+            Authorization: `Bearer ${userToken}`,
+          },
+        })
+          .then(response => response.json())
+          .then(response => {
+            if (!response.success) {
+              reject(new Error(response.message));
+            } else if (response.data.status === 'succeeded') {
+              resolve(response.data);
+            } else if (response.data.status === 'failed') {
+              reject(new Error(response.data.error));
+            } else {
+              setTimeout(poll, 1000);
+            }
+          })
+          .catch(reject);
+      };
+      poll();
+    });
+
   const uploaderProps = {
     name: 'file',
     multiple: true,
@@ -95,12 +122,19 @@ const CourseImport = () => {
         // message.success(`${info.file.name} file uploaded successfully.`);
         message.success(info.file.response.message);
         // 追加上传结果信息
-        setUploadResultMessageList([
-          ...uploadResultMessageList,
-          info.file.response.data.callback_msg,
-        ]);
-        setCourseDataProcessed(info.file.response.data.course_data_processed);
-        setCourseDescProcessed(info.file.response.data.course_desc_processed);
+        waitForJob(info.file.response.data.job.id)
+          .then(job => {
+            setUploadResultMessageList(list => [...list, job.result.message]);
+            if (job.kind === 'timetable') {
+              setCourseDataProcessed(true);
+            } else {
+              setCourseDescProcessed(true);
+            }
+          })
+          .catch(error => {
+            message.error(error.message);
+            setUploadResultMessageList(list => [...list, error.message]);
+          });
       } else if (status === 'error') {
         // message.error(`${info.file.name} file upload failed.`);
         message.error(info.file.response.message);
@@ -121,12 +155,15 @@ const CourseImport = () => {
     })
       .then(response => response.json())
       .then(response => {
-        if (response.success) {
-          setcurrStep(3);
-          message.success(response.message);
-        } else {
-          message.error(response.message);
+        if (!response.success) {
+          throw new Error(response.message);
         }
+        message.info(response.message);
+        return waitForJob(response.data.job.id);
+      })
+      .then(() => {
+        setcurrStep(3);
+        message.success('Course data imported.');
       })
       .catch(error => {
         // message.error('An error occurred while importing courses.');
@@ -15,6 +15,8 @@ DROP TABLE IF EXISTS `nav_category`;
 DROP TABLE IF EXISTS `nav_webaddr`;
 DROP TABLE IF EXISTS `forum_thread`;
 DROP TABLE IF EXISTS `forum_reply`;
+DROP TABLE IF EXISTS `schema_migration`;
+DROP TABLE IF EXISTS `import_job`;
 
 -- 创建数据表
 -- uicinfocenter.`user` definition
@@ -40,11 +42,13 @@ CREATE TABLE `user` (
 -- uicinfocenter.jwt_token_blocklist definition
 CREATE TABLE `jwt_token_blocklist` (
   `id` int(11) NOT NULL AUTO_INCREMENT,
-  `jwt_token` text NOT NULL,
+  `token_digest` varchar(64) NOT NULL,
   `token_type` enum('token','vCode') NOT NULL,
+  `expires_at` datetime NOT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `id` (`id`),
-  UNIQUE KEY `jwt_token` (`jwt_token`) USING HASH
+  UNIQUE KEY `token_digest` (`token_digest`),
+  KEY `ix_jwt_token_blocklist_expires_at` (`expires_at`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- uicinfocenter.course definition
@@ -62,7 +66,9 @@ CREATE TABLE `course` (
   `prerequisites` text DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `id` (`id`),
-  UNIQUE KEY `course_code` (`course_code`)
+  UNIQUE KEY `course_code` (`course_code`),
+  KEY `ix_course_name_en` (`name_en`),
+  FULLTEXT KEY `ft_course` (`course_code`,`name_en`,`offering_faculty`,`offering_programme`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- uicinfocenter.`section` definition
@@ -79,6 +85,7 @@ CREATE TABLE `section` (
   PRIMARY KEY (`id`),
   UNIQUE KEY `id` (`id`),
   KEY `course_id` (`course_id`),
+  FULLTEXT KEY `ft_section` (`teachers`,`classroom`),
   CONSTRAINT `section_ibfk_1` FOREIGN KEY (`course_id`) REFERENCES `course` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -102,6 +109,8 @@ CREATE TABLE `teacher` (
   `office_room` varchar(255) DEFAULT NULL,
   `position` varchar(255) DEFAULT NULL,
   `photo_url` varchar(255) DEFAULT NULL,
+  `record_hash` varchar(64) DEFAULT NULL,
+  `deleted_at` datetime DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `id` (`id`),
   UNIQUE KEY `mis_id` (`mis_id`),
@@ -141,7 +150,8 @@ CREATE TABLE `nav_category` (
   `abbreviation` varchar(255) DEFAULT NULL,
   `dept_website` varchar(255) DEFAULT NULL,
   `cover` varchar(255) DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `ix_nav_category_name` (`name`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- uicinfocenter.nav_webaddr definition
@@ -158,6 +168,7 @@ CREATE TABLE `nav_webaddr` (
   `description_en` text DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `category_id` (`category_id`),
+  KEY `ix_nav_webaddr_url` (`url`),
   CONSTRAINT `nav_webaddr_ibfk_1` FOREIGN KEY (`category_id`) REFERENCES `nav_category` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -171,6 +182,9 @@ CREATE TABLE `forum_thread` (
   PRIMARY KEY (`id`),
   UNIQUE KEY `id` (`id`),
   KEY `user_id` (`user_id`),
+  KEY `ix_forum_thread_thread_subject` (`thread_subject`),
+  KEY `ix_forum_thread_thread_category` (`thread_category`),
+  FULLTEXT KEY `ft_forum_thread` (`thread_subject`,`thread_text`),
   CONSTRAINT `forum_thread_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -184,10 +198,51 @@ CREATE TABLE `forum_reply` (
   UNIQUE KEY `id` (`id`),
   KEY `thread_id` (`thread_id`),
   KEY `user_id` (`user_id`),
+  FULLTEXT KEY `ft_forum_reply` (`reply_text`),
   CONSTRAINT `forum_reply_ibfk_1` FOREIGN KEY (`thread_id`) REFERENCES `forum_thread` (`id`),
   CONSTRAINT `forum_reply_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- uicinfocenter.schema_migration definition
+-- Migrations are applied by the backend at startup, see backend/core/migrations.py
+CREATE TABLE `schema_migration` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `version` int(11) NOT NULL,
+  `description` varchar(255) NOT NULL,
+  `applied_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `id` (`id`),
+  UNIQUE KEY `version` (`version`)
+) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- uicinfocenter.import_job definition
+-- Course uploads and imports, run in the background by the backend
+CREATE TABLE `import_job` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `kind` enum('timetable','descriptions','import') NOT NULL,
+  `status` enum('queued','running','succeeded','failed') NOT NULL,
+  `user_id` int(11) DEFAULT NULL,
+  `filename` varchar(255) DEFAULT NULL,
+  `semester` varchar(64) DEFAULT NULL,
+  `mode` varchar(16) DEFAULT NULL,
+  `timetable_job_id` int(11) DEFAULT NULL,
+  `descriptions_job_id` int(11) DEFAULT NULL,
+  `stage` varchar(255) DEFAULT NULL,
+  `rows_total` int(11) DEFAULT NULL,
+  `rows_done` int(11) DEFAULT NULL,
+  `result` text DEFAULT NULL,
+  `error` text DEFAULT NULL,
+  `worker` varchar(64) DEFAULT NULL,
+  `attempts` int(11) NOT NULL,
+  `created_at` datetime NOT NULL,
+  `started_at` datetime DEFAULT NULL,
+  `heartbeat_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `id` (`id`),
+  KEY `ix_import_job_status` (`status`)
+) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- 导入部门数据
 
 INSERT INTO uicinfocenter.nav_category (name,name_en,abbreviation,dept_website,cover) VALUES
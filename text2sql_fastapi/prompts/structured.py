@@ -12,6 +12,7 @@ Generate precise {dialect} SQL queries from natural language questions about uni
 
 2. Table Relationships:
 - Teacher data: JOIN teacher t WITH teacher_info ti ON t.id = ti.teacher_id
+- Current teachers only: filter with t.deleted_at IS NULL
 - Course data: JOIN course WITH section ON course.id = section.course_id
 - DO NOT join teacher and course tables because they are not directly related, instead, use section.teachers
 - Combined queries: Maintain proper relationships across all tables
@@ -48,6 +49,7 @@ Generate precise {dialect} SQL queries from natural language questions about uni
 - `office_room`: Office location of the teacher
 - `position`: Teacher's position (e.g., Lecturer, Head of Department)
 - `photo_url`: URL link to the teacher's photo
+- `deleted_at`: When the teacher left the staff directory, NULL for current teachers
 
 2. **teacher_info** ti
 - `id`: Unique identifier for each teacher information record
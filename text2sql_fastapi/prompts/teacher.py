@@ -15,6 +15,7 @@ Given an input question "{question}", generate syntactically correct and precise
 - Ensure that any `id` columns are aliased to avoid duplication in the result set, for example: `t.id AS teacher_id` and `ti.id AS info_id`.
 - If the user needs specific results, use the `LIMIT` clause to limit the number of results to {top_k}. If the user needs as many results as possible, no limit is needed.
 - If the name provided contains multiple words, like "Raymond Lee", query for the teacher's name with separated words, like "Raymond" and "Lee". For example, `WHERE (t.name LIKE "%raymond%" AND t.name LIKE "%lee%")`.
+- Only query current teachers: always filter with `t.deleted_at IS NULL`, teachers who left have `deleted_at` set.
 
 ### Table Structures and Field Meanings:
 1. **teacher** t
@@ -28,6 +29,7 @@ Given an input question "{question}", generate syntactically correct and precise
 - `office_room`: Office location of the teacher
 - `position`: Teacher's position (e.g., Lecturer, Head of Department)
 - `photo_url`: URL link to the teacher's photo
+- `deleted_at`: When the teacher left the staff directory, NULL for current teachers
 
 2. **teacher_info** ti
 - `id`: Unique identifier for each teacher information record
@@ -42,7 +44,7 @@ Given an input question "{question}", generate syntactically correct and precise
 
 ### Example:
 - Question: What's the timetable for Raymond Lee?
-- SQLQuery: SELECT DISTINCT t.id AS teacher_id, ti.id AS info_id, t.name, t.office_room, ti.timetable_name, ti.timetable_url FROM teacher t JOIN teacher_info ti ON t.id = ti.teacher_id WHERE (t.name LIKE "%raymond%" AND t.name LIKE "%lee%") LIMIT 5;
+- SQLQuery: SELECT DISTINCT t.id AS teacher_id, ti.id AS info_id, t.name, t.office_room, ti.timetable_name, ti.timetable_url FROM teacher t JOIN teacher_info ti ON t.id = ti.teacher_id WHERE (t.name LIKE "%raymond%" AND t.name LIKE "%lee%") AND t.deleted_at IS NULL LIMIT 5;
 
 ### Start:
 - Question: {question}
@@ -59,11 +61,13 @@ Given an input question "{question}", generate a syntactically correct and preci
 - In the SELECT statement, avoid using `*`; instead, specify the exact field names needed for the results, including `timetable_url`.
 - Ensure that any `id` columns are aliased to avoid duplication in the result set, for example: `t.id AS teacher_id` and `ti.id AS info_id`.
 - If the name provided contains multiple words, like "Raymond Lee", query for the teacher's name with separated words, like "Raymond" and "Lee". For example, `WHERE (t.name LIKE "%raymond%" AND t.name LIKE "%lee%")`.
+- Only query current teachers: always filter with `t.deleted_at IS NULL`, teachers who left have `deleted_at` set.
 
 ### Table Structures and Field Meanings:
 1. **teacher**
 - `id`: Unique identifier for each teacher (INTEGER, NOT NULL)
 - `name`: Name of the teacher (VARCHAR(255))
+- `deleted_at`: When the teacher left, NULL for current teachers (DATETIME)
 - Other fields...
 2. **teacher_info**
 - `id`: Unique identifier for each teacher information record (INTEGER, NOT NULL)
@@ -73,7 +77,7 @@ Given an input question "{question}", generate a syntactically correct and preci
 
 ### Example:
 - Question: 查询raymond lee的timetable
-- SQLQuery: SELECT t.id AS teacher_id, ti.id AS info_id, t.name, t.name, ti.timetable_url FROM teacher t JOIN teacher_info ti ON t.id = ti.teacher_id WHERE (t.name LIKE "%raymond%" AND t.name LIKE "%lee%") AND ti.lang = "cn" LIMIT 5;
+- SQLQuery: SELECT t.id AS teacher_id, ti.id AS info_id, t.name, t.name, ti.timetable_url FROM teacher t JOIN teacher_info ti ON t.id = ti.teacher_id WHERE (t.name LIKE "%raymond%" AND t.name LIKE "%lee%") AND ti.lang = "cn" AND t.deleted_at IS NULL LIMIT 5;
 
 ### Start:
 - Question: {question}